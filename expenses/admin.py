@@ -1,17 +1,224 @@
-from django.contrib import admin
-from .models import Category, Transaction, MonthlyBudget, CategoryBudget
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import models, transaction as db_transaction
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from .forms import CategoryChoiceField
+from .models import ArchivedYear, Category, Transaction, MonthlyBudget, CategoryBudget, RecurringTransaction, Tenant
+from .services import budgets, bulk_edit, pagination, partitions, rollups, search
+
+CURSOR_VAR = 'cursor'
+
+
+# Admin for tables with millions of rows. The stock changelist runs an
+# exact COUNT(*) (twice: filtered and total) and an OFFSET per page, both
+# reading every row before the page. Here:
+#   - counts come from the planner's estimate (pagination.approximate_count)
+#   - the default order is paged by keyset (?cursor=...), a column sort
+#     falls back to numbered pages
+#   - facets and the unfiltered total are never counted
+#   - "delete selected" is one DELETE statement instead of a delete of
+#     every loaded row (with a confirmation page showing the count only)
+class EstimatedCountPaginator(Paginator):
+    estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.estimated = pagination.approximate_count(self.object_list)
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    # Links to filters, sorts and searches start again from the first page
+    def get_query_string(self, new_params=None, remove=None):
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        self.keyset = ORDER_VAR not in self.params and not self.show_all
+        if not self.keyset:
+            return super().get_results(request)
+        try:
+            rows, next_cursor = self.model_admin.keyset_page(self.queryset, self.cursor, self.list_per_page)
+        except pagination.InvalidCursor:
+            raise IncorrectLookupParameters
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or next_cursor)
+        self.first_page_url = self.get_query_string()
+        self.next_page_url = next_cursor and self.get_query_string({CURSOR_VAR: next_cursor})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    actions = ['delete_rows']
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    # Newest rows first, seeking on the primary key
+    def keyset_page(self, queryset, cursor, page_size):
+        queryset = queryset.order_by('-pk')
+        if cursor:
+            if not cursor.isdigit():
+                raise pagination.InvalidCursor(f'Invalid cursor "{cursor}"')
+            queryset = queryset.filter(pk__lt=int(cursor))
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            return rows[:page_size], str(rows[page_size - 1].pk)
+        return rows, None
+
+    # Deletes the rows of the action and returns their number. The default
+    # goes through queryset.delete() (collector, signals, cascades); admins
+    # of big tables override it with a set-based delete that keeps the data
+    # derived from the rows in sync (services/bulk_edit.py, budgets.py).
+    def bulk_delete(self, queryset):
+        deleted, per_model = queryset.delete()
+        return per_model.get(self.opts.label, 0)
+
+    @admin.action(description='Delete selected %(verbose_name_plural)s', permissions=['delete'])
+    def delete_rows(self, request, queryset):
+        if request.POST.get('post') == 'yes':
+            count = self.bulk_delete(queryset)
+            self.message_user(request, f'Deleted {count:,} {self.opts.verbose_name_plural}.', messages.SUCCESS)
+            return None
+        count, estimated = pagination.approximate_count(queryset)
+        return TemplateResponse(request, 'admin/expenses/bulk_delete_confirmation.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Are you sure?',
+            'opts': self.opts,
+            'count': count,
+            'estimated': estimated,
+            'action': request.POST.get('action'),
+            'select_across': request.POST.get('select_across', '0'),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        })
+
+
+# dates() for the date hierarchy: the years (or months) that have rows are
+# found with one indexed EXISTS per candidate between the first and last
+# date, instead of a DISTINCT over every row of the table
+class IndexedDatesQuerySet(models.QuerySet):
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in (partitions.YEAR, partitions.MONTH):
+            return super().dates(field_name, kind, order)
+        # two index seeks (SQLite scans for MIN and MAX in one query)
+        dates = self.order_by().values_list(field_name, flat=True)
+        first, last = dates.order_by(field_name).first(), dates.order_by(f'-{field_name}').first()
+        if first is None:
+            return []
+        found = [
+            start for start in partitions.periods(first, last, kind)
+            if self.filter(**{
+                f'{field_name}__gte': start, f'{field_name}__lt': partitions.next_period(start, kind),
+            }).exists()
+        ]
+        return found if order == 'ASC' else found[::-1]
+
+
+class TransactionActionForm(helpers.ActionForm):
+    category = CategoryChoiceField(required=False, label='Category:')
+
+
+# The other models are listed for the tenant of the logged-in user only
+# (TenantMiddleware + TenantManager)
+@admin.register(Tenant)
+class TenantAdmin(admin.ModelAdmin):
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+    filter_horizontal = ['members']
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'type']
     list_filter = ['type']
+    search_fields = ['name']
+    ordering = ['type', 'name']
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(LargeTableAdmin):
     list_display = ['date', 'amount', 'description', 'category']
     list_filter = ['category', 'date']
+    list_select_related = ['category']
+    date_hierarchy = 'date'
+    search_fields = ['description']
+    autocomplete_fields = ['category', 'monthly_budget']
+    action_form = TransactionActionForm
+    actions = ['recategorize', 'delete_rows']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(queryset.model, queryset.query.chain(), queryset.db)
+
+    # Display order of the app (services/pagination.py)
+    def keyset_page(self, queryset, cursor, page_size):
+        return pagination.keyset_page(queryset, cursor, page_size)
+
+    def bulk_delete(self, queryset):
+        return bulk_edit.delete(queryset)
+
+    @admin.action(description='Move selected transactions to the category', permissions=['change'])
+    def recategorize(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        category = form.cleaned_data['category'] if form.is_valid() else None
+        if category is None:
+            self.message_user(request, 'Pick the category to move the transactions to.', messages.WARNING)
+            return
+        count = bulk_edit.recategorize(queryset, category)
+        self.message_user(request, f'Moved {count:,} transaction(s) to "{category.name}".', messages.SUCCESS)
+
+    # Search through the full-text index instead of an icontains scan
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.match(queryset, search_term), False
+
+    # Keep MonthlyCategoryTotal rollups in sync with edits made in the admin
+    def save_model(self, request, obj, form, change):
+        with db_transaction.atomic():
+            if change:
+                previous = Transaction.objects.get(pk=obj.pk)
+                obj.save()
+                rollups.record_transaction_changed(previous, obj)
+            else:
+                obj.save()
+                rollups.record_transaction_added(obj)
+
+    def delete_model(self, request, obj):
+        with db_transaction.atomic():
+            rollups.record_transaction_removed(obj)
+            obj.delete()
+
+    def delete_queryset(self, request, queryset):
+        bulk_edit.delete(queryset)
 
 
 @admin.register(MonthlyBudget)
@@ -19,9 +226,37 @@ class MonthlyBudgetAdmin(admin.ModelAdmin):
     list_display = ['year', 'month', 'created_at']
     list_filter = ['year', 'month']
     ordering = ['-year', '-month']
+    search_fields = ['=year']
 
 
 @admin.register(CategoryBudget)
-class CategoryBudgetAdmin(admin.ModelAdmin):
+class CategoryBudgetAdmin(LargeTableAdmin):
     list_display = ['monthly_budget', 'category', 'budgeted_amount']
-    list_filter = ['monthly_budget', 'category']
+    list_filter = ['monthly_budget__year', 'category']
+    list_select_related = ['monthly_budget', 'category']
+    autocomplete_fields = ['monthly_budget', 'category']
+
+    def bulk_delete(self, queryset):
+        return budgets.delete_budgets(queryset)
+
+
+@admin.register(RecurringTransaction)
+class RecurringTransactionAdmin(admin.ModelAdmin):
+    list_display = ['description', 'amount', 'category', 'frequency', 'interval', 'start_date', 'end_date',
+                    'active', 'materialized_until']
+    list_filter = ['frequency', 'active', 'category']
+    readonly_fields = ['materialized_until']
+
+
+# Written by manage.py archive_transactions; read-only here
+@admin.register(ArchivedYear)
+class ArchivedYearAdmin(admin.ModelAdmin):
+    list_display = ['year', 'transaction_count', 'path', 'archived_at']
+    readonly_fields = ['year', 'transaction_count', 'path', 'archived_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    # Without the row, rebuild_rollups would drop the archived year's totals
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,7 @@
+from .services import alerts
+
+
+# Unread budget alerts for the badge of the base.html sidebar. Passed as a
+# callable: the count query runs only on pages that render the sidebar.
+def budget_alerts(request):
+    return {'unread_alert_count': alerts.unread_count}
@@ -1,6 +1,57 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 from django.utils import timezone
 from .models import Category, Transaction
+from .services.categories import get_category, get_registry
+
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for category in self.field.categories():
+            yield self.choice(category)
+
+    def __len__(self):
+        return len(self.field.categories()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.categories())
+
+
+# Category picker reading the category registry (services/categories.py)
+# instead of querying: choices and validation cost no query. `type` limits
+# it to income or expense categories and can be changed per form.
+class CategoryChoiceField(forms.ModelChoiceField):
+    iterator = CategoryChoiceIterator
+
+    def __init__(self, type=None, queryset=None, **kwargs):
+        super().__init__(queryset=Category.objects.all() if queryset is None else queryset, **kwargs)
+        self.type = type
+
+    def categories(self):
+        registry = get_registry()
+        if self.type:
+            return sorted(registry.of_type(self.type), key=lambda category: category.name)
+        return registry.ordered()
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, Category):
+            value = value.pk
+        # reloads the registry for an id it does not know yet (a category
+        # another process just created)
+        try:
+            category = get_category(int(value))
+        except (TypeError, ValueError, Category.DoesNotExist):
+            category = None
+        if category is None or (self.type and category.type != self.type):
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+        return category
 
 
 class CategoryForm(forms.ModelForm):
@@ -23,6 +74,7 @@ class TransactionForm(forms.ModelForm):
     class Meta:
         model = Transaction
         fields = ['date', 'amount', 'description', 'category']
+        field_classes = {'category': CategoryChoiceField}
         widgets = {
             'description': forms.TextInput(attrs={
                 'class': 'form-control', 
@@ -50,4 +102,80 @@ class TransactionForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Mặc định date = hôm nay
         if not self.instance.pk:  # Chỉ set khi tạo mới, không set khi edit
-            self.fields['date'].initial = timezone.now().date()
\ No newline at end of file
+            self.fields['date'].initial = timezone.now().date()
+
+
+class TransactionImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV (date, amount, description, category)'),
+        ('ofx', 'OFX bank statement'),
+    ]
+
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control'}))
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    expense_category = CategoryChoiceField(
+        type='expense',
+        required=False,
+        help_text='Used for rows without category and a negative amount',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    income_category = CategoryChoiceField(
+        type='income',
+        required=False,
+        help_text='Used for rows without category and a positive amount',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
+
+# One amount field per category ("budget_<id>"), saved in a single upsert.
+# Empty fields are saved as 0.
+class BulkBudgetForm(forms.Form):
+    def __init__(self, *args, categories=(), amounts=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        amounts = amounts or {}
+        self.categories = list(categories)
+        for category in self.categories:
+            self.fields[f'budget_{category.id}'] = forms.DecimalField(
+                label=category.name,
+                min_value=0,
+                max_digits=12,
+                decimal_places=0,
+                required=False,
+                initial=amounts.get(category.id, 0),
+                widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm text-end', 'min': '0'}),
+            )
+
+    def rows(self):
+        return [(category, self[f'budget_{category.id}']) for category in self.categories]
+
+    def amounts(self):
+        return {
+            category.id: self.cleaned_data[f'budget_{category.id}'] or 0
+            for category in self.categories
+        }
+
+
+# Search query + optional filters, used by the search page and the API
+class TransactionSearchForm(forms.Form):
+    TYPE_CHOICES = [('', 'All types')] + Category.TYPE_CHOICES
+
+    q = forms.CharField(max_length=200, widget=forms.TextInput(attrs={
+        'class': 'form-control', 'placeholder': 'Search description', 'autofocus': True,
+    }))
+    category = CategoryChoiceField(
+        required=False,
+        empty_label='All categories',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    type = forms.ChoiceField(choices=TYPE_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-control'}))
+    amount_min = forms.DecimalField(min_value=0, decimal_places=0, required=False, widget=forms.NumberInput(attrs={
+        'class': 'form-control', 'placeholder': 'Min amount',
+    }))
+    amount_max = forms.DecimalField(min_value=0, decimal_places=0, required=False, widget=forms.NumberInput(attrs={
+        'class': 'form-control', 'placeholder': 'Max amount',
+    }))
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+
+    def filters(self):
+        return {name: value for name, value in self.cleaned_data.items() if name != 'q'}
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from ..middleware import TenantMiddleware
+from ..tenancy import current_tenant_id, default_tenant_id, get_tenants, tenant_context
+
+
+# Command that works on the data of one tenant: --tenant <id>, by default
+# the default tenant. handle() runs with that tenant active.
+class TenantCommand(BaseCommand):
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--tenant', type=int, default=default_tenant_id(), help='Tenant id (default: %(default)s).')
+        return parser
+
+    def execute(self, *args, **options):
+        if not get_tenants([options['tenant']]):
+            raise CommandError(f'No tenant with id {options["tenant"]}.')
+        with tenant_context(options['tenant']):
+            return super().execute(*args, **options)
+
+
+# Command that repeats its work for every tenant, or the ones given with
+# --tenant (repeatable). handle_tenant() runs once per tenant, with it active.
+class AllTenantsCommand(BaseCommand):
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--tenant', type=int, action='append', dest='tenants', help='Only this tenant id (repeatable).')
+        return parser
+
+    def handle(self, *args, **options):
+        tenants = get_tenants(options['tenants'])
+        if not tenants:
+            raise CommandError('No matching tenant.')
+        for tenant in tenants:
+            with tenant_context(tenant):
+                self.handle_tenant(tenant, **options)
+
+    def handle_tenant(self, tenant, **options):
+        raise NotImplementedError
+
+
+# Test client logged in as a user of the current tenant, for the commands
+# that measure pages (anonymous visitors only get the login redirect): the
+# given username, else the first member of the tenant, else (default
+# tenant) the first staff user. The session is pinned to the tenant.
+def member_client(username=None):
+    tenant_id = current_tenant_id()
+    users = get_user_model().objects.filter(is_active=True).order_by('pk')
+    if username:
+        user = users.filter(username=username).first()
+    else:
+        user = users.filter(expense_tenants=tenant_id).first()
+        if user is None and tenant_id == default_tenant_id():
+            user = users.filter(is_staff=True).first()
+    if user is None:
+        raise CommandError(
+            f'No user to log in as for tenant {tenant_id}: add a member to it (Tenant.members) or pass --user.'
+        )
+    client = Client(SERVER_NAME='localhost')
+    client.force_login(user)
+    session = client.session
+    session[TenantMiddleware.SESSION_KEY] = tenant_id
+    session.save()
+    return client
@@ -0,0 +1,52 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from ...services import archive
+from ...tenancy import get_tenants, tenant_context
+
+
+# python manage.py archive_transactions                 -> archive every year before last year
+# python manage.py archive_transactions --before 2024   -> every year up to 2023
+# python manage.py archive_transactions --dry-run       -> only list the years
+# python manage.py archive_transactions --restore 2021  -> load an archived year back
+# Archived years stay in the month list and reports (from the rollups); see
+# services/archive.py. On a table partitioned by year (partition_transactions)
+# a year is dropped with its partition instead of deleted row by row.
+class Command(BaseCommand):
+    help = 'Move the transactions of closed years into compressed archive files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=int, help='Archive the years before this one (default: last year).')
+        parser.add_argument('--restore', type=int, metavar='YEAR', help='Restore an archived year instead.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            self.restore(options['restore'])
+            return
+
+        before = options['before'] or date.today().year - 1
+        if before > date.today().year:
+            raise CommandError('Only closed years can be archived.')
+        years = archive.closed_years(before)
+        if not years:
+            self.stdout.write(f'Nothing to archive before {before}.')
+            return
+
+        for year in years:
+            if options['dry_run']:
+                self.stdout.write(f'Would archive {year}.')
+                continue
+            written = archive.archive_year(year)
+            self.stdout.write(self.style.SUCCESS(
+                f'Archived {year}: {sum(written.values()):,} transaction(s) of {len(written)} tenant(s) '
+                f'into {archive.archive_dir()}.'
+            ))
+
+    def restore(self, year):
+        restored = 0
+        for tenant in get_tenants():
+            with tenant_context(tenant):
+                restored += archive.restore_year(year)
+        if not restored:
+            raise CommandError(f'{year} is not archived.')
+        self.stdout.write(self.style.SUCCESS(f'Restored {restored:,} transaction(s) of {year}.'))
@@ -0,0 +1,170 @@
+import json
+import subprocess
+import time
+from datetime import datetime, timezone
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ...models import Category, MonthlyBudget, Transaction
+from ..base import TenantCommand, member_client
+
+
+# Value at percentile p (0-100) of a sorted list
+def percentile(sorted_values, p):
+    index = round(p / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+# Current git commit, so results of different commits can be compared
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# python manage.py benchmark_views --runs 50 --output bench.json
+# Runs the main views through the test client against the current database
+# (fill it with seed_expenses first) and records latency percentiles and
+# query counts per view, logged in as a member of --tenant (or --user).
+class Command(TenantCommand):
+    help = 'Benchmark the expenses views and write latency/query-count results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help='JSON file to write. Printed to stdout when omitted.')
+        parser.add_argument('--user', help='Username to log in as (default: the first member of the tenant).')
+
+    def handle(self, *args, **options):
+        budget = MonthlyBudget.objects.first()
+        category = Category.objects.filter(type='expense').first()
+        if budget is None or category is None:
+            raise CommandError('No data to benchmark. Run "manage.py seed_expenses" first.')
+
+        self.client = member_client(options['user'])
+        self.budget = budget
+        self.category = category
+        self.day = f'{budget.year}-{budget.month:02d}-01'
+        # A word that exists, so search has matches to rank
+        self.search_term = Transaction.objects.values_list('description', flat=True).first().split()[0]
+
+        results = {}
+        for name, (prepare, run) in self.scenarios().items():
+            for _ in range(options['warmup']):
+                run(prepare())
+            results[name] = self.measure(prepare, run, options['runs'])
+            self.stdout.write(
+                f"{name:<22} p50 {results[name]['p50_ms']:8.2f} ms  "
+                f"p95 {results[name]['p95_ms']:8.2f} ms  queries {results[name]['queries']}  "
+                f"connect {results[name]['connect_share']:.0%}"
+            )
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'db_pool': getattr(settings, 'EXPENSES_DB_POOL', None),
+            'transactions': Transaction.objects.count(),
+            'runs': options['runs'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    # name -> (prepare, run). prepare() is not timed; its result is passed to run().
+    def scenarios(self):
+        no_setup = lambda: None
+        return {
+            'dashboard_60_months': (no_setup, lambda _: self.get(f"{reverse('dashboard_home')}?months=60")),
+            'monthly_list': (no_setup, lambda _: self.get(reverse('monthly_list'))),
+            'month_detail': (no_setup, lambda _: self.get(
+                reverse('month_detail', args=[self.budget.year, self.budget.month])
+            )),
+            # JSON API counterparts of the template pages, for serialization cost
+            'api_months': (no_setup, lambda _: self.get(reverse('api_months'))),
+            'api_month_detail': (no_setup, lambda _: self.get(
+                reverse('api_month_detail', args=[self.budget.year, self.budget.month])
+            )),
+            'api_transactions': (no_setup, lambda _: self.get(
+                f"{reverse('api_transactions')}?year={self.budget.year}&month={self.budget.month}"
+            )),
+            'search': (no_setup, lambda _: self.get(f"{reverse('transaction_search')}?q={self.search_term}")),
+            'api_search': (no_setup, lambda _: self.get(f"{reverse('api_transaction_search')}?q={self.search_term}")),
+            'transaction_create': (no_setup, self.create_transaction),
+            'transaction_update': (self.benchmark_transaction, self.update_transaction),
+            'transaction_delete': (self.benchmark_transaction, self.delete_transaction),
+        }
+
+    # Anything but 200 (a redirect to the login page too) is an error, not a timing
+    def get(self, url):
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'GET {url} returned {response.status_code}')
+
+    def post(self, url, data):
+        response = self.client.post(url, data)
+        if response.status_code != 302:
+            raise CommandError(f'POST {url} returned {response.status_code}')
+
+    def transaction_data(self, amount):
+        return {'date': self.day, 'amount': amount, 'description': 'benchmark', 'category': self.category.id}
+
+    def create_transaction(self, _):
+        url = reverse('transaction_create_by_type', args=['expense'])
+        self.post(f'{url}?year={self.budget.year}&month={self.budget.month}', self.transaction_data(1000))
+
+    # A row made by the create scenario (or a new one) for update/delete
+    def benchmark_transaction(self):
+        transaction = Transaction.objects.filter(description='benchmark').first()
+        if transaction is None:
+            self.create_transaction(None)
+            transaction = Transaction.objects.filter(description='benchmark').first()
+        return transaction
+
+    def update_transaction(self, transaction):
+        self.post(reverse('transaction_update', args=[transaction.pk]), self.transaction_data(2000))
+
+    def delete_transaction(self, transaction):
+        self.post(reverse('transaction_delete', args=[transaction.pk]), {})
+
+    # Each run is timed like a server request: connections are released the
+    # way request_finished does it (the test client skips that), so with
+    # CONN_MAX_AGE=0 every run pays for a new connection. That setup time is
+    # measured on its own to report its share of the latency.
+    def measure(self, prepare, run, runs):
+        timings = []
+        connect_timings = []
+        queries = []
+        for _ in range(runs):
+            prepared = prepare()
+            close_old_connections()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                connection.ensure_connection()
+                connected = time.perf_counter()
+                run(prepared)
+                finished = time.perf_counter()
+            timings.append((finished - started) * 1000)
+            connect_timings.append((connected - started) * 1000)
+            queries.append(len(captured))
+        connect_share = sum(connect_timings) / sum(timings)
+        timings.sort()
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p90_ms': round(percentile(timings, 90), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': max(queries),
+            'connect_ms': round(sum(connect_timings) / runs, 3),
+            'connect_share': round(connect_share, 3),
+        }
@@ -0,0 +1,51 @@
+import time
+from django.db import connection
+from django.db.models import Sum
+from ..base import TenantCommand
+from ...models import Category, MonthlyCategoryTotal, Transaction
+from ...services.periods import filter_month
+
+
+# Print EXPLAIN plans and timings of the hot access paths, to check that
+# the tenant-led indexes (migration 0014) are used (run it on a filled db).
+#   python manage.py explain_queries --year 2025 --month 3 --analyze [--tenant 2]
+class Command(TenantCommand):
+    help = 'Show EXPLAIN plans and timings of the main report queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--month', type=int, required=True)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query for the timing.')
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (PostgreSQL only).')
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        month_transactions = filter_month(Transaction.objects.all(), year, month)
+
+        queries = {
+            # txn_tenant_date_cat_idx: range scan on (tenant, date)
+            'month transactions': month_transactions.order_by(),
+            # txn_tenant_date_cat_idx with INCLUDE amount: index-only scan
+            'month sums by category': (
+                month_transactions.values('category_id').annotate(total=Sum('amount')).order_by()
+            ),
+            # category_tenant_type_name_idx
+            'expense categories by name': Category.objects.filter(type='expense').order_by('name'),
+            # unique (tenant, year, month, category) index of the rollups
+            'month rollups': MonthlyCategoryTotal.objects.filter(year=year, month=month),
+        }
+
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(**explain_options))
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f'best {min(timings):.2f} ms, worst {max(timings):.2f} ms\n')
@@ -0,0 +1,53 @@
+import time
+import tracemalloc
+from django.core.management.base import CommandError
+from ..base import TenantCommand
+from ...models import MonthlyBudget
+from ...services.exporter import WRITERS, TRANSACTION_HEADER, REPORT_HEADER, transaction_rows, month_report_rows
+
+
+# python manage.py export_transactions out.csv --year 2025
+# python manage.py export_transactions out.xlsx --month 2025-03        (Budget vs Actual table)
+# python manage.py export_transactions out.csv --profile-memory        (peak Python memory)
+class Command(TenantCommand):
+    help = 'Stream transactions or a month report to a CSV or XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output')
+        parser.add_argument('--format', choices=sorted(WRITERS), help='Defaults to the file extension.')
+        parser.add_argument('--year', type=int, help='Only this year (default: full history).')
+        parser.add_argument('--month', help='YYYY-MM: export the Budget vs Actual table of this month instead.')
+        parser.add_argument('--profile-memory', action='store_true', help='Report peak memory (slower).')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['output'].rsplit('.', 1)[-1].lower()
+        if file_format not in WRITERS:
+            raise CommandError(f'Unknown format "{file_format}".')
+        write, content_type = WRITERS[file_format]
+
+        if options['month']:
+            year, month = map(int, options['month'].split('-'))
+            try:
+                monthly_budget = MonthlyBudget.objects.get(year=year, month=month)
+            except MonthlyBudget.DoesNotExist:
+                raise CommandError(f'No monthly budget for {options["month"]}.')
+            chunks = write(REPORT_HEADER, month_report_rows(monthly_budget))
+        else:
+            chunks = write(TRANSACTION_HEADER, transaction_rows(options['year']))
+
+        if options['profile_memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        size = 0
+        mode, encoding = ('w', 'utf-8') if file_format == 'csv' else ('wb', None)
+        with open(options['output'], mode, encoding=encoding, newline='' if encoding else None) as f:
+            for chunk in chunks:
+                size += len(chunk)
+                f.write(chunk)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]} ({size:,} bytes) in {elapsed:.2f}s.'))
+        if options['profile_memory']:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f'Peak traced memory: {peak / 1024 / 1024:.2f} MiB')
@@ -0,0 +1,55 @@
+import time
+from pathlib import Path
+from django.core.management.base import CommandError
+from ..base import TenantCommand
+from ...models import Category
+from ...services.importer import PARSERS, ImportRowError, TransactionImporter
+
+
+# python manage.py import_transactions bank.csv
+# python manage.py import_transactions statement.ofx --expense-category Food --income-category Salary
+class Command(TenantCommand):
+    help = 'Import transactions from a CSV or OFX file (streamed, deduplicated, in chunks).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Defaults to the file extension.')
+        parser.add_argument('--expense-category', help='Category name for rows without category and amount < 0.')
+        parser.add_argument('--income-category', help='Category name for rows without category and amount >= 0.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        format = options['format'] or path.suffix.lstrip('.').lower()
+        if format not in PARSERS:
+            raise CommandError(f'Unknown format "{format}", use --format {" or ".join(sorted(PARSERS))}.')
+
+        importer = TransactionImporter(
+            default_expense_category=self.get_category(options['expense_category'], 'expense'),
+            default_income_category=self.get_category(options['income_category'], 'income'),
+            chunk_size=options['chunk_size'],
+        )
+
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                result = importer.run(PARSERS[format](f))
+        except (OSError, ImportRowError) as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'Row {row_number}: {message}')
+        rate = result.created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created:,} transaction(s), skipped {result.duplicates:,} duplicate(s), '
+            f'{result.error_count:,} error(s) in {elapsed:.2f}s ({rate:,.0f} rows/s).'
+        ))
+
+    def get_category(self, name, type):
+        if not name:
+            return None
+        try:
+            return Category.objects.get(name=name, type=type)
+        except Category.DoesNotExist:
+            raise CommandError(f'No {type} category named "{name}".')
@@ -0,0 +1,121 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.urls import reverse
+from ...models import MonthlyBudget
+from ..base import TenantCommand, member_client
+from .benchmark_views import git_commit, percentile
+
+
+# python manage.py loadtest http://127.0.0.1:8000 --concurrency 32 --requests 2000 --label asgi
+# Sends concurrent GET requests to a running server, to compare deployments:
+#   uvicorn expensetracker.asgi:application --workers 4      (async views)
+#   gunicorn expensetracker.wsgi:application --workers 4     (same views, run in a thread)
+# Reports requests/s and latency percentiles per URL.
+# Requests carry the session cookie of a member of --tenant (--session, or
+# a session created for --user / the first member in the shared session
+# store). Redirects are not followed: a 3xx (login page) counts as an error,
+# and a URL that does not answer 200 before the run aborts it.
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirect)
+
+
+class Command(TenantCommand):
+    help = 'Load test a running server with concurrent requests and report requests/s and latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per URL.')
+        parser.add_argument('--label', default='', help='Name of the deployment, e.g. asgi or wsgi.')
+        parser.add_argument('--output', help='JSON file to write. Printed to stdout when omitted.')
+        parser.add_argument('--user', help='Username to log in as (default: the first member of the tenant).')
+        parser.add_argument('--session', help='Session cookie value to send instead of logging in.')
+
+    def handle(self, *args, **options):
+        budget = MonthlyBudget.objects.first()
+        if budget is None:
+            raise CommandError('No data to load test. Run "manage.py seed_expenses" first.')
+
+        base_url = options['base_url'].rstrip('/')
+        paths = {
+            'monthly_list': reverse('monthly_list'),
+            'month_detail': reverse('month_detail', args=[budget.year, budget.month]),
+            'api_months': reverse('api_months'),
+            'api_month_detail': reverse('api_month_detail', args=[budget.year, budget.month]),
+            'api_transactions': f"{reverse('api_transactions')}?year={budget.year}&month={budget.month}",
+        }
+
+        session = options['session'] or member_client(options['user']).cookies[settings.SESSION_COOKIE_NAME].value
+        self.headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session}'}
+        for path in paths.values():
+            status = self.status(base_url + path)
+            if status != 200:
+                raise CommandError(f'GET {base_url + path} returned {status}')
+
+        results = {}
+        for name, path in paths.items():
+            results[name] = self.run(base_url + path, options['requests'], options['concurrency'])
+            self.stdout.write(
+                f"{name:<18} {results[name]['requests_per_second']:8.1f} req/s  "
+                f"p50 {results[name]['p50_ms']:8.2f} ms  p99 {results[name]['p99_ms']:8.2f} ms  "
+                f"errors {results[name]['errors']}"
+            )
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'label': options['label'],
+            'base_url': base_url,
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    # Status of one request (HTTPError: 3xx, 4xx, 5xx), None when it failed
+    def status(self, url):
+        try:
+            with opener.open(urllib.request.Request(url, headers=self.headers), timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+        except (urllib.error.URLError, OSError):
+            return None
+
+    # One request, returns (elapsed ms, ok)
+    def fetch(self, url):
+        started = time.perf_counter()
+        ok = self.status(url) == 200
+        return (time.perf_counter() - started) * 1000, ok
+
+    def run(self, url, requests, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(self.fetch, [url] * requests))
+        elapsed = time.perf_counter() - started
+
+        timings = sorted(ms for ms, _ in outcomes)
+        return {
+            'requests_per_second': round(requests / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'max_ms': round(timings[-1], 3),
+            'errors': sum(1 for _, ok in outcomes if not ok),
+        }
@@ -0,0 +1,32 @@
+from datetime import date
+from django.core.management.base import CommandError
+from ..base import AllTenantsCommand
+from ...services.recurring import BATCH_SIZE, materialize
+
+
+# python manage.py materialize_recurring                    -> everything due up to today
+# python manage.py materialize_recurring --until 2025-12-31 -> also future occurrences
+# Safe to run as often as needed (cron): occurrences already created are skipped.
+# Runs tenant by tenant (--tenant <id> for just one).
+class Command(AllTenantsCommand):
+    help = 'Create the transactions of every due occurrence of the recurring transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Last date to materialize (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.until = None
+        if options['until']:
+            try:
+                self.until = date.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError('--until must be a date in YYYY-MM-DD format.')
+        super().handle(*args, **options)
+
+    def handle_tenant(self, tenant, **options):
+        result = materialize(self.until, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{tenant}: {result.rules} rule(s) processed: {result.created} transaction(s) created, '
+            f'{result.skipped} already existing.'
+        ))
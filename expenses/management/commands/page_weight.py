@@ -0,0 +1,114 @@
+import gzip
+import json
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import CommandError
+from django.urls import reverse
+from ...models import MonthlyBudget
+from ..base import TenantCommand, member_client
+from .benchmark_views import git_commit
+
+STYLESHEET = re.compile(r'<link[^>]+rel="stylesheet"[^>]*>')
+SCRIPT = re.compile(r'<script[^>]+src="([^"]+)"[^>]*>')
+HREF = re.compile(r'href="([^"]+)"')
+
+
+# Local file of a /static/ URL (collected file first, then the finders)
+def static_file(url):
+    name = urlparse(url).path.removeprefix(urlparse(settings.STATIC_URL).path).lstrip('/')
+    if settings.STATIC_ROOT and staticfiles_storage.exists(name):
+        return staticfiles_storage.path(name)
+    return finders.find(name)
+
+
+# python manage.py page_weight --output weight.json
+# Weight of the main pages as a browser loads them: HTML bytes (raw and as
+# transferred with gzip), the CSS/JS they reference (local size and gzip
+# size; files on other hosts are only counted), and what blocks the first
+# paint: stylesheets in <head> and the extra hosts that need a connection.
+# Pages are requested as a member of --tenant (or --user).
+class Command(TenantCommand):
+    help = 'Measure HTML and asset weight of the main pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10, help='Requests per page for the server time.')
+        parser.add_argument('--output', help='JSON file to write. Printed to stdout when omitted.')
+        parser.add_argument('--user', help='Username to log in as (default: the first member of the tenant).')
+
+    def handle(self, *args, **options):
+        budget = MonthlyBudget.objects.first()
+        if budget is None:
+            raise CommandError('No data to measure. Run "manage.py seed_expenses" first.')
+        pages = {
+            'dashboard_home': reverse('dashboard_home'),
+            'monthly_list': reverse('monthly_list'),
+            'month_detail': reverse('month_detail', args=[budget.year, budget.month]),
+            'category_list': reverse('category_list'),
+        }
+        client = member_client(options['user'])
+
+        results = {}
+        for name, url in pages.items():
+            results[name] = self.measure(client, url, options['runs'])
+            result = results[name]
+            self.stdout.write(
+                f"{name:<15} html {result['html_bytes']:>8,} B  sent {result['transfer_bytes']:>7,} B  "
+                f"assets {result['asset_transfer_bytes']:>8,} B  blocking css {result['blocking_stylesheets']}  "
+                f"external hosts {len(result['external_hosts'])}  p50 {result['p50_ms']:.1f} ms"
+            )
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, client, url, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+        sent = response.content
+        html = client.get(url).content.decode()
+        head = html.split('</head>', 1)[0]
+
+        assets = [HREF.search(tag).group(1) for tag in STYLESHEET.findall(html)] + SCRIPT.findall(html)
+        local, external_hosts = {}, set()
+        for asset in assets:
+            host = urlparse(asset).netloc
+            if host:
+                external_hosts.add(host)
+                continue
+            path = static_file(asset)
+            if path:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                local[asset] = {'bytes': len(content), 'gzip_bytes': len(gzip.compress(content))}
+
+        timings.sort()
+        return {
+            'html_bytes': len(html.encode()),
+            'transfer_bytes': len(sent),
+            'content_encoding': response.get('Content-Encoding', 'identity'),
+            'assets': len(assets),
+            'local_assets': local,
+            'asset_transfer_bytes': sum(item['gzip_bytes'] for item in local.values()),
+            'external_assets': len(assets) - len(local),
+            'external_hosts': sorted(external_hosts),
+            'blocking_stylesheets': len(STYLESHEET.findall(head)),
+            'p50_ms': round(timings[len(timings) // 2], 2),
+        }
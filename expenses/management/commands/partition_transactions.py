@@ -0,0 +1,73 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from ...models import Transaction
+from ...services import partitions
+
+
+# Optional: turn the transactions table into a PostgreSQL partitioned table
+# (see services/partitions.py for the layouts). Not needed below a few
+# hundred million rows: the tenant-led indexes already keep per-tenant
+# queries fast, but date partitions also let archive_transactions drop
+# closed years without a DELETE and keep vacuum work on recent data.
+#
+#   python manage.py partition_transactions --layout year              -> print the SQL
+#   python manage.py partition_transactions --layout month --tenant-partitions 8 --execute
+#   python manage.py partition_transactions --extend --execute         -> next period's partition (cron)
+#
+# The conversion copies the rows in one transaction that locks the table:
+# run it in a maintenance window (or set EXPENSES_TRANSACTION_PARTITIONING
+# before migrating, migration 0015 then converts the table).
+class Command(BaseCommand):
+    help = 'Generate (and optionally run) the SQL that partitions transactions (PostgreSQL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--layout', choices=partitions.LAYOUTS, help='Partition by tenant hash, year or month.')
+        parser.add_argument('--partitions', type=int, default=16, help='Hash partitions of the tenant layout.')
+        parser.add_argument('--tenant-partitions', type=int, default=0,
+                            help='Also split every year/month partition into this many tenant hash partitions.')
+        parser.add_argument('--extend', action='store_true',
+                            help='Add the missing year/month partitions up to the next period.')
+        parser.add_argument('--execute', action='store_true', help='Run the statements instead of printing them.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Declarative partitioning needs PostgreSQL.')
+        table = Transaction._meta.db_table
+        partitioned = partitions.is_partitioned(connection, table)
+        today = date.today()
+
+        if options['extend']:
+            if not partitioned:
+                raise CommandError(f'{table} is not partitioned, use --layout first.')
+            interval, starts = partitions.date_partitions(connection, table)
+            if interval is None:
+                raise CommandError(f'{table} is not partitioned by date.')
+            until = partitions.next_period(partitions.period_start(today, interval), interval)
+            statements = partitions.extend_sql(Transaction, connection, until, options['tenant_partitions'])
+        else:
+            if not options['layout']:
+                raise CommandError('Pick a --layout (or --extend).')
+            if partitioned:
+                raise CommandError(f'{table} is already partitioned.')
+            if options['layout'] == partitions.TENANT and options['partitions'] < 2:
+                raise CommandError('Use at least 2 partitions.')
+            until = None
+            if options['layout'] != partitions.TENANT:
+                # the current and the next period exist from the start
+                until = partitions.next_period(partitions.period_start(today, options['layout']), options['layout'])
+            statements = partitions.partition_sql(
+                Transaction, connection, options['layout'], options['partitions'], options['tenant_partitions'], until
+            )
+
+        if not options['execute']:
+            self.stdout.write('BEGIN;')
+            for sql in statements:
+                self.stdout.write(f'{sql};')
+            self.stdout.write('COMMIT;')
+            return
+
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(f'Ran {len(statements)} statement(s) on {table}.'))
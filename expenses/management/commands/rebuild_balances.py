@@ -0,0 +1,37 @@
+from django.core.management.base import CommandError
+from ..base import AllTenantsCommand
+from ...services.balances import compute_balances, stored_balances, find_drift, rebuild_balances
+
+
+# python manage.py rebuild_balances             -> recompute and replace all balance snapshots
+# python manage.py rebuild_balances --check     -> only compare, fail if they drifted
+# python manage.py rebuild_balances --tenant 2  -> only one tenant (default: every tenant)
+class Command(AllTenantsCommand):
+    help = 'Recompute MonthlyBalance snapshots from transactions and check them against live data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not rewrite the table.')
+
+    def handle(self, *args, **options):
+        self.drifted = 0
+        super().handle(*args, **options)
+        if options['check']:
+            if self.drifted:
+                raise CommandError(f'{self.drifted} balance snapshot(s) out of date.')
+            self.stdout.write(self.style.SUCCESS('Balance snapshots match live data.'))
+
+    def handle_tenant(self, tenant, **options):
+        expected = compute_balances()
+        drift = find_drift(expected, stored_balances())
+        self.drifted += len(drift)
+
+        for year, month in drift:
+            self.stdout.write(f'{tenant}: drift in {year}-{month:02d}')
+
+        if options['check']:
+            return
+
+        rebuild_balances(expected)
+        self.stdout.write(self.style.SUCCESS(
+            f'{tenant}: rebuilt {len(expected)} balance snapshot(s), fixed {len(drift)} drifted snapshot(s).'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import CommandError
+from ..base import AllTenantsCommand
+from ...services.rollups import compute_rollups, stored_rollups, find_drift, rebuild_rollups
+
+
+# python manage.py rebuild_rollups             -> recompute and replace all rollups
+# python manage.py rebuild_rollups --check     -> only compare, fail if they drifted
+# python manage.py rebuild_rollups --tenant 2  -> only one tenant (default: every tenant)
+class Command(AllTenantsCommand):
+    help = 'Recompute MonthlyCategoryTotal rollups from transactions and check them against live data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not rewrite the table.')
+
+    def handle(self, *args, **options):
+        self.drifted = 0
+        super().handle(*args, **options)
+        if options['check']:
+            if self.drifted:
+                raise CommandError(f'{self.drifted} rollup row(s) out of date.')
+            self.stdout.write(self.style.SUCCESS('Rollups match live data.'))
+
+    def handle_tenant(self, tenant, **options):
+        expected = compute_rollups()
+        drift = find_drift(expected, stored_rollups())
+        self.drifted += len(drift)
+
+        for year, month, category_id in drift:
+            self.stdout.write(f'{tenant}: drift in {year}-{month:02d} category {category_id}')
+
+        if options['check']:
+            return
+
+        rebuild_rollups(expected)
+        if find_drift(expected, stored_rollups()):
+            raise CommandError(f'{tenant}: rollups still differ from live data after rebuild.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{tenant}: rebuilt {len(expected)} rollup row(s), fixed {len(drift)} drifted row(s).'
+        ))
@@ -0,0 +1,162 @@
+import random
+from datetime import date
+from calendar import monthrange
+from itertools import islice
+from django.core.management.base import CommandError
+from django.db import connection, transaction as db_transaction
+from ..base import TenantCommand
+from ...models import (
+    ArchivedYear, Category, Transaction, MonthlyBudget, CategoryBudget, MonthlyCategoryTotal, MonthlyBalance,
+    RecurringTransaction,
+)
+from ...services.rollups import rebuild_rollups
+from ...services.balances import rebuild_balances
+
+EXPENSE_NAMES = [
+    'Food', 'Rent', 'Transport', 'Utilities', 'Health', 'Entertainment', 'Shopping',
+    'Education', 'Travel', 'Insurance', 'Gifts', 'Phone & Internet', 'Coffee', 'Pets',
+]
+INCOME_NAMES = ['Salary', 'Bonus', 'Freelance', 'Interest', 'Dividends', 'Rental Income']
+
+# (min, max) amount in đ by category type
+AMOUNT_RANGES = {
+    'expense': (10_000, 2_000_000),
+    'income': (1_000_000, 30_000_000),
+}
+
+
+# Split an iterable into lists of `size` items
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# Last `count` months ending at (year, month), oldest first
+def month_sequence(year, month, count):
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months[::-1]
+
+
+# python manage.py seed_expenses --transactions 1000000 --months 60 --categories 40
+# python manage.py seed_expenses --tenant 2 --transactions 10000   (another tenant's data)
+# Generates realistic data with bulk_create in batches, so memory stays flat
+# from 10k to 50M rows. Rollups and balance snapshots are rebuilt at the end.
+class Command(TenantCommand):
+    help = 'Bulk-generate synthetic categories, budgets and transactions for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=10_000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--months', type=int, default=36, help='Number of months ending at the current month.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible data sets.')
+        parser.add_argument('--clear', action='store_true', help='Delete all existing expenses data first.')
+
+    def handle(self, *args, **options):
+        if options['categories'] < 2:
+            raise CommandError('Need at least 2 categories (one income, one expense).')
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear()
+
+        categories = self.create_categories(options['categories'])
+        today = date.today()
+        months = month_sequence(today.year, today.month, options['months'])
+        budget_ids = self.create_budgets(months, categories, rng, batch_size)
+
+        created = 0
+        for batch in chunked(self.generate_transactions(options['transactions'], months, categories, budget_ids, rng), batch_size):
+            Transaction.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            self.stdout.write(f'\r{created:,} / {options["transactions"]:,} transactions', ending='')
+            self.stdout.flush()
+        self.stdout.write('')
+
+        rollups = rebuild_rollups()
+        rebuild_balances()
+        # Fresh planner statistics, otherwise the first plans ignore the new indexes
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(categories)} categories, {len(months)} months, '
+            f'{created:,} transactions ({len(rollups):,} rollup rows).'
+        ))
+
+    def clear(self):
+        with db_transaction.atomic():
+            MonthlyCategoryTotal.objects.all().delete()
+            MonthlyBalance.objects.all().delete()
+            ArchivedYear.objects.all().delete()
+            Transaction.objects.all().delete()
+            # Protects its category
+            RecurringTransaction.objects.all().delete()
+            CategoryBudget.objects.all().delete()
+            MonthlyBudget.objects.all().delete()
+            Category.objects.all().delete()
+
+    def create_categories(self, count):
+        income_count = max(1, count // 5)
+        wanted = []
+        for i in range(income_count):
+            wanted.append((self.category_name(INCOME_NAMES, i), 'income'))
+        for i in range(count - income_count):
+            wanted.append((self.category_name(EXPENSE_NAMES, i), 'expense'))
+
+        existing = {(c.name, c.type): c for c in Category.objects.all()}
+        Category.objects.bulk_create(
+            Category(name=name, type=type) for name, type in wanted if (name, type) not in existing
+        )
+        wanted = set(wanted)
+        return [c for c in Category.objects.all() if (c.name, c.type) in wanted]
+
+    def category_name(self, names, i):
+        if i < len(names):
+            return names[i]
+        return f'{names[i % len(names)]} {i // len(names) + 1}'
+
+    def create_budgets(self, months, categories, rng, batch_size):
+        MonthlyBudget.objects.bulk_create(
+            [MonthlyBudget(year=year, month=month) for year, month in months],
+            ignore_conflicts=True,
+        )
+        budget_ids = {
+            (b.year, b.month): b.id
+            for b in MonthlyBudget.objects.filter(year__gte=months[0][0], year__lte=months[-1][0])
+        }
+
+        def category_budgets():
+            for year, month in months:
+                for category in categories:
+                    low, high = AMOUNT_RANGES[category.type]
+                    yield CategoryBudget(
+                        monthly_budget_id=budget_ids[(year, month)],
+                        category=category,
+                        budgeted_amount=rng.randrange(low, high, 1000) * 5,
+                    )
+
+        for batch in chunked(category_budgets(), batch_size):
+            CategoryBudget.objects.bulk_create(batch, ignore_conflicts=True)
+        return budget_ids
+
+    def generate_transactions(self, count, months, categories, budget_ids, rng):
+        expense_categories = [c for c in categories if c.type == 'expense']
+        income_categories = [c for c in categories if c.type == 'income']
+        for i in range(count):
+            year, month = months[rng.randrange(len(months))]
+            # Roughly 1 income for every 10 expenses
+            category = rng.choice(income_categories if rng.random() < 0.1 else expense_categories)
+            low, high = AMOUNT_RANGES[category.type]
+            yield Transaction(
+                description=f'{category.name} #{i}',
+                amount=rng.randrange(low, high, 1000),
+                date=date(year, month, rng.randint(1, monthrange(year, month)[1])),
+                category=category,
+                monthly_budget_id=budget_ids[(year, month)],
+            )
@@ -0,0 +1,34 @@
+from pathlib import Path
+from urllib.request import urlopen
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...services.assets import VENDOR
+
+
+# python manage.py vendor_assets            -> download the missing vendor files
+# python manage.py vendor_assets --force    -> download them all again
+# Saves the pinned third-party CSS/JS/fonts of services/assets.py into
+# static/vendor/ so they are served (and fingerprinted, compressed) with our
+# own static files. The files are committed: run it (with --force) after
+# changing a pinned version, commit the result, then run collectstatic.
+class Command(BaseCommand):
+    help = 'Download the third-party static assets into static/vendor/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Download files that already exist again.')
+
+    def handle(self, *args, **options):
+        root = Path(settings.STATICFILES_DIRS[0])
+        for path, url in VENDOR.items():
+            target = root / path
+            if target.exists() and not options['force']:
+                continue
+            try:
+                with urlopen(url, timeout=30) as response:
+                    content = response.read()
+            except OSError as exc:
+                raise CommandError(f'Could not download {url}: {exc}')
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+            self.stdout.write(f'{path} ({len(content):,} bytes)')
+        self.stdout.write(self.style.SUCCESS(f'Vendor assets are in {root / "vendor"}.'))
@@ -0,0 +1,281 @@
+import mimetypes
+import random
+import re
+import time
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import FileResponse, HttpResponseForbidden, HttpResponseNotModified
+from django.template.base import Template
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from . import tenancy
+from .services import alist, metrics
+
+
+# Adds the time of every top-level template render to the sampled request.
+# Installed once; included/extended templates are counted with their parent.
+def _install_render_timer():
+    if getattr(Template, '_expenses_timed', False):
+        return
+    original_render = Template.render
+
+    def timed_render(self, context):
+        request_metrics = metrics.current.get()
+        if request_metrics is None:
+            return original_render(self, context)
+        request_metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            request_metrics.render_depth -= 1
+            if request_metrics.render_depth == 0:
+                request_metrics.render_ms += (time.perf_counter() - started) * 1000
+
+    Template.render = timed_render
+    Template._expenses_timed = True
+
+
+# Serves the collected static files (STATIC_ROOT) when no web server sits in
+# front of Django. Content-hashed names (ManifestStaticFilesStorage, e.g.
+# base.3f1c2a9b7e10.css) never change, so they are cached for a year
+# without revalidation; the .br/.gz files written by collectstatic
+# (expenses/storage.py) are sent to browsers that accept them. Other paths
+# go on to the views. EXPENSES_SERVE_STATIC=False turns it off.
+class StaticFilesMiddleware:
+    sync_capable = True
+    async_capable = True
+    HASHED = re.compile(r'\.[0-9a-f]{12}\.')
+    ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EXPENSES_SERVE_STATIC', True) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.root = Path(settings.STATIC_ROOT)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        try:
+            path = Path(safe_join(self.root, request.path.removeprefix(self.prefix)))
+        except ValueError:
+            return None
+        if not path.is_file():
+            return None
+
+        stat = path.stat()
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            return HttpResponseNotModified()
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        accepted = {item.split(';')[0].strip() for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+        encoding, send = None, path
+        for name, suffix in self.ENCODINGS:
+            variant = path.with_name(path.name + suffix)
+            if name in accepted and variant.is_file():
+                encoding, send = name, variant
+                break
+
+        response = FileResponse(send.open('rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Vary'] = 'Accept-Encoding'
+        if self.HASHED.search(path.name):
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=3600'
+        return response
+
+
+# Query count, SQL time, template time and repeated statements per URL name.
+# Only EXPENSES_METRICS_SAMPLE_RATE of the requests are measured; the others
+# just increment a counter, which keeps the overhead well under 1%.
+# Reports: /debug/metrics/ (JSON) and /debug/metrics/?format=prometheus
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'EXPENSES_METRICS_SAMPLE_RATE', 0.1)
+        _install_render_timer()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            metrics.count_request(self.view_name(request))
+            return response
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        started = time.perf_counter()
+        # the connection of this thread may predate the connection_created receiver
+        metrics.install_query_timer(connection)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self.record(request, started, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            response = await self.get_response(request)
+            metrics.count_request(self.view_name(request))
+            return response
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        started = time.perf_counter()
+        # The queries run in sync_to_async threads, on their own connections:
+        # metrics.query_timer (installed on every connection) finds this
+        # request's metrics through the context copied into those threads
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self.record(request, started, request_metrics)
+        return response
+
+    def record(self, request, started, request_metrics):
+        name = self.view_name(request)
+        metrics.count_request(name)
+        metrics.record(name, (time.perf_counter() - started) * 1000, request_metrics)
+
+    def view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.url_name or match.view_name or 'unnamed'
+
+
+def _scoped(content, tenant_id):
+    with tenancy.tenant_context(tenant_id):
+        yield from content
+
+
+async def _ascoped(content, tenant_id):
+    with tenancy.tenant_context(tenant_id):
+        async for chunk in content:
+            yield chunk
+
+
+# Activates the tenant of every request, which scopes all queries of the
+# views (TenantManager) and the cache keys:
+#   - logged-in users: the tenant they are a member of. The session remembers
+#     which one, but membership is checked again on every request (one
+#     indexed query), so a removed member loses access at once; staff
+#     without a tenant use the default tenant
+#     and users that are a member of no tenant get the "no household" page (403)
+#   - anonymous visitors: EXPENSES_ANONYMOUS_TENANT; when that is None (the
+#     default) they are sent to the login page (the admin handles its own login)
+# The login and logout pages work without a tenant.
+# Streamed responses (CSV export) are iterated after the view returned, so
+# their content is wrapped to run with the same tenant.
+class TenantMiddleware:
+    sync_capable = True
+    async_capable = True
+    SESSION_KEY = '_expenses_tenant'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.anonymous_tenant = getattr(settings, 'EXPENSES_ANONYMOUS_TENANT', None)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.is_public(request):
+            return self.get_response(request)
+        tenant_id = self.anonymous_tenant
+        user = request.user
+        if user.is_authenticated:
+            remembered = request.session.get(self.SESSION_KEY)
+            tenant_id = self.membership(user, remembered, list(self.member_of(user)))
+            if tenant_id != remembered:
+                request.session[self.SESSION_KEY] = tenant_id
+
+        tenant_id = self.request_tenant(request, tenant_id)
+        if tenant_id is None:
+            if user.is_authenticated:
+                return self.no_tenant(request)
+            return redirect_to_login(request.get_full_path())
+        with tenancy.tenant_context(tenant_id):
+            response = self.get_response(request)
+        return self.scope_streaming(response, tenant_id)
+
+    async def __acall__(self, request):
+        if self.is_public(request):
+            return await self.get_response(request)
+        tenant_id = self.anonymous_tenant
+        user = await request.auser()
+        if user.is_authenticated:
+            remembered = await request.session.aget(self.SESSION_KEY)
+            tenant_id = self.membership(user, remembered, await alist(self.member_of(user)))
+            if tenant_id != remembered:
+                await request.session.aset(self.SESSION_KEY, tenant_id)
+
+        tenant_id = self.request_tenant(request, tenant_id)
+        if tenant_id is None:
+            if user.is_authenticated:
+                return await sync_to_async(self.no_tenant)(request)
+            return redirect_to_login(request.get_full_path())
+        with tenancy.tenant_context(tenant_id):
+            response = await self.get_response(request)
+        return self.scope_streaming(response, tenant_id)
+
+    def is_public(self, request):
+        return request.path in (reverse('login'), reverse('logout'))
+
+    def no_tenant(self, request):
+        return HttpResponseForbidden(render_to_string('registration/no_tenant.html', request=request))
+
+    def member_of(self, user):
+        return user.expense_tenants.order_by('id').values_list('id', flat=True)
+
+    # The remembered tenant while the user is still a member of it
+    def membership(self, user, remembered, tenant_ids):
+        if remembered in tenant_ids:
+            return remembered
+        if tenant_ids:
+            return tenant_ids[0]
+        if user.is_staff:
+            return tenancy.default_tenant_id()
+        return None
+
+    # Tenant the request works on, None when the visitor has to log in
+    def request_tenant(self, request, tenant_id):
+        if tenant_id is None and request.path.startswith(reverse('admin:index')):
+            tenant_id = tenancy.default_tenant_id()
+        request.tenant_id = tenant_id
+        return tenant_id
+
+    def scope_streaming(self, response, tenant_id):
+        if response.streaming:
+            scoped = _ascoped if response.is_async else _scoped
+            response.streaming_content = scoped(response.streaming_content, tenant_id)
+        return response
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def populate_balances(apps, schema_editor):
+    Transaction = apps.get_model('expenses', 'Transaction')
+    MonthlyBalance = apps.get_model('expenses', 'MonthlyBalance')
+    rows = (
+        Transaction.objects
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('year', 'month')
+        .annotate(
+            income=Sum('amount', filter=Q(category__type='income')),
+            expense=Sum('amount', filter=Q(category__type='expense')),
+        )
+        .order_by('year', 'month')
+    )
+    balance = 0
+    snapshots = []
+    for row in rows:
+        net = (row['income'] or 0) - (row['expense'] or 0)
+        balance += net
+        snapshots.append(MonthlyBalance(year=row['year'], month=row['month'], net=net, closing_balance=balance))
+    MonthlyBalance.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_transaction_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('net', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('closing_balance', models.DecimalField(decimal_places=0, default=0, max_digits=16)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
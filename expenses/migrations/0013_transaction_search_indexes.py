@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# PostgreSQL indexes for transaction search (expenses/services/search.py):
+# full-text (prefix) matches and pg_trgm fuzzy matches on description.
+# Built CONCURRENTLY so a large transactions table stays writable; the
+# SQLite FTS5 fallback is created after migrate (expenses/signals.py).
+
+INDEXES = [
+    ('txn_description_fts_idx', "USING gin (to_tsvector('simple', description))"),
+    ('txn_description_trgm_idx', 'USING gin (description gin_trgm_ops)'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON expenses_transaction {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0012_recurringtransaction'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
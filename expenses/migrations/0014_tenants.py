@@ -0,0 +1,161 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:58
+
+import django.db.models.deletion
+import expenses.tenancy
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+# Existing data (and every existing user) goes to the default tenant, which
+# the new tenant columns below use as their default.
+def create_default_tenant(apps, schema_editor):
+    Tenant = apps.get_model('expenses', 'Tenant')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    tenant, created = Tenant.objects.get_or_create(
+        pk=expenses.tenancy.default_tenant_id(), defaults={'name': 'Default'}
+    )
+    tenant.members.add(*User.objects.all())
+    # The explicit pk leaves PostgreSQL's id sequence behind
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Tenant]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_transaction_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='transaction',
+            name='txn_recurring_occurrence_uniq',
+        ),
+        migrations.RemoveIndex(
+            model_name='category',
+            name='category_type_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_date_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_keyset_idx',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='members',
+            field=models.ManyToManyField(blank=True, related_name='expense_tenants', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(create_default_tenant, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='monthlybalance',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlybudget',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlycategorytotal',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='categorybudget',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='monthlybalance',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='monthlybudget',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='monthlycategorytotal',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='openingbalance',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='recurringtransaction',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='tenant',
+            field=models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlybalance',
+            unique_together={('tenant', 'year', 'month')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlybudget',
+            unique_together={('tenant', 'year', 'month')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlycategorytotal',
+            unique_together={('tenant', 'year', 'month', 'category')},
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['tenant', 'type', 'name'], name='category_tenant_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtransaction',
+            index=models.Index(fields=['tenant', 'active', 'id'], name='recurring_tenant_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['tenant', 'date', 'category'], include=('amount',), name='txn_tenant_date_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['tenant', '-date', '-created_at', '-id'], name='txn_tenant_keyset_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='openingbalance',
+            constraint=models.UniqueConstraint(fields=('tenant',), name='openingbalance_tenant_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('tenant', 'recurring', 'occurrence_date'), name='txn_recurring_occurrence_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('tenant', 'import_hash'), name='txn_tenant_import_hash_uniq'),
+        ),
+    ]
@@ -0,0 +1,181 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+import django.db.models.deletion
+import expenses.tenancy
+from datetime import date
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of what services/partitions.py generated when this migration
+# was written: migrations must not change with the application code.
+TENANT = 'tenant'
+YEAR = 'year'
+MONTH = 'month'
+LAYOUTS = [TENANT, YEAR, MONTH]
+TENANT_HASH_PARTITIONS = 16
+
+# Search indexes of migration 0013
+SEARCH_INDEXES = [
+    ('txn_description_fts_idx', "USING gin (to_tsvector('simple', description))"),
+    ('txn_description_trgm_idx', 'USING gin (description gin_trgm_ops)'),
+]
+
+
+def period_start(day, interval):
+    return date(day.year, 1, 1) if interval == YEAR else date(day.year, day.month, 1)
+
+
+def next_period(start, interval):
+    if interval == YEAR:
+        return date(start.year + 1, 1, 1)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def periods(first, last, interval):
+    start = period_start(first, interval)
+    while start <= last:
+        yield start
+        start = next_period(start, interval)
+
+
+def partition_name(table, start, interval):
+    if interval == YEAR:
+        return f'{table}_y{start.year}'
+    return f'{table}_m{start.year}_{start.month:02d}'
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [table])
+        return cursor.fetchone() is not None
+
+
+def hash_partitions_sql(qn, parent, count):
+    return [
+        f'CREATE TABLE {qn(f"{parent}_h{remainder}")} PARTITION OF {qn(parent)} '
+        f'FOR VALUES WITH (MODULUS {count}, REMAINDER {remainder})'
+        for remainder in range(count)
+    ]
+
+
+def subpartitioned(qn, name, sql, tenant_partitions):
+    if tenant_partitions > 1:
+        return [f'{sql} PARTITION BY HASH (tenant_id)', *hash_partitions_sql(qn, name, tenant_partitions)]
+    return [sql]
+
+
+def partition_sql(model, connection, layout, tenant_partitions, until):
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    old_table = f'{table}_unpartitioned'
+    sequence = f'{table}_part_id_seq'
+    columns = ', '.join(qn(field.column) for field in model._meta.concrete_fields)
+    keys = ['tenant_id'] if layout == TENANT else ['date'] + (['tenant_id'] if tenant_partitions > 1 else [])
+    partition_by = 'HASH (tenant_id)' if layout == TENANT else 'RANGE (date)'
+
+    statements = [
+        f'ALTER TABLE {qn(table)} RENAME TO {qn(old_table)}',
+        f'CREATE TABLE {qn(table)} (LIKE {qn(old_table)} INCLUDING DEFAULTS) PARTITION BY {partition_by}',
+        f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id',
+        f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+    ]
+    if layout == TENANT:
+        statements += [
+            f'CREATE TABLE {qn(f"{table}_p{remainder}")} PARTITION OF {qn(table)} '
+            f'FOR VALUES WITH (MODULUS {TENANT_HASH_PARTITIONS}, REMAINDER {remainder})'
+            for remainder in range(TENANT_HASH_PARTITIONS)
+        ]
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN(date) FROM {qn(table)}')
+            first = cursor.fetchone()[0]
+        for start in periods(first or until, until, layout):
+            name = partition_name(table, start, layout)
+            sql = (
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_period(start, layout).isoformat()}')"
+            )
+            statements += subpartitioned(qn, name, sql, tenant_partitions)
+        name = f'{table}_default'
+        statements += subpartitioned(qn, name, f'CREATE TABLE {qn(name)} PARTITION OF {qn(table)} DEFAULT',
+                                     tenant_partitions)
+
+    statements += [
+        f'INSERT INTO {qn(table)} ({columns}) SELECT {columns} FROM {qn(old_table)}',
+        f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {qn(table)}), 0) + 1, false)",
+        f'DROP TABLE {qn(old_table)}',
+        f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f"{table}_pkey")} PRIMARY KEY (id, {", ".join(keys)})',
+    ]
+
+    for field in model._meta.concrete_fields:
+        if not field.remote_field:
+            continue
+        target = field.remote_field.model._meta
+        statements.append(
+            f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f"{table}_{field.column}_fk")} '
+            f'FOREIGN KEY ({qn(field.column)}) REFERENCES {qn(target.db_table)} ({qn(target.pk.column)}) '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+        if field.db_index and field.name != 'tenant':
+            statements.append(f'CREATE INDEX {qn(f"{table}_{field.column}_idx")} ON {qn(table)} ({qn(field.column)})')
+
+    # Unique constraints lacking a partition key column become plain indexes
+    key_fields = {model._meta.get_field(key.removesuffix('_id')).name for key in keys}
+    with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+        for index in model._meta.indexes:
+            editor.add_index(model, index)
+        for constraint in model._meta.constraints:
+            if key_fields <= set(getattr(constraint, 'fields', ())):
+                editor.add_constraint(model, constraint)
+            else:
+                editor.add_index(model, models.Index(fields=constraint.fields, name=constraint.name))
+    statements += [sql.rstrip(';') for sql in editor.collected_sql]
+
+    statements += [f'CREATE INDEX {name} ON {qn(table)} {definition}' for name, definition in SEARCH_INDEXES]
+    statements.append(f'ANALYZE {qn(table)}')
+    return statements
+
+
+# Convert the transactions table when EXPENSES_TRANSACTION_PARTITIONING is
+# set (PostgreSQL only); later conversions go through the
+# partition_transactions command (services/partitions.py)
+def partition_transactions(apps, schema_editor):
+    layout = getattr(settings, 'EXPENSES_TRANSACTION_PARTITIONING', '')
+    connection = schema_editor.connection
+    if layout not in LAYOUTS or connection.vendor != 'postgresql':
+        return
+    Transaction = apps.get_model('expenses', 'Transaction')
+    if is_partitioned(connection, Transaction._meta.db_table):
+        return
+    until = None
+    if layout != TENANT:
+        until = next_period(period_start(date.today(), layout), layout)
+    tenant_partitions = getattr(settings, 'EXPENSES_TRANSACTION_TENANT_PARTITIONS', 0)
+    for sql in partition_sql(Transaction, connection, layout, tenant_partitions, until):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0014_tenants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('path', models.CharField(max_length=500)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('tenant', models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant')),
+            ],
+            options={
+                'ordering': ['-year'],
+                'unique_together': {('tenant', 'year')},
+            },
+        ),
+        migrations.RunPython(partition_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+import django.db.models.deletion
+import expenses.tenancy
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0015_archivedyear_partitioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('threshold', 'Threshold reached'), ('overspent', 'Over budget')], max_length=10)),
+                ('budgeted', models.DecimalField(decimal_places=0, max_digits=12)),
+                ('actual', models.DecimalField(decimal_places=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='expenses.categorybudget')),
+                ('tenant', models.ForeignKey(default=expenses.tenancy.current_tenant_id, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.tenant')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['tenant', '-created_at', '-id'], name='budgetalert_tenant_feed_idx'), models.Index(condition=models.Q(('read_at__isnull', True)), fields=['tenant'], name='budgetalert_tenant_unread_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'budget', 'kind'), name='budgetalert_budget_kind_uniq')],
+            },
+        ),
+    ]
@@ -1,8 +1,22 @@
+from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator
+from .tenancy import TenantModel
+
+
+# A household / organisation owning its own categories, budgets and
+# transactions. Every other model belongs to exactly one tenant, and users
+# see the data of the tenant they are a member of.
+class Tenant(models.Model):
+    name = models.CharField(max_length=100)
+    members = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name='expense_tenants')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
 
 # Represents a category of transactions (Food, Transport, etc).
-class Category(models.Model):
+class Category(TenantModel):
     TYPE_CHOICES = [
         ('income', 'Income'),
         ('expense', 'Expense'),
@@ -11,20 +25,49 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
 
+    class Meta:
+        indexes = [
+            # Category lists and reports filter by type and show by name
+            models.Index(fields=['tenant', 'type', 'name'], name='category_tenant_type_name_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.type})"
 
 # Represents a single transaction.
-class Transaction(models.Model):
+class Transaction(TenantModel):
     description = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=12, decimal_places=0, validators=[MinValueValidator(0)])
     date = models.DateField()
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     monthly_budget = models.ForeignKey('MonthlyBudget', on_delete=models.PROTECT, null=True, blank=True, related_name='transactions')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Content hash of imported rows, used to skip rows imported before
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # Set on transactions generated from a RecurringTransaction rule
+    recurring = models.ForeignKey('RecurringTransaction', on_delete=models.SET_NULL, null=True, blank=True,
+                                  editable=False, related_name='occurrences')
+    occurrence_date = models.DateField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        # Every index leads with tenant: a tenant's queries read only its own
+        # slice of the index, however many other tenants there are.
+        indexes = [
+            # Month queries use half-open date ranges (date >= first day AND date < next month)
+            # then group/join by category. INCLUDE amount makes Sum(amount) an
+            # index-only scan on PostgreSQL (other backends get a plain index).
+            models.Index(fields=['tenant', 'date', 'category'], include=['amount'], name='txn_tenant_date_cat_idx'),
+            # Keyset pagination of month_detail walks this index in display order
+            models.Index(fields=['tenant', '-date', '-created_at', '-id'], name='txn_tenant_keyset_idx'),
+        ]
+        # Unique constraints include tenant as well, which keeps them valid
+        # when the table is hash-partitioned by tenant (partition_transactions)
+        constraints = [
+            # One transaction per occurrence of a recurring rule: materializing twice is a no-op
+            models.UniqueConstraint(fields=['tenant', 'recurring', 'occurrence_date'], name='txn_recurring_occurrence_uniq'),
+            models.UniqueConstraint(fields=['tenant', 'import_hash'], name='txn_tenant_import_hash_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.description} - {self.amount}"
@@ -32,14 +75,14 @@ class Transaction(models.Model):
 
 # Represents a monthly budget period.
 # Each month can only have one budget entry.
-class MonthlyBudget(models.Model):
+class MonthlyBudget(TenantModel):
     year = models.IntegerField()
     month = models.IntegerField()  # 1-12
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ('year', 'month')
+        unique_together = ('tenant', 'year', 'month')
         ordering = ['-year', '-month']
 
     def __str__(self):
@@ -47,7 +90,7 @@ class MonthlyBudget(models.Model):
 
 # Stores budgeted amount for each category in a specific month.
 # Actual spending is calculated from Transaction model.
-class CategoryBudget(models.Model):
+class CategoryBudget(TenantModel):
     monthly_budget = models.ForeignKey(MonthlyBudget, on_delete=models.CASCADE, related_name='category_budgets')
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     budgeted_amount = models.DecimalField(
@@ -63,3 +106,137 @@ class CategoryBudget(models.Model):
 
     def __str__(self):
         return f"{self.monthly_budget} - {self.category.name}: {self.budgeted_amount}"
+
+# A category budget whose spending reached the alert threshold
+# (EXPENSES_BUDGET_ALERT_THRESHOLD percent of the budget) or went over it.
+# Written by services/alerts.py when a transaction or budget of the month
+# changes; the row exists while the level stays crossed, so a month that
+# goes back under budget loses its alert and crossing again makes a new one.
+class BudgetAlert(TenantModel):
+    THRESHOLD = 'threshold'
+    OVERSPENT = 'overspent'
+    KIND_CHOICES = [
+        (THRESHOLD, 'Threshold reached'),
+        (OVERSPENT, 'Over budget'),
+    ]
+
+    budget = models.ForeignKey(CategoryBudget, on_delete=models.CASCADE, related_name='alerts')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Budgeted and actual amounts when the level was crossed
+    budgeted = models.DecimalField(max_digits=12, decimal_places=0)
+    actual = models.DecimalField(max_digits=14, decimal_places=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Alert feed, newest first
+            models.Index(fields=['tenant', '-created_at', '-id'], name='budgetalert_tenant_feed_idx'),
+            # Unread badge of the sidebar: the count reads unread entries only
+            models.Index(fields=['tenant'], condition=models.Q(read_at__isnull=True), name='budgetalert_tenant_unread_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'budget', 'kind'], name='budgetalert_budget_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.budget} - {self.get_kind_display()}: {self.actual}"
+
+# Materialized running totals of transactions per (year, month, category).
+# Maintained on every transaction write so reports read O(months x categories)
+# rows instead of aggregating raw transactions.
+class MonthlyCategoryTotal(TenantModel):
+    year = models.IntegerField()
+    month = models.IntegerField()  # 1-12
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='monthly_totals')
+    total = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('tenant', 'year', 'month', 'category')
+        ordering = ['-year', '-month']
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} - {self.category.name}: {self.total} ({self.count})"
+
+
+# Starting capital the global balance is counted from (one row per tenant).
+class OpeningBalance(TenantModel):
+    amount = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant'], name='openingbalance_tenant_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Opening balance: {self.amount}"
+
+
+# Closing balance snapshot at the end of each month that has transactions:
+# opening balance + all income - all expense up to and including the month.
+# Kept up to date on every transaction write, so the global balance and any
+# month-end balance is one indexed read.
+class MonthlyBalance(TenantModel):
+    year = models.IntegerField()
+    month = models.IntegerField()  # 1-12
+    net = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    closing_balance = models.DecimalField(max_digits=16, decimal_places=0, default=0)
+
+    class Meta:
+        unique_together = ('tenant', 'year', 'month')
+        ordering = ['-year', '-month']
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d}: {self.closing_balance}"
+
+
+# A transaction that repeats (salary, rent, subscriptions).
+# `manage.py materialize_recurring` creates the Transaction of every due
+# occurrence; materialized_until records how far that has been done.
+class RecurringTransaction(TenantModel):
+    FREQUENCY_CHOICES = [
+        ('monthly', 'Monthly'),
+        ('weekly', 'Weekly'),
+        ('custom', 'Every N days'),
+    ]
+
+    description = models.CharField(max_length=255)
+    amount = models.DecimalField(max_digits=12, decimal_places=0, validators=[MinValueValidator(1)])
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='recurring_transactions')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    # Every `interval` months / weeks / days
+    interval = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    materialized_until = models.DateField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['description']
+        indexes = [
+            models.Index(fields=['tenant', 'active', 'id'], name='recurring_tenant_active_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.description} - {self.amount} ({self.get_frequency_display()})"
+
+
+# A closed year whose transactions were moved out of the transactions table
+# into a compressed file (manage.py archive_transactions). Its rollups and
+# balance snapshots stay, so month lists and reports still cover it.
+class ArchivedYear(TenantModel):
+    year = models.IntegerField()
+    transaction_count = models.IntegerField(default=0)
+    path = models.CharField(max_length=500)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('tenant', 'year')
+        ordering = ['-year']
+
+    def __str__(self):
+        return f"{self.year}: {self.transaction_count} transactions ({self.path})"
@@ -0,0 +1,21 @@
+from django.db import connections
+
+
+# Evaluate a queryset with the async ORM
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+# Delete the rows of a queryset with ONE "DELETE ... WHERE pk IN (<query>)"
+# statement and return their number. queryset.delete() loads every row
+# first when the model has delete signals or cascades; here no row is
+# loaded and nothing is sent or cascaded, so callers update the data
+# derived from the rows (rollups, balances, alerts, cache) themselves.
+def delete_rows(queryset):
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    opts = queryset.model._meta
+    sql, params = queryset.order_by().values('pk').query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(opts.db_table)} WHERE {quote(opts.pk.column)} IN ({sql})', params)
+        return cursor.rowcount
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db.models import DecimalField, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from ..models import BudgetAlert, CategoryBudget, MonthlyCategoryTotal
+from .categories import get_categories
+
+# Budget alerts, evaluated on write: every path that changes the spending of
+# a (year, month, category) (rollups.py) or its budget (budgets.py, the
+# CategoryBudget signals) calls check() with the pairs it touched. Only
+# those pairs are re-checked, with one query reading budget, actual amount
+# (from the rollup) and the alerts already raised; alerts are written only
+# when a level is crossed in either direction.
+# Call it inside the db transaction of the write, after the rollups.
+
+KINDS = [BudgetAlert.THRESHOLD, BudgetAlert.OVERSPENT]
+FEED_SIZE = 100
+
+
+def threshold():
+    return getattr(settings, 'EXPENSES_BUDGET_ALERT_THRESHOLD', 80)
+
+
+# Levels crossed by spending `actual` of a `budgeted` amount.
+# A budget of 0 (what the bulk editor saves for "no budget") never alerts.
+def crossed_levels(budgeted, actual):
+    if budgeted <= 0:
+        return set()
+    levels = set()
+    if actual * 100 >= budgeted * threshold():
+        levels.add(BudgetAlert.THRESHOLD)
+    if actual > budgeted:
+        levels.add(BudgetAlert.OVERSPENT)
+    return levels
+
+
+# pairs: (year, month, category_id). Income categories have no overspend.
+def check(pairs):
+    pairs = set(pairs)
+    if not pairs:
+        return
+    categories = get_categories({category_id for year, month, category_id in pairs})
+    pairs = {pair for pair in pairs if categories[pair[2]].type == 'expense'}
+    if not pairs:
+        return
+
+    actual = MonthlyCategoryTotal.objects.filter(
+        year=OuterRef('monthly_budget__year'),
+        month=OuterRef('monthly_budget__month'),
+        category=OuterRef('category'),
+    ).values('total')
+    rows = (
+        CategoryBudget.objects
+        .filter(
+            monthly_budget__year__in={pair[0] for pair in pairs},
+            monthly_budget__month__in={pair[1] for pair in pairs},
+            category_id__in={pair[2] for pair in pairs},
+        )
+        .annotate(
+            year=F('monthly_budget__year'),
+            month=F('monthly_budget__month'),
+            actual=Coalesce(Subquery(actual), Value(0), output_field=DecimalField()),
+            **{
+                f'has_{kind}': Exists(BudgetAlert.objects.filter(budget=OuterRef('pk'), kind=kind))
+                for kind in KINDS
+            },
+        )
+        .values('pk', 'year', 'month', 'category_id', 'budgeted_amount', 'actual', *(f'has_{kind}' for kind in KINDS))
+        .order_by()
+    )
+
+    raised, cleared = [], {kind: [] for kind in KINDS}
+    for row in rows:
+        if (row['year'], row['month'], row['category_id']) not in pairs:
+            continue
+        levels = crossed_levels(row['budgeted_amount'], row['actual'])
+        for kind in KINDS:
+            if kind in levels and not row[f'has_{kind}']:
+                raised.append(BudgetAlert(
+                    budget_id=row['pk'], kind=kind, budgeted=row['budgeted_amount'], actual=row['actual'],
+                ))
+            elif kind not in levels and row[f'has_{kind}']:
+                cleared[kind].append(row['pk'])
+
+    if raised:
+        BudgetAlert.objects.bulk_create(raised, ignore_conflicts=True)
+    cleared = [Q(kind=kind, budget_id__in=budget_ids) for kind, budget_ids in cleared.items() if budget_ids]
+    if cleared:
+        query = cleared[0]
+        for condition in cleared[1:]:
+            query |= condition
+        BudgetAlert.objects.filter(query).delete()
+
+
+# Pairs of every budget of the given months (budget edits)
+def budget_pairs(monthly_budgets, category_ids):
+    return [(budget.year, budget.month, category_id) for budget in monthly_budgets for category_id in category_ids]
+
+
+# Every budget of the tenant, after the rollups were rebuilt
+def check_all():
+    check(CategoryBudget.objects.values_list('monthly_budget__year', 'monthly_budget__month', 'category_id'))
+
+
+# One indexed count (partial index budgetalert_tenant_unread_idx)
+def unread_count():
+    return BudgetAlert.objects.filter(read_at__isnull=True).count()
+
+
+def feed(limit=FEED_SIZE):
+    return list(
+        BudgetAlert.objects
+        .select_related('budget__monthly_budget', 'budget__category')
+        .order_by('-created_at', '-id')[:limit]
+    )
+
+
+def mark_all_read():
+    return BudgetAlert.objects.filter(read_at__isnull=True).update(read_at=timezone.now())
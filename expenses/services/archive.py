@@ -0,0 +1,174 @@
+import csv
+import gzip
+from datetime import date
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from ..models import ArchivedYear, MonthlyCategoryTotal, Transaction
+from ..tenancy import get_tenants, tenant_context
+from . import cache, partitions
+
+# Archival of closed years. In one db transaction:
+#   1. every tenant's transactions of the year are written to
+#      <EXPENSES_ARCHIVE_DIR>/tenant-<id>/transactions-<year>.csv.gz and an
+#      ArchivedYear row records the file
+#   2. the year leaves the transactions table: when the table is
+#      partitioned by date its partitions are detached and dropped (instant,
+#      nothing left to vacuum), otherwise the rows are deleted month by month
+# Rollups and balance snapshots are kept, so monthly_list, the month reports
+# and the balances still cover archived years; rebuild_rollups and
+# rebuild_balances take the stored values as the reference for them.
+# Gzipped CSV keeps the archive readable without extra dependencies (Parquet
+# would need pyarrow).
+TABLE = Transaction._meta.db_table
+FIELDS = [field for field in Transaction._meta.concrete_fields if field.name != 'tenant']
+HEADER = [field.attname for field in FIELDS]
+
+
+def archived_years():
+    return set(ArchivedYear.objects.values_list('year', flat=True))
+
+
+# The rollups of a category (deleted with it) are all that is left of its
+# archived transactions, so such a category must not be deleted
+def has_archived_transactions(category):
+    return MonthlyCategoryTotal.objects.filter(category=category, year__in=archived_years(), count__gt=0).exists()
+
+
+def archive_dir():
+    return Path(getattr(settings, 'EXPENSES_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+
+
+def archive_path(tenant_id, year):
+    return archive_dir() / f'tenant-{tenant_id}' / f'transactions-{year}.csv.gz'
+
+
+def _year_range(year):
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+# Years before `before` that still have transactions, for any tenant
+def closed_years(before):
+    return sorted(day.year for day in Transaction.all_tenants.filter(date__lt=date(before, 1, 1)).dates('date', 'year'))
+
+
+# Archived rows as lists of column values (strings, '' for NULL)
+def read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        yield from reader
+
+
+# Write the current tenant's transactions of `year` to its archive file.
+# Rows of an earlier archive of the same year are kept (transactions added
+# to an archived year are archived again with them). Returns the row count.
+def write_year(year, path, previous=None):
+    start, end = _year_range(year)
+    rows = (
+        Transaction.objects
+        .filter(date__gte=start, date__lt=end)
+        .order_by('date', 'id')
+        .values_list(*HEADER)
+        .iterator(chunk_size=2000)
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.name}.partial')
+    count = 0
+    with gzip.open(partial, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        archived_ids = set()
+        if previous:
+            for row in read_archive(previous):
+                archived_ids.add(row[0])
+                writer.writerow(row)
+                count += 1
+        for row in rows:
+            if str(row[0]) not in archived_ids:
+                writer.writerow(['' if value is None else value for value in row])
+                count += 1
+    partial.replace(path)
+    return count
+
+
+# Take the year out of the transactions table (all tenants)
+def _remove_year(year):
+    statements = None
+    if connection.vendor == 'postgresql' and partitions.is_partitioned(connection, TABLE):
+        statements = partitions.drop_year_sql(connection, TABLE, year)
+    with connection.cursor() as cursor:
+        if statements:
+            for sql in statements:
+                cursor.execute(sql)
+            return
+        for month in range(1, 13):
+            start = date(year, month, 1)
+            end = date(year + month // 12, month % 12 + 1, 1)
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(TABLE)} WHERE date >= %s AND date < %s', [start, end]
+            )
+
+
+def _invalidate_year(year):
+    cache.invalidate_months([(year, month) for month in range(1, 13)])
+
+
+# Archive one closed year for every tenant. Returns {tenant_id: row count}.
+def archive_year(year):
+    written = {}
+    with db_transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # reads go on, writes wait until the year is gone
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {connection.ops.quote_name(TABLE)} IN SHARE ROW EXCLUSIVE MODE')
+        for tenant in get_tenants():
+            with tenant_context(tenant):
+                start, end = _year_range(year)
+                if not Transaction.objects.filter(date__gte=start, date__lt=end).exists():
+                    continue
+                record = ArchivedYear.objects.filter(year=year).first()
+                path = archive_path(tenant.pk, year)
+                count = write_year(year, path, previous=Path(record.path) if record else None)
+                ArchivedYear.objects.update_or_create(year=year, defaults={'transaction_count': count, 'path': str(path)})
+                written[tenant.pk] = count
+        _remove_year(year)
+
+    for tenant_id in written:
+        with tenant_context(tenant_id):
+            _invalidate_year(year)
+    return written
+
+
+# Load an archived year of the current tenant back into the transactions
+# table (rows keep their ids). Rollups already count them. Returns the row count.
+def restore_year(year):
+    record = ArchivedYear.objects.filter(year=year).first()
+    if record is None:
+        return 0
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field.column) for field in FIELDS)
+    sql = f'INSERT INTO {qn(TABLE)} (tenant_id, {columns}) VALUES ({", ".join(["%s"] * (len(FIELDS) + 1))})'
+    tenant_id = record.tenant_id
+
+    def values(row):
+        return [tenant_id] + [
+            field.get_db_prep_save(None if value == '' and field.null else field.to_python(value), connection)
+            for field, value in zip(FIELDS, row)
+        ]
+
+    count = 0
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        batch = []
+        for row in read_archive(record.path):
+            batch.append(values(row))
+            if len(batch) >= 2000:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+        record.delete()
+    _invalidate_year(year)
+    return count
@@ -0,0 +1,187 @@
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from ..models import ArchivedYear, MonthlyBalance, MonthlyCategoryTotal, OpeningBalance, Transaction
+from . import cache
+
+
+def get_opening_balance():
+    opening, created = OpeningBalance.objects.get_or_create()
+    return opening
+
+
+# Snapshots of (year, month) and every later month
+def _from_month(year, month):
+    return MonthlyBalance.objects.filter(Q(year__gt=year) | Q(year=year, month__gte=month))
+
+
+# Latest snapshot at or before (year, month), None when there is none
+def _snapshot_at(year, month):
+    return (
+        MonthlyBalance.objects
+        .filter(Q(year__lt=year) | Q(year=year, month__lte=month))
+        .order_by('-year', '-month')
+        .first()
+    )
+
+
+# Add a signed amount (income > 0, expense < 0) to a month.
+# The month's net and the closing balance of that month and all later
+# months move by the same amount, in one UPDATE.
+def apply_delta(year, month, delta):
+    if not delta:
+        return
+    if not MonthlyBalance.objects.filter(year=year, month=month).exists():
+        previous = _snapshot_at(year, month)
+        start = previous.closing_balance if previous else get_opening_balance().amount
+        MonthlyBalance.objects.get_or_create(year=year, month=month, defaults={'closing_balance': start})
+    MonthlyBalance.objects.filter(year=year, month=month).update(net=F('net') + delta)
+    _from_month(year, month).update(closing_balance=F('closing_balance') + delta)
+
+
+# Bulk version of apply_delta for {(year, month): delta}: the snapshots from
+# the earliest changed month on are locked, shifted in memory and written
+# back with one bulk_update; missing months are inserted with one bulk_create.
+def apply_deltas(deltas):
+    deltas = {period: delta for period, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    first_year, first_month = min(deltas)
+    previous = (
+        MonthlyBalance.objects
+        .filter(Q(year__lt=first_year) | Q(year=first_year, month__lt=first_month))
+        .order_by('-year', '-month')
+        .first()
+    )
+    previous_closing = previous.closing_balance if previous else get_opening_balance().amount
+    snapshots = {
+        (snapshot.year, snapshot.month): snapshot
+        for snapshot in _from_month(first_year, first_month).select_for_update()
+    }
+
+    created, updated = [], []
+    shift = 0
+    for year, month in sorted(set(snapshots) | set(deltas)):
+        delta = deltas.get((year, month), 0)
+        shift += delta
+        snapshot = snapshots.get((year, month))
+        if snapshot is None:
+            snapshot = MonthlyBalance(year=year, month=month, net=delta, closing_balance=previous_closing + delta)
+            created.append(snapshot)
+        else:
+            snapshot.net += delta
+            snapshot.closing_balance += shift
+            updated.append(snapshot)
+        previous_closing = snapshot.closing_balance
+    MonthlyBalance.objects.bulk_create(created)
+    MonthlyBalance.objects.bulk_update(updated, ['net', 'closing_balance'], batch_size=1000)
+
+
+# Changing the starting capital shifts every snapshot by the difference
+def set_opening_balance(amount):
+    with db_transaction.atomic():
+        opening = OpeningBalance.objects.select_for_update().get_or_create()[0]
+        delta = amount - opening.amount
+        opening.amount = amount
+        opening.save()
+        if delta:
+            MonthlyBalance.objects.update(closing_balance=F('closing_balance') + delta)
+    cache.bump(cache.MONTHS)
+    return opening
+
+
+# Balance at the end of (year, month)
+def balance_at(year, month):
+    snapshot = _snapshot_at(year, month)
+    return snapshot.closing_balance if snapshot else get_opening_balance().amount
+
+
+# Current global balance: the latest snapshot
+def current_balance():
+    snapshot = MonthlyBalance.objects.order_by('-year', '-month').first()
+    return snapshot.closing_balance if snapshot else get_opening_balance().amount
+
+
+# Async versions for the async views
+async def aget_opening_balance():
+    opening, created = await OpeningBalance.objects.aget_or_create()
+    return opening
+
+
+async def abalance_at(year, month):
+    snapshot = await (
+        MonthlyBalance.objects
+        .filter(Q(year__lt=year) | Q(year=year, month__lte=month))
+        .order_by('-year', '-month')
+        .afirst()
+    )
+    return snapshot.closing_balance if snapshot else (await aget_opening_balance()).amount
+
+
+async def acurrent_balance():
+    snapshot = await MonthlyBalance.objects.order_by('-year', '-month').afirst()
+    return snapshot.closing_balance if snapshot else (await aget_opening_balance()).amount
+
+
+# Recompute every snapshot from raw transactions (from the rollups for
+# archived years, whose raw transactions are gone).
+# Returns {(year, month): (net, closing_balance)}
+def compute_balances():
+    archived = set(ArchivedYear.objects.values_list('year', flat=True))
+    rows = list(
+        Transaction.objects
+        .exclude(date__year__in=archived)
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('year', 'month')
+        .annotate(
+            income=Sum('amount', filter=Q(category__type='income')),
+            expense=Sum('amount', filter=Q(category__type='expense')),
+        )
+        .order_by()
+    )
+    if archived:
+        rows += (
+            MonthlyCategoryTotal.objects
+            .filter(year__in=archived)
+            .values('year', 'month')
+            .annotate(
+                income=Sum('total', filter=Q(category__type='income')),
+                expense=Sum('total', filter=Q(category__type='expense')),
+            )
+            .order_by()
+        )
+    balance = get_opening_balance().amount
+    balances = {}
+    for row in sorted(rows, key=lambda row: (row['year'], row['month'])):
+        net = (row['income'] or 0) - (row['expense'] or 0)
+        balance += net
+        balances[(row['year'], row['month'])] = (net, balance)
+    return balances
+
+
+# Snapshots currently stored. Months whose transactions were all deleted
+# keep a row with net 0; they carry no information and are ignored.
+def stored_balances():
+    rows = MonthlyBalance.objects.exclude(net=0).values_list('year', 'month', 'net', 'closing_balance')
+    return {(year, month): (net, closing) for year, month, net, closing in rows}
+
+
+def find_drift(expected, stored):
+    expected = {key: value for key, value in expected.items() if value[0]}
+    return sorted(key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+
+
+def rebuild_balances(expected=None):
+    if expected is None:
+        expected = compute_balances()
+    with db_transaction.atomic():
+        MonthlyBalance.objects.all().delete()
+        MonthlyBalance.objects.bulk_create(
+            (
+                MonthlyBalance(year=year, month=month, net=net, closing_balance=closing)
+                for (year, month), (net, closing) in expected.items()
+            ),
+            batch_size=1000,
+        )
+    cache.bump(cache.MONTHS)
+    return expected
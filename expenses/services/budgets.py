@@ -0,0 +1,86 @@
+from django.db import transaction as db_transaction
+from ..models import BudgetAlert, CategoryBudget, MonthlyBudget
+from . import alerts, cache, delete_rows
+
+# Set-based editing of CategoryBudget rows: every write below is ONE
+# INSERT ... ON CONFLICT (monthly_budget, category) DO UPDATE statement,
+# whatever the number of months x categories.
+# bulk_create sends no post_save signals, so the cache is invalidated and
+# the budget alerts of the changed budgets are checked here.
+
+
+def previous_month(year, month):
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def next_months(year, month, n):
+    index = year * 12 + month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index + 1, index + n + 1)]
+
+
+# amounts: {category_id: amount}, applied to every month in monthly_budgets
+def upsert_budgets(monthly_budgets, amounts):
+    rows = [
+        CategoryBudget(monthly_budget=monthly_budget, category_id=category_id, budgeted_amount=amount)
+        for monthly_budget in monthly_budgets
+        for category_id, amount in amounts.items()
+    ]
+    if not rows:
+        return 0
+    CategoryBudget.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['monthly_budget', 'category'],
+        update_fields=['budgeted_amount'],
+    )
+    alerts.check(alerts.budget_pairs(monthly_budgets, amounts))
+    cache.invalidate_months([(budget.year, budget.month) for budget in monthly_budgets])
+    return len(rows)
+
+
+def budget_amounts(monthly_budget):
+    return dict(
+        CategoryBudget.objects
+        .filter(monthly_budget=monthly_budget)
+        .values_list('category_id', 'budgeted_amount')
+    )
+
+
+# Copy every category budget of the previous month into this month.
+# Returns the number of budgets copied, or None when there is no previous month.
+def copy_from_previous_month(monthly_budget):
+    year, month = previous_month(monthly_budget.year, monthly_budget.month)
+    source = MonthlyBudget.objects.filter(year=year, month=month).first()
+    if source is None:
+        return None
+    return upsert_budgets([monthly_budget], budget_amounts(source))
+
+
+# Apply this month's budgets to the next n months, creating the missing months.
+def apply_to_next_months(monthly_budget, n):
+    periods = next_months(monthly_budget.year, monthly_budget.month, n)
+    MonthlyBudget.objects.bulk_create(
+        [MonthlyBudget(year=year, month=month) for year, month in periods],
+        ignore_conflicts=True,
+    )
+    wanted = set(periods)
+    targets = [
+        budget for budget in MonthlyBudget.objects.filter(year__in={year for year, _ in periods})
+        if (budget.year, budget.month) in wanted
+    ]
+    cache.invalidate_months(periods)
+    return upsert_budgets(targets, budget_amounts(monthly_budget))
+
+
+# Delete the CategoryBudget rows of a queryset (admin bulk delete) with one
+# DELETE statement; queryset.delete() would load every row to send the
+# post_delete signals.
+def delete_budgets(queryset):
+    selected = CategoryBudget.objects.filter(pk__in=queryset.order_by().values('pk'))
+    periods = set(selected.values_list('monthly_budget__year', 'monthly_budget__month').distinct())
+    with db_transaction.atomic():
+        # Not cascaded by delete_rows()
+        BudgetAlert.objects.filter(budget__in=selected).delete()
+        deleted = delete_rows(selected)
+    cache.invalidate_months(periods)
+    return deleted
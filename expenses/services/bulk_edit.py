@@ -0,0 +1,39 @@
+from django.db import transaction as db_transaction
+from ..models import Transaction
+from . import cache, delete_rows, rollups
+
+# Set-based edits of many transactions at once (admin actions): ONE UPDATE
+# or DELETE statement whatever the number of rows, plus one grouped query
+# for the rollup totals of the rows. queryset.update() and delete_rows() send
+# no signals, so rollups, balances and the cache are updated here.
+
+
+# The selected rows by primary key, so querysets with search joins
+# (services/search.py) can be updated and deleted too
+def _selected(queryset):
+    return Transaction.objects.filter(pk__in=queryset.order_by().values('pk'))
+
+
+def recategorize(queryset, category):
+    moved = _selected(queryset).exclude(category=category)
+    with db_transaction.atomic():
+        removed = rollups.queryset_totals(moved)
+        count = moved.update(category=category)
+        totals = {}
+        for (year, month, category_id), (amount, rows) in removed.items():
+            totals[(year, month, category_id)] = (-amount, -rows)
+            added_amount, added_rows = totals.get((year, month, category.id), (0, 0))
+            totals[(year, month, category.id)] = (added_amount + amount, added_rows + rows)
+        rollups.record_totals(totals)
+    cache.invalidate_months({(year, month) for year, month, category_id in removed})
+    return count
+
+
+def delete(queryset):
+    selected = _selected(queryset)
+    with db_transaction.atomic():
+        removed = rollups.queryset_totals(selected)
+        count = delete_rows(selected)
+        rollups.record_totals({key: (-amount, -rows) for key, (amount, rows) in removed.items()})
+    cache.invalidate_months({(year, month) for year, month, category_id in removed})
+    return count
@@ -0,0 +1,120 @@
+import time
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from ..tenancy import current_tenant_id
+
+# Cached values are keyed by version counters of the data they depend on:
+#   month:<year>-<month>  transactions / budgets of one month
+#   months                the list of months (any month changed)
+#   categories            category names and types (used by every page)
+# Writes bump the counters (see expenses/signals.py), so only the affected
+# months get new keys; old entries simply age out of the cache.
+# Counters and tokens are per tenant, so tenants never share cached values.
+MISSING = object()
+CATEGORIES = 'categories'
+MONTHS = 'months'
+
+# Process-local hit/miss counters per cached value name
+stats = {}
+
+
+def month_scope(year, month):
+    return f'month:{year}-{month}'
+
+
+def version_key(scope):
+    return f'expenses:t{current_tenant_id()}:version:{scope}'
+
+
+# Counters start from the current time, so a counter lost by eviction never
+# comes back with a value that was already used.
+def _initial_version():
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+# Short string identifying the current version of all scopes
+def version_token(scopes):
+    return '.'.join([f't{current_tenant_id()}', *(str(version) for version in get_versions(scopes))])
+
+
+def bump(*scopes):
+    for scope in set(scopes):
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+
+
+def invalidate_months(periods):
+    bump(MONTHS, *(month_scope(year, month) for year, month in periods))
+
+
+# Categories are part of every key, so bumping them invalidates everything
+def invalidate_all():
+    bump(CATEGORIES, MONTHS)
+
+
+# Return the cached value of `name` for the current versions of `scopes`,
+# computing and storing it on a miss.
+def cached(name, scopes, compute, timeout=DEFAULT_TIMEOUT):
+    key = f'expenses:{name}:{version_token(scopes)}'
+    counters = stats.setdefault(name, {'hits': 0, 'misses': 0})
+
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        counters['hits'] += 1
+        return value
+
+    counters['misses'] += 1
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def get_stats():
+    return {
+        name: {**counters, 'hit_ratio': round(counters['hits'] / max(1, counters['hits'] + counters['misses']), 3)}
+        for name, counters in stats.items()
+    }
+
+
+# Async versions for the async views, using the cache's async API
+async def aget_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, _initial_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+async def aversion_token(scopes):
+    return '.'.join([f't{current_tenant_id()}', *(str(version) for version in await aget_versions(scopes))])
+
+
+# Like cached(), with an async compute function
+async def acached(name, scopes, compute, timeout=DEFAULT_TIMEOUT):
+    key = f'expenses:{name}:{await aversion_token(scopes)}'
+    counters = stats.setdefault(name, {'hits': 0, 'misses': 0})
+
+    value = await cache.aget(key, MISSING)
+    if value is not MISSING:
+        counters['hits'] += 1
+        return value
+
+    counters['misses'] += 1
+    value = await compute()
+    await cache.aset(key, value, timeout)
+    return value
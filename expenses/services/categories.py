@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+from ..models import Category
+from ..tenancy import current_tenant_id
+from . import cache
+
+# Process-local registry of every category of a tenant, indexed by id and
+# by type. Categories are few and rarely change but are needed on almost
+# every page (forms, reports, transaction lists), so each process loads them
+# once per change instead of once per request. The registry is valid while
+# the shared "categories" version counter (services/cache.py, bumped by the
+# Category signals) is unchanged: a steady-state lookup costs one cache read
+# and no query.
+#
+# The Category instances are shared between requests and threads: read
+# them, never modify them (fetch the row for edits).
+#
+# Registries are kept for the MAX_REGISTRIES most recently used tenants;
+# the others are loaded again when they come back.
+MAX_REGISTRIES = 256
+
+
+class CategoryRegistry:
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self.by_id = {category.id: category for category in self.categories}
+        self.by_type = {type: [] for type, label in Category.TYPE_CHOICES}
+        for category in self.categories:
+            self.by_type.setdefault(category.type, []).append(category)
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def get(self, category_id):
+        return self.by_id.get(category_id)
+
+    def of_type(self, type):
+        return self.by_type.get(type, [])
+
+    def ids(self, type):
+        return [category.id for category in self.of_type(type)]
+
+    # Type, then name: the order of the category pickers, the budget editor and the API
+    def ordered(self):
+        return sorted(self.categories, key=lambda category: (category.type, category.name))
+
+
+# tenant id -> (version, registry), least recently used first
+_registries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cached_registry(tenant_id, version):
+    with _lock:
+        entry = _registries.get(tenant_id)
+        if entry is None or entry[0] != version:
+            return None
+        _registries.move_to_end(tenant_id)
+        return entry[1]
+
+
+def _store_registry(tenant_id, version, registry):
+    with _lock:
+        _registries[tenant_id] = (version, registry)
+        _registries.move_to_end(tenant_id)
+        while len(_registries) > MAX_REGISTRIES:
+            _registries.popitem(last=False)
+    return registry
+
+
+# The version is read before the rows, so a change made meanwhile leaves a
+# registry under the old version that is reloaded on the next call
+def get_registry():
+    tenant_id = current_tenant_id()
+    version = cache.get_versions([cache.CATEGORIES])[0]
+    registry = _cached_registry(tenant_id, version)
+    if registry is None:
+        registry = _store_registry(tenant_id, version, CategoryRegistry(Category.objects.order_by('pk')))
+    return registry
+
+
+async def aget_registry():
+    tenant_id = current_tenant_id()
+    version = (await cache.aget_versions([cache.CATEGORIES]))[0]
+    registry = _cached_registry(tenant_id, version)
+    if registry is None:
+        categories = [category async for category in Category.objects.order_by('pk')]
+        registry = _store_registry(tenant_id, version, CategoryRegistry(categories))
+    return registry
+
+
+# {id: category} of the given ids. An id the registry does not know yet
+# (a category another process just created) reloads it once.
+def get_categories(category_ids):
+    registry = get_registry()
+    if any(registry.get(category_id) is None for category_id in category_ids):
+        clear()
+        registry = get_registry()
+    found = {category_id: registry.get(category_id) for category_id in category_ids}
+    missing = [category_id for category_id, category in found.items() if category is None]
+    if missing:
+        raise Category.DoesNotExist(f'Categories {missing} do not exist')
+    return found
+
+
+def get_category(category_id):
+    return get_categories([category_id])[category_id]
+
+
+def clear():
+    with _lock:
+        _registries.pop(current_tenant_id(), None)
+
+
+# Set the category of transactions loaded without it (only category_id),
+# which replaces a join or select_related. Unknown ids are left to the
+# lazy lookup.
+def attach(transactions, registry):
+    for transaction in transactions:
+        category = registry.get(transaction.category_id)
+        if category is not None:
+            transaction.category = category
+    return transactions
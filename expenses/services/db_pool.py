@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import connections
+
+# Process-local count of new database connections per alias. With
+# CONN_MAX_AGE=0 this grows by one per request; with persistent connections
+# or a pool it should stay close to the number of worker threads.
+stats = {}
+
+
+def record_connection(alias):
+    stats[alias] = stats.get(alias, 0) + 1
+
+
+# psycopg_pool counters -> names used on the debug page
+POOL_COUNTERS = {
+    'checkouts': 'requests_num',
+    'waits': 'requests_queued',
+    'wait_ms': 'requests_wait_ms',
+    'timeouts': 'requests_errors',
+    'size': 'pool_size',
+    'available': 'pool_available',
+    'min_size': 'pool_min',
+    'max_size': 'pool_max',
+}
+
+
+def pool_stats(connection):
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+    raw = pool.get_stats()
+    return {name: raw.get(key, 0) for name, key in POOL_COUNTERS.items()}
+
+
+def get_stats():
+    result = {'mode': getattr(settings, 'EXPENSES_DB_POOL', None), 'databases': {}}
+    for alias in connections:
+        connection = connections[alias]
+        result['databases'][alias] = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'connections_opened': stats.get(alias, 0),
+            'pool': pool_stats(connection),
+        }
+    return result
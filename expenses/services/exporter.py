@@ -0,0 +1,154 @@
+import csv
+import io
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+from ..models import Transaction
+from .categories import get_category, get_registry
+from .month_report import MonthReport
+
+TRANSACTION_HEADER = ['Date', 'Description', 'Category', 'Type', 'Amount']
+REPORT_HEADER = ['Type', 'Category', 'Budgeted', 'Actual', 'Difference']
+CHUNK_SIZE = 2000
+
+
+# Transaction rows as plain tuples: values_list + iterator(chunk_size) never
+# builds model instances nor keeps the whole result set in memory. Category
+# name and type come from the category registry instead of a join.
+def transaction_rows(year=None, chunk_size=CHUNK_SIZE):
+    transactions = Transaction.objects.all()
+    if year is not None:
+        transactions = transactions.filter(date__gte=date(year, 1, 1), date__lt=date(year + 1, 1, 1))
+    rows = (
+        transactions
+        .order_by('date', 'id')
+        .values_list('date', 'description', 'category_id', 'amount')
+        .iterator(chunk_size=chunk_size)
+    )
+    registry = get_registry()
+    for day, description, category_id, amount in rows:
+        category = registry.get(category_id) or get_category(category_id)
+        yield day, description, category.name, category.type, amount
+
+
+# Budget vs Actual table of one month (the Summary tab of month_detail)
+def month_report_rows(monthly_budget):
+    report = MonthReport.build(monthly_budget)
+    for category_type, data in (('expense', report.expense_data), ('income', report.income_data)):
+        for item in data:
+            yield category_type, item['category'].name, item['budgeted'], item['actual'], item['difference']
+
+
+# Pseudo file: csv.writer returns what it "writes" instead of storing it
+class Echo:
+    def write(self, value):
+        return value
+
+
+# Yields CSV text, one chunk of rows at a time
+def stream_csv(header, rows, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(header)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+# Write-only byte buffer that hands out what was written since the last take()
+class ChunkBuffer(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_cell(value):
+    if isinstance(value, (int, float)) or hasattr(value, 'as_tuple'):  # numbers and Decimal
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, date):
+        value = value.isoformat()
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+# Yields an .xlsx file as bytes while rows are being read.
+# zipfile can write to a non-seekable stream, so each chunk of sheet rows
+# is compressed and handed out right away; cells use inline strings so no
+# shared-string table has to be kept in memory.
+def stream_xlsx(header, rows, chunk_size=CHUNK_SIZE):
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.take()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            lines = [''.join(['<row>', *map(xlsx_cell, header), '</row>'])]
+            for row in rows:
+                lines.append(''.join(['<row>', *map(xlsx_cell, row), '</row>']))
+                if len(lines) >= chunk_size:
+                    sheet.write(''.join(lines).encode())
+                    lines = []
+                    yield buffer.take()
+            sheet.write(''.join(lines).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+WRITERS = {
+    'csv': (stream_csv, 'text/csv'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
@@ -0,0 +1,118 @@
+import calendar
+import numpy as np
+from django.utils import timezone
+from ..models import MonthlyCategoryTotal
+from . import cache
+from .categories import get_registry
+from .trends import in_window, month_sequence, rollup_matrix
+
+# Month-end forecast and suggested budget of every category of a month.
+# The trailing history is a months x categories matrix read with ONE query
+# over the rollups; the models below run on the whole matrix at once
+# (NumPy, one pass over the months), whatever the number of categories:
+#   seasonal    the same month last year (seasonal naive)
+#   smoothed    simple exponential smoothing of the monthly totals
+#   baseline    average of both (smoothed alone without a year of history),
+#               the expected total of a full month
+#   run_rate    month-to-date actual extrapolated to the end of the month
+#   forecast    actual + the rest of the month, at a rate that moves from
+#               the baseline to the run rate as the month goes by
+#   suggested   baseline rounded to BUDGET_ROUNDING (up for expenses, down
+#               for income)
+HISTORY_MONTHS = 36
+SEASON = 12
+ALPHA = 0.3
+BUDGET_ROUNDING = 1000
+
+
+# Share of the month (year, month) that is over on `today`: 1 for past
+# months, 0 for future ones
+def elapsed_fraction(year, month, today):
+    if (year, month) < (today.year, today.month):
+        return 1.0
+    if (year, month) > (today.year, today.month):
+        return 0.0
+    return today.day / calendar.monthrange(year, month)[1]
+
+
+# history: months x categories totals, oldest first (the months before the
+# forecast month); actual: month-to-date totals per category.
+# Returns {model name: array with one value per category}.
+def forecast_matrix(history, actual, elapsed, alpha=ALPHA):
+    history = np.asarray(history, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    months, categories = history.shape
+    # A category's history starts at its first non-zero month: the zeros
+    # before it are "did not exist yet", not "spent nothing"
+    observed = history != 0
+    has_history = observed.any(axis=0)
+    first = np.where(has_history, observed.argmax(axis=0), months)
+
+    smoothed = np.zeros(categories)
+    for t in range(months):
+        smoothed = np.where(t <= first, history[t], alpha * history[t] + (1 - alpha) * smoothed)
+
+    if months >= SEASON:
+        seasonal = history[months - SEASON]
+        has_season = first <= months - SEASON
+    else:
+        seasonal = np.zeros(categories)
+        has_season = np.zeros(categories, dtype=bool)
+    baseline = np.where(has_season, (seasonal + smoothed) / 2, smoothed)
+
+    run_rate = actual / elapsed if elapsed else np.zeros(categories)
+    rate = elapsed * run_rate + (1 - elapsed) * baseline
+    forecast = actual + (1 - elapsed) * rate
+
+    return {
+        'seasonal': np.where(has_season, seasonal, np.nan),
+        'smoothed': np.where(has_history, smoothed, np.nan),
+        'baseline': baseline,
+        'run_rate': run_rate if elapsed else np.full(categories, np.nan),
+        'forecast': forecast,
+    }
+
+
+def suggested_budgets(baseline, income, rounding=BUDGET_ROUNDING):
+    steps = baseline / rounding
+    return np.where(income, np.floor(steps), np.ceil(steps)) * rounding
+
+
+def history_queryset(year, month, months=HISTORY_MONTHS):
+    window = month_sequence(year, month, months + 1)
+    return (
+        MonthlyCategoryTotal.objects
+        .filter(in_window(window[0], window[-1]))
+        .values_list('year', 'month', 'category_id', 'total')
+    )
+
+
+# {category_id: {'forecast', 'suggested', 'baseline', 'seasonal',
+# 'smoothed', 'run_rate'}} (ints, None where a model has no value) from
+# the rollup rows of the history window and the categories
+def build_forecast(year, month, rows, categories, today, months=HISTORY_MONTHS):
+    ids = np.array(sorted(category.id for category in categories), dtype=np.int64)
+    income = np.isin(ids, [category.id for category in categories if category.type == 'income'])
+    matrix = rollup_matrix(rows, month_sequence(year, month, months + 1), ids)
+
+    models = forecast_matrix(matrix[:-1], matrix[-1], elapsed_fraction(year, month, today))
+    models['suggested'] = suggested_budgets(models['baseline'], income)
+    return {
+        int(category_id): {
+            name: None if np.isnan(values[i]) else int(round(values[i]))
+            for name, values in models.items()
+        }
+        for i, category_id in enumerate(ids)
+    }
+
+
+# Cached until a transaction, budget or category changes, and per day (the
+# run rate of the current month moves with the date)
+def get_forecast(year, month, today=None):
+    today = today or timezone.localdate()
+    return cache.cached(
+        f'forecast:{year}-{month}:{today.isoformat()}',
+        [cache.CATEGORIES, cache.MONTHS],
+        lambda: build_forecast(year, month, list(history_queryset(year, month)), get_registry(), today),
+    )
+
@@ -0,0 +1,265 @@
+import csv
+import hashlib
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.utils import timezone
+from ..models import MonthlyBudget, Transaction
+from . import cache, rollups
+from .categories import get_registry
+
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d']
+CSV_COLUMNS = {'date', 'amount', 'description'}
+# Errors kept in the result; the count of all errors is always exact
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportRowError(Exception):
+    pass
+
+
+# Outcome of one import: counters + per-row errors (row number, message)
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ImportRowError(f'Invalid date "{value}"')
+
+
+def parse_amount(value):
+    try:
+        return Decimal(value.strip().replace(',', ''))
+    except InvalidOperation:
+        raise ImportRowError(f'Invalid amount "{value}"')
+
+
+# CSV with a header row: date, amount, description and optional category.
+# Reads line by line from any iterable of text lines (file, upload stream).
+# Yields (row_number, row) where row is a dict or an ImportRowError.
+def parse_csv(lines):
+    reader = csv.DictReader(lines)
+    header = {name.strip().lower() for name in reader.fieldnames or []}
+    missing = CSV_COLUMNS - header
+    if missing:
+        raise ImportRowError(f'Missing CSV column(s): {", ".join(sorted(missing))}')
+
+    for row in reader:
+        row = {(key or '').strip().lower(): (value or '') for key, value in row.items()}
+        try:
+            yield reader.line_num, {
+                'date': parse_date(row['date']),
+                'amount': parse_amount(row['amount']),
+                'description': row['description'].strip(),
+                'category': row.get('category', '').strip(),
+                'external_id': '',
+            }
+        except ImportRowError as error:
+            yield reader.line_num, error
+
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+# OFX (SGML or XML flavour) bank statements. Only <STMTTRN> blocks are kept
+# in memory, one at a time. OFX has no category: it is picked later from the
+# amount sign. FITID, the bank's transaction id, becomes part of the hash.
+def parse_ofx(lines):
+    current = None
+    for line_number, line in enumerate(lines, start=1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN' and not closing:
+                current = {'line': line_number}
+            elif tag == 'STMTTRN' and closing and current is not None:
+                yield current['line'], build_ofx_row(current)
+                current = None
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+def build_ofx_row(fields):
+    try:
+        if 'DTPOSTED' not in fields or 'TRNAMT' not in fields:
+            raise ImportRowError('Transaction without DTPOSTED or TRNAMT')
+        return {
+            'date': parse_date(fields['DTPOSTED'][:8]),
+            'amount': parse_amount(fields['TRNAMT']),
+            'description': fields.get('NAME') or fields.get('MEMO', ''),
+            'category': '',
+            'external_id': fields.get('FITID', ''),
+        }
+    except ImportRowError as error:
+        return error
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+# occurrence numbers identical rows within one file (0 for the first one), so
+# real repeats (two coffees on the same day) are kept while importing the same
+# file again still finds every row. The first occurrence hashes as before.
+def content_hash(row, category_id, amount, occurrence=0):
+    parts = [row['date'].isoformat(), str(amount), row['description'], str(category_id), row['external_id']]
+    if occurrence:
+        parts.append(str(occurrence))
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+# Streams parsed rows into the database in chunks:
+#   - categories resolved through an in-memory name -> [(id, type)] map
+#   - MonthlyBudget of each month attached (created when missing)
+#   - rows whose content hash already exists are counted as duplicates, also
+#     when a concurrent import inserts them first (the chunk is retried)
+#   - each chunk is written with COPY (PostgreSQL + psycopg 3) or bulk_create,
+#     together with its rollup update, in one db transaction
+class TransactionImporter:
+    def __init__(self, default_expense_category=None, default_income_category=None, chunk_size=5000):
+        self.default_categories = {
+            'expense': default_expense_category.id if default_expense_category else None,
+            'income': default_income_category.id if default_income_category else None,
+        }
+        self.chunk_size = chunk_size
+        self.categories = {}
+        for category in get_registry():
+            self.categories.setdefault(category.name.lower(), []).append((category.id, category.type))
+        self.budget_ids = {
+            (year, month): budget_id for budget_id, year, month in MonthlyBudget.objects.values_list('id', 'year', 'month')
+        }
+        # content hash of a row -> how many identical rows came before it
+        self.occurrences = {}
+        self.result = ImportResult()
+
+    def run(self, parsed_rows):
+        parsed_rows = iter(parsed_rows)
+        while chunk := list(islice(parsed_rows, self.chunk_size)):
+            self.import_chunk(chunk)
+        return self.result
+
+    # Category of a row: by name when given (sign decides between an income
+    # and an expense category with the same name), else the default for the sign.
+    def resolve_category(self, row):
+        type = 'expense' if row['amount'] < 0 else 'income'
+        if not row['category']:
+            category_id = self.default_categories[type]
+            if category_id is None:
+                raise ImportRowError(f'No category given and no default {type} category set')
+            return category_id
+
+        candidates = self.categories.get(row['category'].lower())
+        if not candidates:
+            raise ImportRowError(f'Unknown category "{row["category"]}"')
+        if len(candidates) == 1:
+            return candidates[0][0]
+        for category_id, category_type in candidates:
+            if category_type == type:
+                return category_id
+        return candidates[0][0]
+
+    def monthly_budget_id(self, date):
+        key = (date.year, date.month)
+        if key not in self.budget_ids:
+            budget, created = MonthlyBudget.objects.get_or_create(year=date.year, month=date.month)
+            self.budget_ids[key] = budget.id
+        return self.budget_ids[key]
+
+    def build_transaction(self, row):
+        if not row['description']:
+            raise ImportRowError('Empty description')
+        amount = abs(row['amount']).quantize(Decimal('1'))
+        if amount == 0:
+            raise ImportRowError('Amount must be greater than 0')
+        category_id = self.resolve_category(row)
+        first_hash = content_hash(row, category_id, amount)
+        occurrence = self.occurrences.get(first_hash, 0)
+        self.occurrences[first_hash] = occurrence + 1
+        return Transaction(
+            description=row['description'][:255],
+            amount=amount,
+            date=row['date'],
+            category_id=category_id,
+            monthly_budget_id=self.monthly_budget_id(row['date']),
+            import_hash=content_hash(row, category_id, amount, occurrence),
+        )
+
+    def import_chunk(self, chunk):
+        transactions = {}
+        for row_number, row in chunk:
+            if isinstance(row, ImportRowError):
+                self.result.add_error(row_number, str(row))
+                continue
+            try:
+                transaction = self.build_transaction(row)
+            except ImportRowError as error:
+                self.result.add_error(row_number, str(error))
+                continue
+            if transaction.import_hash in transactions:
+                self.result.duplicates += 1
+                continue
+            transactions[transaction.import_hash] = transaction
+
+        existing = self.existing_hashes(transactions)
+        while True:
+            new_transactions = [t for h, t in transactions.items() if h not in existing]
+            try:
+                with db_transaction.atomic():
+                    self.insert(new_transactions)
+                    rollups.record_transactions_added(new_transactions)
+                break
+            except IntegrityError:
+                # Another import inserted some of these rows since the lookup
+                # (txn_tenant_import_hash_uniq): look again and skip them. No
+                # new hashes found means the error came from something else.
+                found = self.existing_hashes(transactions)
+                if found <= existing:
+                    raise
+                existing = found
+        self.result.duplicates += len(existing)
+        # Bulk inserts send no signals: invalidate the touched months here
+        cache.invalidate_months({(t.date.year, t.date.month) for t in new_transactions})
+        self.result.created += len(new_transactions)
+
+    def existing_hashes(self, transactions):
+        return set(Transaction.objects.filter(import_hash__in=list(transactions)).values_list('import_hash', flat=True))
+
+    def insert(self, transactions):
+        if not transactions:
+            return
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql' and hasattr(cursor.cursor, 'copy'):
+                self.copy_insert(cursor.cursor, transactions)
+                return
+        Transaction.objects.bulk_create(transactions, batch_size=self.chunk_size)
+
+    # COPY ... FROM STDIN: the fastest way to load rows into PostgreSQL
+    def copy_insert(self, cursor, transactions):
+        now = timezone.now()
+        columns = ['tenant_id', 'description', 'amount', 'date', 'category_id', 'monthly_budget_id', 'import_hash',
+                   'created_at']
+        sql = f'COPY {Transaction._meta.db_table} ({", ".join(columns)}) FROM STDIN'
+        # psycopg errors raised by COPY are not wrapped by Django's cursor
+        with connection.wrap_database_errors, cursor.copy(sql) as copy:
+            for t in transactions:
+                copy.write_row((
+                    t.tenant_id, t.description, t.amount, t.date, t.category_id, t.monthly_budget_id, t.import_hash, now
+                ))
@@ -0,0 +1,205 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+# In-process request metrics per URL name, filled by
+# expenses.middleware.QueryMetricsMiddleware for sampled requests:
+# - cumulative histograms (latency, query count) for Prometheus
+# - a rolling window of the last WINDOW samples for percentiles
+# - the most repeated SQL signatures, and how often a request looked like an N+1
+WINDOW = 500
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100)
+# A statement repeated this many times in one request is reported as an N+1
+N_PLUS_ONE_THRESHOLD = 5
+TOP_DUPLICATES = 10
+
+# Metrics of the request being handled, None when it is not sampled
+current = ContextVar('expenses_request_metrics', default=None)
+
+_lock = threading.Lock()
+views = {}
+
+_IN_LIST = re.compile(r'\((?:%s|\?)(?:\s*,\s*(?:%s|\?))+\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+# Same statement with different values -> same signature
+def signature(sql):
+    return _NUMBER.sub('N', _IN_LIST.sub('(...)', sql))
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.render_ms = 0.0
+        self.render_depth = 0
+        self.signatures = Counter()
+
+    def add_query(self, sql, elapsed_ms):
+        self.queries += 1
+        self.sql_ms += elapsed_ms
+        self.signatures[signature(sql)] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.signatures.items() if count > 1}
+
+
+# Execute wrapper of every database connection (installed when it connects,
+# see expenses/signals.py): times the queries of the sampled request.
+# It follows `current`, not a connection: the async ORM runs its queries in
+# sync_to_async worker threads, on the connection of that thread, and the
+# context (and so `current`) is copied into them. Outside of a sampled
+# request it costs one ContextVar lookup.
+def query_timer(execute, sql, params, many, context):
+    request_metrics = current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.add_query(sql, (time.perf_counter() - started) * 1000)
+
+
+# First in the list: connection.execute_wrapper() blocks pop the last one
+def install_query_timer(connection):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_timer)
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.sampled = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.queries_sum = 0
+        self.query_buckets = [0] * len(QUERY_BUCKETS)
+        self.sql_ms_sum = 0.0
+        self.render_ms_sum = 0.0
+        self.n_plus_one = 0
+        self.duplicates = Counter()
+        self.window = deque(maxlen=WINDOW)
+
+
+def _view(name):
+    if name not in views:
+        views[name] = ViewMetrics()
+    return views[name]
+
+
+def _observe(buckets, bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            buckets[i] += 1
+
+
+def count_request(name):
+    with _lock:
+        _view(name).requests += 1
+
+
+def record(name, duration_ms, request_metrics):
+    duplicates = request_metrics.duplicates()
+    with _lock:
+        view = _view(name)
+        view.sampled += 1
+        view.latency_sum += duration_ms
+        _observe(view.latency_buckets, LATENCY_BUCKETS_MS, duration_ms)
+        view.queries_sum += request_metrics.queries
+        _observe(view.query_buckets, QUERY_BUCKETS, request_metrics.queries)
+        view.sql_ms_sum += request_metrics.sql_ms
+        view.render_ms_sum += request_metrics.render_ms
+        if any(count >= N_PLUS_ONE_THRESHOLD for count in duplicates.values()):
+            view.n_plus_one += 1
+        view.duplicates.update(duplicates)
+        if len(view.duplicates) > TOP_DUPLICATES * 10:
+            view.duplicates = Counter(dict(view.duplicates.most_common(TOP_DUPLICATES)))
+        view.window.append((duration_ms, request_metrics.queries, request_metrics.sql_ms, request_metrics.render_ms))
+
+
+def reset():
+    with _lock:
+        views.clear()
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[round(p / 100 * (len(values) - 1))]
+
+
+def get_report():
+    report = {}
+    with _lock:
+        for name, view in sorted(views.items()):
+            samples = list(view.window)
+            row = {
+                'requests': view.requests,
+                'sampled': view.sampled,
+                'n_plus_one': view.n_plus_one,
+                'duplicated_queries': [
+                    {'sql': sql, 'count': count} for sql, count in view.duplicates.most_common(TOP_DUPLICATES)
+                ],
+            }
+            if samples:
+                for i, metric in enumerate(['latency_ms', 'queries', 'sql_ms', 'render_ms']):
+                    values = [sample[i] for sample in samples]
+                    row[metric] = {
+                        'p50': round(_percentile(values, 50), 3),
+                        'p95': round(_percentile(values, 95), 3),
+                        'p99': round(_percentile(values, 99), 3),
+                    }
+            report[name] = row
+    return report
+
+
+def _histogram(lines, metric, view, buckets, bounds, total, count):
+    for bound, value in zip(bounds, buckets):
+        lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {value}')
+    lines.append(f'{metric}_bucket{{view="{view}",le="+Inf"}} {count}')
+    lines.append(f'{metric}_sum{{view="{view}"}} {total}')
+    lines.append(f'{metric}_count{{view="{view}"}} {count}')
+
+
+# Prometheus text exposition format (version 0.0.4)
+def prometheus_text():
+    lines = [
+        '# HELP expenses_requests_total Requests per view (all, not only sampled).',
+        '# TYPE expenses_requests_total counter',
+    ]
+    with _lock:
+        items = sorted(views.items())
+        for name, view in items:
+            lines.append(f'expenses_requests_total{{view="{name}"}} {view.requests}')
+
+        lines += [
+            '# HELP expenses_request_duration_ms Latency of sampled requests in milliseconds.',
+            '# TYPE expenses_request_duration_ms histogram',
+        ]
+        for name, view in items:
+            _histogram(lines, 'expenses_request_duration_ms', name, view.latency_buckets,
+                       LATENCY_BUCKETS_MS, round(view.latency_sum, 3), view.sampled)
+
+        lines += [
+            '# HELP expenses_request_queries Database queries per sampled request.',
+            '# TYPE expenses_request_queries histogram',
+        ]
+        for name, view in items:
+            _histogram(lines, 'expenses_request_queries', name, view.query_buckets,
+                       QUERY_BUCKETS, view.queries_sum, view.sampled)
+
+        for metric, attr, help_text in [
+            ('expenses_sql_ms_total', 'sql_ms_sum', 'Time spent in SQL by sampled requests.'),
+            ('expenses_render_ms_total', 'render_ms_sum', 'Time spent rendering templates by sampled requests.'),
+            ('expenses_n_plus_one_total', 'n_plus_one', 'Sampled requests with a statement repeated '
+                                                       f'{N_PLUS_ONE_THRESHOLD}+ times.'),
+        ]:
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for name, view in items:
+                value = getattr(view, attr)
+                lines.append(f'{metric}{{view="{name}"}} {round(value, 3) if isinstance(value, float) else value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,113 @@
+import asyncio
+from ..models import CategoryBudget, MonthlyCategoryTotal
+from . import alist
+from .categories import aget_registry, get_registry
+
+
+# Budget vs Actual report of one month.
+# Built from 2 queries no matter how many categories exist:
+#   1. actual amounts per category (from the monthly rollups)
+#   2. budgeted amounts of the month
+# plus the categories of the category registry (no query once loaded).
+class MonthReport:
+    def __init__(self, monthly_budget):
+        self.monthly_budget = monthly_budget
+        self.year = monthly_budget.year
+        self.month = monthly_budget.month
+        self.income_data = []
+        self.expense_data = []
+
+    def actuals_queryset(self):
+        return (
+            MonthlyCategoryTotal.objects
+            .filter(year=self.year, month=self.month)
+            .values_list('category_id', 'total')
+        )
+
+    def budgets_queryset(self):
+        return (
+            CategoryBudget.objects
+            .filter(monthly_budget=self.monthly_budget)
+            .values_list('category_id', 'budgeted_amount')
+        )
+
+    @classmethod
+    def build(cls, monthly_budget):
+        report = cls(monthly_budget)
+        report.add_rows(
+            dict(report.actuals_queryset()),
+            dict(report.budgets_queryset()),
+            get_registry(),
+        )
+        return report
+
+    # Async version: the independent queries are started together
+    @classmethod
+    async def abuild(cls, monthly_budget):
+        report = cls(monthly_budget)
+        actuals, budgets, categories = await asyncio.gather(
+            alist(report.actuals_queryset()),
+            alist(report.budgets_queryset()),
+            aget_registry(),
+        )
+        report.add_rows(dict(actuals), dict(budgets), categories)
+        return report
+
+    def add_rows(self, actuals, budgets, categories):
+        for category in categories:
+            budgeted = budgets.get(category.id, 0)
+            actual = actuals.get(category.id) or 0
+            item = {
+                'category': category,
+                'budgeted': budgeted,
+                'actual': actual,
+                'difference': budgeted - actual,
+            }
+            if category.type == 'income':
+                self.income_data.append(item)
+            else:
+                self.expense_data.append(item)
+
+    @property
+    def total_income_budgeted(self):
+        return sum(item['budgeted'] for item in self.income_data)
+
+    @property
+    def total_income_actual(self):
+        return sum(item['actual'] for item in self.income_data)
+
+    @property
+    def total_expense_budgeted(self):
+        return sum(item['budgeted'] for item in self.expense_data)
+
+    @property
+    def total_expense_actual(self):
+        return sum(item['actual'] for item in self.expense_data)
+
+    @property
+    def total_expense_difference(self):
+        return self.total_expense_budgeted - self.total_expense_actual
+
+    @property
+    def total_income_difference(self):
+        return self.total_income_actual - self.total_income_budgeted
+
+    @property
+    def balance(self):
+        return self.total_income_actual - self.total_expense_actual
+
+    # Context variables used by monthly/month_detail.html
+    def to_context(self):
+        return {
+            'income_data': self.income_data,
+            'expense_data': self.expense_data,
+            'total_income_budgeted': self.total_income_budgeted,
+            'total_income_actual': self.total_income_actual,
+            'total_expense_budgeted': self.total_expense_budgeted,
+            'total_expense_actual': self.total_expense_actual,
+            'total_expense_difference': self.total_expense_difference,
+            'total_income_difference': self.total_income_difference,
+            'month_expense': self.total_expense_actual,
+            'month_income': self.total_income_actual,
+            'month_balance': self.balance,
+        }
@@ -0,0 +1,46 @@
+from django.db.models import Sum, Q
+from ..models import MonthlyCategoryTotal
+from . import alist
+
+
+# Income / expense / balance of every month, computed in ONE grouped query
+# over the per-month/per-category rollups (O(months x categories) rows)
+# instead of 2 aggregates over raw transactions per month.
+def summaries_queryset():
+    return (
+        MonthlyCategoryTotal.objects
+        .values('year', 'month')
+        .annotate(
+            income=Sum('total', filter=Q(category__type='income')),
+            expense=Sum('total', filter=Q(category__type='expense')),
+        )
+        .order_by()
+    )
+
+
+# Rows of summaries_queryset() -> dict keyed by (year, month)
+def build_summaries(rows):
+    summaries = {}
+    for row in rows:
+        income = row['income'] or 0
+        expense = row['expense'] or 0
+        summaries[(row['year'], row['month'])] = {
+            'income': income,
+            'expense': expense,
+            'balance': income - expense,
+        }
+    return summaries
+
+
+def get_month_summaries():
+    return build_summaries(list(summaries_queryset()))
+
+
+# Summary of a single month, with zeros when the month has no transactions.
+def get_month_summary(summaries, year, month):
+    return summaries.get((year, month), {'income': 0, 'expense': 0, 'balance': 0})
+
+
+# Async version for the async views (async ORM iteration)
+async def aget_month_summaries():
+    return build_summaries(await alist(summaries_queryset()))
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import date, datetime
+from django.db import connections
+from django.db.models import Q
+from . import alist
+
+PAGE_SIZE = 50
+# Larger results are counted from the planner's estimate (approximate_count)
+EXACT_COUNT_LIMIT = 10_000
+
+# Transactions in display order (Transaction.Meta.ordering + pk as tie breaker)
+KEYSET_ORDERING = ['-date', '-created_at', '-pk']
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(transaction):
+    raw = f'{transaction.date.isoformat()}|{transaction.created_at.isoformat()}|{transaction.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, created_at, pk = raw.split('|')
+        return date.fromisoformat(day), datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise InvalidCursor(f'Invalid cursor "{cursor}"') from error
+
+
+# Keyset (seek) pagination: the next page starts right after the last row
+# seen, so page N costs the same as page 1 (no OFFSET scan).
+# Returns (rows, next_cursor); next_cursor is None on the last page.
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    rows = list(_seek(queryset, cursor)[:page_size + 1])
+    return _split_page(rows, page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    rows = await alist(_seek(queryset, cursor)[:page_size + 1])
+    return _split_page(rows, page_size)
+
+
+def _seek(queryset, cursor):
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    if cursor:
+        day, created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(date__lt=day)
+            | Q(date=day, created_at__lt=created_at)
+            | Q(date=day, created_at=created_at, pk__lt=pk)
+        )
+    return queryset
+
+
+# One extra row was fetched to know whether there is a next page
+def _split_page(rows, page_size):
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+# Row count of a queryset for display ("about 4,812,000 transactions").
+# On PostgreSQL the planner's estimate is used when it is above exact_limit:
+# it comes from the table statistics (pg_class.reltuples scaled by the
+# selectivity of the filters, from pg_statistic) and costs no scan, while
+# COUNT(*) reads every matching row. Returns (count, estimated).
+def approximate_count(queryset, exact_limit=EXACT_COUNT_LIMIT):
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate > exact_limit:
+            return estimate, True
+    return queryset.count(), False
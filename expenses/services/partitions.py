@@ -0,0 +1,235 @@
+import importlib
+import re
+from datetime import date
+from django.db import models
+
+search_indexes = importlib.import_module('expenses.migrations.0013_transaction_search_indexes')
+
+# Optional PostgreSQL declarative partitioning of the transactions table.
+#   tenant  HASH (tenant_id): a tenant's rows live in one partition
+#   year    RANGE (date), one partition per year
+#   month   RANGE (date), one partition per month
+# Date layouts can hash-subpartition every period by tenant as well. Reads
+# of recent months only touch recent partitions, closed periods can be
+# detached and dropped by the archival (services/archive.py) without a
+# DELETE, and autovacuum only has work on the partitions that change.
+#
+# PostgreSQL requires every partition key column in the primary key and in
+# unique constraints: the primary key becomes (id, <keys>), and unique
+# constraints lacking a key column become plain indexes (the importer and
+# the recurring materializer check for existing rows before inserting).
+TENANT = 'tenant'
+YEAR = 'year'
+MONTH = 'month'
+LAYOUTS = [TENANT, YEAR, MONTH]
+
+
+def period_start(day, interval):
+    return date(day.year, 1, 1) if interval == YEAR else date(day.year, day.month, 1)
+
+
+def next_period(start, interval):
+    if interval == YEAR:
+        return date(start.year + 1, 1, 1)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+# Period starts from the period of `first` to the period of `last`
+def periods(first, last, interval):
+    start = period_start(first, interval)
+    while start <= last:
+        yield start
+        start = next_period(start, interval)
+
+
+def partition_name(table, start, interval):
+    if interval == YEAR:
+        return f'{table}_y{start.year}'
+    return f'{table}_m{start.year}_{start.month:02d}'
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [table])
+        return cursor.fetchone() is not None
+
+
+# Names of the direct partitions of table
+def existing_partitions(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [table],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+# (interval, period start) of a date partition name, None for other names
+def parse_partition_name(table, name):
+    match = re.fullmatch(rf'{table}_(?:y(\d{{4}})|m(\d{{4}})_(\d\d))', name)
+    if match is None:
+        return None
+    year, month_year, month = match.groups()
+    return (YEAR, date(int(year), 1, 1)) if year else (MONTH, date(int(month_year), int(month), 1))
+
+
+# Starts of the date partitions and their interval (None when not date-partitioned)
+def date_partitions(connection, table):
+    parsed = [parse_partition_name(table, name) for name in existing_partitions(connection, table)]
+    parsed = [item for item in parsed if item]
+    if not parsed:
+        return None, []
+    return parsed[0][0], sorted(start for _, start in parsed)
+
+
+def _hash_partitions_sql(qn, parent, count):
+    return [
+        f'CREATE TABLE {qn(f"{parent}_h{remainder}")} PARTITION OF {qn(parent)} '
+        f'FOR VALUES WITH (MODULUS {count}, REMAINDER {remainder})'
+        for remainder in range(count)
+    ]
+
+
+# One date partition, itself hash-partitioned by tenant when tenant_partitions > 1
+def _period_partition_sql(qn, table, start, interval, tenant_partitions):
+    name = partition_name(table, start, interval)
+    sql = (
+        f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_period(start, interval).isoformat()}')"
+    )
+    if tenant_partitions > 1:
+        return [f'{sql} PARTITION BY HASH (tenant_id)', *_hash_partitions_sql(qn, name, tenant_partitions)]
+    return [sql]
+
+
+def _default_partition_sql(qn, table, tenant_partitions):
+    name = f'{table}_default'
+    sql = f'CREATE TABLE {qn(name)} PARTITION OF {qn(table)} DEFAULT'
+    if tenant_partitions > 1:
+        return [f'{sql} PARTITION BY HASH (tenant_id)', *_hash_partitions_sql(qn, name, tenant_partitions)]
+    return [sql]
+
+
+# Statements converting the (unpartitioned) transactions table of `model`
+# into the given layout, copying its rows. Date layouts get one partition
+# per period from the oldest transaction to `until`, plus a DEFAULT
+# partition for dates outside of them.
+def partition_sql(model, connection, layout, partitions=16, tenant_partitions=0, until=None):
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    old_table = f'{table}_unpartitioned'
+    sequence = f'{table}_part_id_seq'
+    columns = ', '.join(qn(field.column) for field in model._meta.concrete_fields)
+    keys = ['tenant_id'] if layout == TENANT else ['date'] + (['tenant_id'] if tenant_partitions > 1 else [])
+    partition_by = 'HASH (tenant_id)' if layout == TENANT else 'RANGE (date)'
+
+    statements = [
+        f'ALTER TABLE {qn(table)} RENAME TO {qn(old_table)}',
+        # Same columns and defaults; indexes and constraints are added after
+        # the copy. The identity id becomes a plain sequence, which
+        # partitioned tables support on every PostgreSQL version.
+        f'CREATE TABLE {qn(table)} (LIKE {qn(old_table)} INCLUDING DEFAULTS) PARTITION BY {partition_by}',
+        f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id',
+        f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+    ]
+    if layout == TENANT:
+        statements += [
+            f'CREATE TABLE {qn(f"{table}_p{remainder}")} PARTITION OF {qn(table)} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+            for remainder in range(partitions)
+        ]
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN(date) FROM {qn(table)}')
+            first = cursor.fetchone()[0]
+        until = until or date.today()
+        for start in periods(first or until, until, layout):
+            statements += _period_partition_sql(qn, table, start, layout, tenant_partitions)
+        statements += _default_partition_sql(qn, table, tenant_partitions)
+
+    statements += [
+        f'INSERT INTO {qn(table)} ({columns}) SELECT {columns} FROM {qn(old_table)}',
+        f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {qn(table)}), 0) + 1, false)",
+        f'DROP TABLE {qn(old_table)}',
+        f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f"{table}_pkey")} PRIMARY KEY (id, {", ".join(keys)})',
+    ]
+
+    # Foreign keys and their indexes, as Django creates them
+    for field in model._meta.concrete_fields:
+        if not field.remote_field:
+            continue
+        target = field.remote_field.model._meta
+        statements.append(
+            f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f"{table}_{field.column}_fk")} '
+            f'FOREIGN KEY ({qn(field.column)}) REFERENCES {qn(target.db_table)} ({qn(target.pk.column)}) '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+        # tenant_id is the first column of the composite indexes
+        if field.db_index and field.name != 'tenant':
+            statements.append(f'CREATE INDEX {qn(f"{table}_{field.column}_idx")} ON {qn(table)} ({qn(field.column)})')
+
+    # The model's indexes and unique constraints, created on the parent
+    # table and so on every partition
+    key_fields = {model._meta.get_field(key.removesuffix('_id')).name for key in keys}
+    with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+        for index in model._meta.indexes:
+            editor.add_index(model, index)
+        for constraint in model._meta.constraints:
+            if key_fields <= set(getattr(constraint, 'fields', ())):
+                editor.add_constraint(model, constraint)
+            else:
+                editor.add_index(model, models.Index(fields=constraint.fields, name=constraint.name))
+    statements += [sql.rstrip(';') for sql in editor.collected_sql]
+
+    # Search indexes of migration 0013 (CONCURRENTLY is not possible on a
+    # partitioned table, the table is locked anyway)
+    statements += [f'CREATE INDEX {name} ON {qn(table)} {definition}' for name, definition in search_indexes.INDEXES]
+    statements.append(f'ANALYZE {qn(table)}')
+    return statements
+
+
+# Statements adding the missing date partitions up to `until` (run ahead of
+# time, e.g. monthly from cron). Rows that were stored in the DEFAULT
+# partition meanwhile are moved into the new partitions.
+def extend_sql(model, connection, until, tenant_partitions=0):
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    interval, starts = date_partitions(connection, table)
+    if interval is None:
+        return []
+    missing = list(periods(next_period(starts[-1], interval), until, interval))
+    if not missing:
+        return []
+
+    default = f'{table}_default'
+    columns = ', '.join(qn(field.column) for field in model._meta.concrete_fields)
+    statements = [f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}']
+    for start in missing:
+        statements += _period_partition_sql(qn, table, start, interval, tenant_partitions)
+    statements += [
+        f"WITH moved AS (DELETE FROM {qn(default)} WHERE date >= '{missing[0].isoformat()}' "
+        f"AND date < '{next_period(missing[-1], interval).isoformat()}' RETURNING {columns}) "
+        f'INSERT INTO {qn(table)} ({columns}) SELECT {columns} FROM moved',
+        f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT',
+    ]
+    return statements
+
+
+# Statements detaching and dropping the partitions that hold exactly the
+# given year; None when the year is not stored in its own partitions (the
+# rows then have to be deleted)
+def drop_year_sql(connection, table, year):
+    qn = connection.ops.quote_name
+    interval, starts = date_partitions(connection, table)
+    if interval is None:
+        return None
+    wanted = list(periods(date(year, 1, 1), date(year, 12, 31), interval))
+    if not set(wanted) <= set(starts):
+        return None
+    names = [partition_name(table, start, interval) for start in wanted]
+    return [
+        sql
+        for name in names
+        for sql in (f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}', f'DROP TABLE {qn(name)}')
+    ]
@@ -0,0 +1,19 @@
+from datetime import date
+
+
+# Half-open date range [first day of month, first day of next month).
+# Filtering with date__gte/date__lt can use the (date, category) index,
+# unlike date__month which wraps the column in EXTRACT().
+def month_bounds(year, month):
+    start = date(year, month, 1)
+    if month == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month + 1, 1)
+    return start, end
+
+
+# Filter a Transaction queryset to one month using the half-open range
+def filter_month(transactions, year, month):
+    start, end = month_bounds(year, month)
+    return transactions.filter(date__gte=start, date__lt=end)
@@ -0,0 +1,176 @@
+import calendar
+from dataclasses import dataclass
+from datetime import timedelta
+from django.db import transaction as db_transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from ..models import MonthlyBudget, RecurringTransaction, Transaction
+from . import cache, rollups
+
+# Turns RecurringTransaction rules into Transactions.
+# Rules are read in chunks; their due occurrences (materialized_until, until]
+# are generated in memory and written per batch of whole rules:
+#   - missing MonthlyBudget rows: one ignore_conflicts insert
+#   - occurrences: one bulk_create(ignore_conflicts=True); the unique
+#     (recurring, occurrence_date) constraint makes a second run a no-op
+#   - rollups and materialized_until updated in the same db transaction
+BATCH_SIZE = 20000
+RULE_CHUNK = 1000
+
+
+def _monthly(rule, first, last):
+    index = rule.start_date.year * 12 + rule.start_date.month - 1
+    first_index = first.year * 12 + first.month - 1
+    if first_index > index:
+        # first month of the schedule that is not before `first`
+        index += -(-(first_index - index) // rule.interval) * rule.interval
+    while True:
+        year, month = divmod(index, 12)
+        month += 1
+        # the 31st becomes the last day of shorter months
+        day = min(rule.start_date.day, calendar.monthrange(year, month)[1])
+        occurrence = rule.start_date.replace(year=year, month=month, day=day)
+        if occurrence > last:
+            return
+        if occurrence >= first:
+            yield occurrence
+        index += rule.interval
+
+
+def _every_n_days(rule, first, last, days):
+    step = timedelta(days=days)
+    occurrence = rule.start_date
+    if first > occurrence:
+        occurrence += step * -(-(first - occurrence).days // days)
+    while occurrence <= last:
+        yield occurrence
+        occurrence += step
+
+
+# Occurrence dates of a rule between first and last (inclusive)
+def occurrences(rule, first, last):
+    first = max(first, rule.start_date)
+    if rule.end_date:
+        last = min(last, rule.end_date)
+    if first > last:
+        return iter(())
+    if rule.frequency == 'monthly':
+        return _monthly(rule, first, last)
+    if rule.frequency == 'weekly':
+        return _every_n_days(rule, first, last, 7 * rule.interval)
+    return _every_n_days(rule, first, last, rule.interval)
+
+
+def due_rules(until):
+    return (
+        RecurringTransaction.objects
+        .filter(active=True, start_date__lte=until)
+        .filter(Q(materialized_until__isnull=True) | Q(materialized_until__lt=until))
+        .filter(Q(end_date__isnull=True) | Q(materialized_until__isnull=True) | Q(materialized_until__lt=F('end_date')))
+        .order_by('pk')
+    )
+
+
+@dataclass
+class MaterializeResult:
+    rules: int = 0
+    created: int = 0
+    skipped: int = 0
+
+
+class Materializer:
+    def __init__(self, until=None, batch_size=BATCH_SIZE):
+        self.until = until or timezone.localdate()
+        self.batch_size = batch_size
+        self.budget_ids = {
+            (year, month): budget_id for budget_id, year, month in MonthlyBudget.objects.values_list('id', 'year', 'month')
+        }
+        self.result = MaterializeResult()
+
+    def run(self):
+        batch = []
+        pending = 0
+        for rule in self.rules():
+            start = rule.materialized_until + timedelta(days=1) if rule.materialized_until else rule.start_date
+            dates = list(occurrences(rule, start, self.until))
+            batch.append((rule, dates))
+            pending += len(dates)
+            if pending >= self.batch_size:
+                self.write(batch)
+                batch, pending = [], 0
+        if batch:
+            self.write(batch)
+        return self.result
+
+    # Due rules in chunks of RULE_CHUNK, by primary key (the rules are
+    # updated while they are read, so no open cursor over them)
+    def rules(self):
+        last_pk = 0
+        while chunk := list(due_rules(self.until).filter(pk__gt=last_pk)[:RULE_CHUNK]):
+            yield from chunk
+            last_pk = chunk[-1].pk
+
+    def ensure_budgets(self, periods):
+        missing = [period for period in periods if period not in self.budget_ids]
+        if not missing:
+            return
+        MonthlyBudget.objects.bulk_create(
+            [MonthlyBudget(year=year, month=month) for year, month in missing], ignore_conflicts=True
+        )
+        years = {year for year, _ in missing}
+        for budget_id, year, month in MonthlyBudget.objects.filter(year__in=years).values_list('id', 'year', 'month'):
+            self.budget_ids[(year, month)] = budget_id
+
+    def write(self, batch):
+        with db_transaction.atomic():
+            # Lock the rules: a concurrent run that got there first has moved
+            # materialized_until, and its rules are skipped here.
+            current = dict(
+                RecurringTransaction.objects.select_for_update()
+                .filter(pk__in=[rule.pk for rule, _ in batch])
+                .values_list('pk', 'materialized_until')
+            )
+            batch = [(rule, dates) for rule, dates in batch if current.get(rule.pk, False) == rule.materialized_until]
+
+            self.ensure_budgets({(d.year, d.month) for _, dates in batch for d in dates})
+            transactions = [
+                Transaction(
+                    description=rule.description,
+                    amount=rule.amount,
+                    date=occurrence,
+                    category_id=rule.category_id,
+                    monthly_budget_id=self.budget_ids[(occurrence.year, occurrence.month)],
+                    recurring_id=rule.pk,
+                    occurrence_date=occurrence,
+                )
+                for rule, dates in batch
+                for occurrence in dates
+            ]
+            # Occurrences that exist although the watermark says otherwise
+            # (e.g. materialized_until reset by hand) are left alone
+            existing = set()
+            if transactions:
+                existing = set(
+                    Transaction.objects
+                    .filter(recurring_id__in=[rule.pk for rule, _ in batch])
+                    .filter(occurrence_date__gte=min(t.occurrence_date for t in transactions))
+                    .values_list('recurring_id', 'occurrence_date')
+                )
+            new_transactions = [t for t in transactions if (t.recurring_id, t.occurrence_date) not in existing]
+
+            Transaction.objects.bulk_create(new_transactions, batch_size=self.batch_size, ignore_conflicts=True)
+            rollups.record_transactions_added(new_transactions)
+
+            for rule, _ in batch:
+                rule.materialized_until = min(self.until, rule.end_date) if rule.end_date else self.until
+            RecurringTransaction.objects.bulk_update([rule for rule, _ in batch], ['materialized_until'])
+
+        # Bulk inserts send no signals: invalidate the touched months here
+        cache.invalidate_months({(t.date.year, t.date.month) for t in new_transactions})
+        self.result.rules += len(batch)
+        self.result.created += len(new_transactions)
+        self.result.skipped += len(transactions) - len(new_transactions)
+
+
+def materialize(until=None, batch_size=BATCH_SIZE):
+    return Materializer(until, batch_size).run()
@@ -0,0 +1,175 @@
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from ..models import ArchivedYear, BudgetAlert, MonthlyCategoryTotal, Transaction
+from . import alerts, balances, cache
+from .categories import get_categories, get_category
+
+
+# Add amount/count to the rollup row of (year, month, category) and move
+# the running balance snapshots by the signed amount. Returns the key, for
+# the budget alert check (services/alerts.py).
+# Uses F() updates so concurrent writers don't overwrite each other.
+def _apply(year, month, category_id, amount, count):
+    rollup, created = MonthlyCategoryTotal.objects.get_or_create(
+        year=year, month=month, category_id=category_id
+    )
+    MonthlyCategoryTotal.objects.filter(pk=rollup.pk).update(
+        total=F('total') + amount,
+        count=F('count') + count,
+    )
+    category_type = get_category(category_id).type
+    balances.apply_delta(year, month, amount if category_type == 'income' else -amount)
+    return (year, month, category_id)
+
+
+# Call these inside the same db transaction as the Transaction write.
+def record_transaction_added(transaction):
+    alerts.check([_added(transaction)])
+
+
+def record_transaction_removed(transaction):
+    alerts.check([_removed(transaction)])
+
+
+def _added(transaction):
+    return _apply(transaction.date.year, transaction.date.month, transaction.category_id, transaction.amount, 1)
+
+
+def _removed(transaction):
+    return _apply(transaction.date.year, transaction.date.month, transaction.category_id, -transaction.amount, -1)
+
+
+# Bulk version for imports and recurring transactions
+def record_transactions_added(transactions):
+    totals = {}
+    for transaction in transactions:
+        key = (transaction.date.year, transaction.date.month, transaction.category_id)
+        amount, count = totals.get(key, (0, 0))
+        totals[key] = (amount + transaction.amount, count + 1)
+    record_totals(totals)
+
+
+# Add {(year, month, category_id): (amount, count)} to the rollups (negative
+# values take away). Set-based, so the number of queries does not grow with
+# the number of keys. Missing rollup rows are inserted with one
+# ignore_conflicts insert, the touched rows are locked, added to in memory
+# and written back with bulk_update; the balance snapshots follow with
+# balances.apply_deltas and the budget alerts of the keys are re-checked.
+def record_totals(totals):
+    totals = {key: value for key, value in totals.items() if value != (0, 0)}
+    if not totals:
+        return
+
+    MonthlyCategoryTotal.objects.bulk_create(
+        [MonthlyCategoryTotal(year=year, month=month, category_id=category_id) for year, month, category_id in totals],
+        ignore_conflicts=True,
+    )
+    rows = MonthlyCategoryTotal.objects.select_for_update().filter(
+        year__in={key[0] for key in totals},
+        month__in={key[1] for key in totals},
+        category_id__in={key[2] for key in totals},
+    )
+    changed = []
+    for row in rows:
+        key = (row.year, row.month, row.category_id)
+        if key in totals:
+            amount, count = totals[key]
+            row.total += amount
+            row.count += count
+            changed.append(row)
+    MonthlyCategoryTotal.objects.bulk_update(changed, ['total', 'count'], batch_size=1000)
+
+    categories = get_categories({key[2] for key in totals})
+    deltas = {}
+    for (year, month, category_id), (amount, count) in totals.items():
+        signed = amount if categories[category_id].type == 'income' else -amount
+        deltas[(year, month)] = deltas.get((year, month), 0) + signed
+    balances.apply_deltas(deltas)
+    alerts.check(totals)
+
+
+# `previous` holds the values before the edit, so moves between months or
+# categories take the amount out of the old row and add it to the new one.
+# The alerts are checked once both are applied, so an edit that stays in
+# the same month and category does not clear and raise its alert again.
+def record_transaction_changed(previous, transaction):
+    alerts.check({_removed(previous), _added(transaction)})
+
+
+# A category switched between income and expense: the balance snapshots
+# counted its amounts with the old sign, so every month it has a rollup in
+# moves by twice its total. Its budget alerts follow the new type (income
+# has none). Call it in the db transaction of the category save.
+def record_category_type_changed(category, previous_type):
+    if category.type == previous_type:
+        return
+    rows = MonthlyCategoryTotal.objects.filter(category=category).exclude(total=0).values_list('year', 'month', 'total')
+    sign = 2 if category.type == 'income' else -2
+    totals = {(year, month): total for year, month, total in rows}
+    balances.apply_deltas({period: sign * total for period, total in totals.items()})
+    if category.type == 'income':
+        BudgetAlert.objects.filter(budget__category=category).delete()
+    else:
+        alerts.check([(year, month, category.id) for year, month in totals])
+
+
+# {(year, month, category_id): (total, count)} of the transactions of a
+# queryset, in one grouped query
+def queryset_totals(queryset):
+    rows = (
+        queryset
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('year', 'month', 'category_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    return {
+        (row['year'], row['month'], row['category_id']): (row['total'], row['count'])
+        for row in rows
+    }
+
+
+# Recompute every rollup from raw transactions.
+# Archived years have no raw transactions left: their stored rollups are
+# kept as they are.
+# Returns {(year, month, category_id): (total, count)}
+def compute_rollups():
+    archived = set(ArchivedYear.objects.values_list('year', flat=True))
+    expected = queryset_totals(Transaction.objects.exclude(date__year__in=archived))
+    expected.update((key, value) for key, value in stored_rollups().items() if key[0] in archived)
+    return expected
+
+
+# Rollups currently stored, ignoring empty rows left behind by deletes.
+def stored_rollups():
+    rows = MonthlyCategoryTotal.objects.exclude(count=0).values_list(
+        'year', 'month', 'category_id', 'total', 'count'
+    )
+    return {(year, month, category_id): (total, count) for year, month, category_id, total, count in rows}
+
+
+# Keys whose stored value differs from the live data.
+def find_drift(expected, stored):
+    return sorted(
+        key for key in expected.keys() | stored.keys()
+        if expected.get(key) != stored.get(key)
+    )
+
+
+# Replace the whole rollup table with freshly computed rows.
+def rebuild_rollups(expected=None):
+    if expected is None:
+        expected = compute_rollups()
+    with db_transaction.atomic():
+        MonthlyCategoryTotal.objects.all().delete()
+        MonthlyCategoryTotal.objects.bulk_create(
+            (
+                MonthlyCategoryTotal(year=year, month=month, category_id=category_id, total=total, count=count)
+                for (year, month, category_id), (total, count) in expected.items()
+            ),
+            batch_size=1000,
+        )
+        alerts.check_all()
+    cache.invalidate_all()
+    return expected
@@ -0,0 +1,150 @@
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Value
+from django.db.models.expressions import RawSQL
+from ..models import Transaction
+from .categories import attach, get_registry
+
+# Ranked search over Transaction.description, backed by an index per backend:
+#   PostgreSQL  GIN on to_tsvector('simple', description) for word/prefix
+#               matches + GIN pg_trgm for fuzzy (typo) matches (migration 0013)
+#   SQLite      FTS5 table kept in sync by triggers (ensure_sqlite_index)
+#   others      icontains per word, unranked
+# Every word of the query must match (as a prefix), or on PostgreSQL the
+# whole query must be similar enough to the description.
+PAGE_SIZE = 50
+MAX_TERMS = 10
+TABLE = Transaction._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+COLUMN = f'"{TABLE}"."description"'
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _pg_tsquery(words):
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def _fts5_query(words):
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+# Transactions whose description matches the query
+def match(queryset, query):
+    words = terms(query)
+    if not words:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return queryset.filter(RawSQL(
+            f"(to_tsvector('simple', {COLUMN}) @@ to_tsquery('simple', %s) OR {COLUMN} %% %s)",
+            [_pg_tsquery(words), query],
+            output_field=BooleanField(),
+        ))
+    if connection.vendor == 'sqlite':
+        return queryset.filter(RawSQL(
+            f'"{TABLE}"."id" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            [_fts5_query(words)],
+            output_field=BooleanField(),
+        ))
+    for word in words:
+        queryset = queryset.filter(description__icontains=word)
+    return queryset
+
+
+# Matches annotated with `rank` (relevance, higher is better)
+def ranked_matches(queryset, query):
+    words = terms(query)
+    if not words:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return match(queryset, query).annotate(rank=RawSQL(
+            f"GREATEST(ts_rank(to_tsvector('simple', {COLUMN}), to_tsquery('simple', %s)), similarity({COLUMN}, %s))",
+            [_pg_tsquery(words), query],
+            output_field=FloatField(),
+        ))
+    if connection.vendor == 'sqlite':
+        # Join the FTS5 table once so its bm25 `rank` is computed in the
+        # same full-text query (rank is lower for better matches)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = "{TABLE}"."id"', f'{FTS_TABLE} MATCH %s'],
+            params=[_fts5_query(words)],
+            select={'rank': f'-{FTS_TABLE}.rank'},
+        )
+    return match(queryset, query).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def apply_filters(queryset, category=None, type=None, amount_min=None, amount_max=None,
+                  date_from=None, date_to=None):
+    if category is not None:
+        queryset = queryset.filter(category=category)
+    if type:
+        queryset = queryset.filter(category_id__in=get_registry().ids(type))
+    if amount_min is not None:
+        queryset = queryset.filter(amount__gte=amount_min)
+    if amount_max is not None:
+        queryset = queryset.filter(amount__lte=amount_max)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    return queryset
+
+
+# One page of ranked results (page starts at 1) and whether there is a next
+# page. No COUNT(*): one extra row is fetched to know if more follow.
+def search_transactions(query, page=1, page_size=PAGE_SIZE, **filters):
+    if not terms(query):
+        return [], False
+    queryset = Transaction.objects.only('id', 'date', 'amount', 'description', 'created_at', 'category')
+    queryset = ranked_matches(apply_filters(queryset, **filters), query)
+    offset = (page - 1) * page_size
+    rows = list(queryset.order_by('-rank', '-date', '-id')[offset:offset + page_size + 1])
+    return attach(rows[:page_size], get_registry()), len(rows) > page_size
+
+
+# SQLite fallback index: an external-content FTS5 table over the
+# description column plus triggers that keep it in sync. Re-run after every
+# migrate because rebuilding the transactions table (SQLite ALTER) drops
+# the triggers; the index is rebuilt when they were missing.
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f'''
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+        END''',
+    f'{FTS_TABLE}_ad': f'''
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        END''',
+    f'{FTS_TABLE}_au': f'''
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF description ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+        END''',
+}
+
+
+def ensure_sqlite_index(using_connection=connection):
+    if using_connection.vendor != 'sqlite':
+        return False
+    with using_connection.cursor() as cursor:
+        tables = using_connection.introspection.table_names(cursor)
+        if TABLE not in tables:
+            return False
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)", list(SQLITE_TRIGGERS)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if FTS_TABLE in tables and len(existing) == len(SQLITE_TRIGGERS):
+            return False
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"description, content='{TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        for name, sql in SQLITE_TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
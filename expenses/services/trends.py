@@ -0,0 +1,129 @@
+import numpy as np
+from django.db.models import Q
+from django.utils import timezone
+from ..models import MonthlyCategoryTotal
+from . import cache
+from .categories import get_categories
+
+# Dashboard trends over the last 12 / 24 / 60 months.
+# The data is a months x categories matrix read with ONE query over the
+# per-month/per-category rollups, so its size does not depend on the number
+# of transactions (at most 60 x categories cells). Everything else is
+# computed from that matrix in memory (NumPy, whole columns at once) and
+# cached per data version.
+PERIODS = (12, 24, 60)
+DEFAULT_PERIOD = 12
+MOVING_AVERAGE = 3
+TOP_MOVERS = 5
+
+
+# The n months ending at (year, month), oldest first
+def month_sequence(year, month, n):
+    index = year * 12 + month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - n + 1, index + 1)]
+
+
+def in_window(first, last):
+    (first_year, first_month), (last_year, last_month) = first, last
+    after_first = Q(year__gt=first_year) | Q(year=first_year, month__gte=first_month)
+    before_last = Q(year__lt=last_year) | Q(year=last_year, month__lte=last_month)
+    return after_first & before_last
+
+
+# Months x categories matrix of rollup rows (year, month, category_id,
+# total): one row per month of `months` (consecutive, oldest first), one
+# column per id of the sorted array `ids`. Rows of other months or
+# categories are left out. Shared with forecast.py.
+def rollup_matrix(rows, months, ids, dtype=float):
+    matrix = np.zeros((len(months), len(ids)), dtype=dtype)
+    if not rows or not len(ids):
+        return matrix
+    years, month_numbers, category_ids, totals = (np.array(column) for column in zip(*rows))
+    first_year, first_month = months[0]
+    row_index = years * 12 + month_numbers - (first_year * 12 + first_month)
+    column_index = np.searchsorted(ids, category_ids)
+    known = (
+        (row_index >= 0) & (row_index < len(months)) & (column_index < len(ids))
+        & (ids[np.minimum(column_index, len(ids) - 1)] == category_ids)
+    )
+    matrix[row_index[known], column_index[known]] = totals[known].astype(dtype)
+    return matrix
+
+
+# Trailing moving average along the months (axis 0); the first values
+# average what is available
+def moving_average(values, window=MOVING_AVERAGE):
+    values = np.asarray(values)
+    running = np.cumsum(values, axis=0, dtype=float)
+    running[window:] = running[window:] - running[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return running / counts.reshape((-1,) + (1,) * (values.ndim - 1))
+
+
+def _delta(current, previous):
+    return {
+        'change': current - previous,
+        'percent': round((current - previous) * 100 / previous, 1) if previous else None,
+    }
+
+
+def build_trends(period, year, month):
+    months = month_sequence(year, month, period)
+
+    rows = (
+        MonthlyCategoryTotal.objects
+        .filter(in_window(months[0], months[-1]))
+        .values_list('year', 'month', 'category_id', 'total')
+    )
+
+    rows = list(rows)
+    ids = np.unique(np.array([row[2] for row in rows], dtype=np.int64))
+    registry = get_categories(set(ids.tolist()))
+    matrix = rollup_matrix(rows, months, ids, dtype=np.int64)
+    income = np.array([registry[category_id].type == 'income' for category_id in ids.tolist()], dtype=bool)
+
+    totals = {'income': matrix[:, income].sum(axis=1), 'expense': matrix[:, ~income].sum(axis=1)}
+    category_totals = matrix.sum(axis=0)
+    averages = moving_average(matrix)[-1]
+    categories = [
+        {
+            'id': category_id,
+            'name': registry[category_id].name,
+            'type': registry[category_id].type,
+            'series': matrix[:, i].tolist(),
+            'total': int(category_totals[i]),
+            'last': int(matrix[-1, i]),
+            'moving_average': float(averages[i]),
+            'delta': _delta(int(matrix[-1, i]), int(matrix[-2, i])),
+        }
+        for i, category_id in enumerate(ids.tolist())
+    ]
+
+    balance = totals['income'] - totals['expense']
+    ordered = sorted(categories, key=lambda c: (c['type'], -c['total'], c['name']))
+    movers = sorted(categories, key=lambda c: abs(c['delta']['change']), reverse=True)
+
+    return {
+        'period': period,
+        'labels': [f'{y}-{m:02d}' for y, m in months],
+        'income': totals['income'].tolist(),
+        'expense': totals['expense'].tolist(),
+        'balance': balance.tolist(),
+        'income_average': moving_average(totals['income']).tolist(),
+        'expense_average': moving_average(totals['expense']).tolist(),
+        'income_delta': _delta(int(totals['income'][-1]), int(totals['income'][-2])),
+        'expense_delta': _delta(int(totals['expense'][-1]), int(totals['expense'][-2])),
+        'categories': ordered,
+        'top_movers': [c for c in movers if c['delta']['change']][:TOP_MOVERS],
+    }
+
+
+# Trends of the `period` months ending this month, cached until a
+# transaction or category changes
+def get_trends(period=DEFAULT_PERIOD, today=None):
+    today = today or timezone.localdate()
+    return cache.cached(
+        f'trends:{period}:{today.year}-{today.month}',
+        [cache.CATEGORIES, cache.MONTHS],
+        lambda: build_trends(period, today.year, today.month),
+    )
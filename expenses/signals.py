@@ -0,0 +1,96 @@
+from django.db import connections, transaction as db_transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from .models import Category, CategoryBudget, MonthlyBudget, Transaction
+from .services import alerts, cache, db_pool, metrics, rollups, search
+
+
+# Bumped now and again after commit: a request reading the month between
+# the write and the commit (the rollups and balances are updated later in
+# the same atomic block) would otherwise cache the old rows under the new
+# version until the next write.
+def invalidate_months(periods):
+    periods = list(periods)
+    cache.invalidate_months(periods)
+    db_transaction.on_commit(lambda: cache.invalidate_months(periods))
+
+
+# Remember the month a transaction was loaded with, so an edit that moves
+# it to another month invalidates both months.
+@receiver(post_init, sender=Transaction)
+def remember_transaction_month(sender, instance, **kwargs):
+    date = instance.__dict__.get('date')
+    instance._loaded_period = (date.year, date.month) if date else None
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_transaction_month(sender, instance, **kwargs):
+    periods = {(instance.date.year, instance.date.month)}
+    if instance._loaded_period:
+        periods.add(instance._loaded_period)
+    invalidate_months(periods)
+    instance._loaded_period = (instance.date.year, instance.date.month)
+
+
+@receiver(post_save, sender=CategoryBudget)
+@receiver(post_delete, sender=CategoryBudget)
+def invalidate_category_budget_month(sender, instance, **kwargs):
+    budget = instance.monthly_budget
+    invalidate_months([(budget.year, budget.month)])
+
+
+# A budget edited on its own (month page, admin) re-checks its alerts;
+# deleted budgets take their alerts with them (cascade)
+@receiver(post_save, sender=CategoryBudget)
+def check_category_budget_alerts(sender, instance, **kwargs):
+    budget = instance.monthly_budget
+    alerts.check([(budget.year, budget.month, instance.category_id)])
+
+
+@receiver(post_save, sender=MonthlyBudget)
+@receiver(post_delete, sender=MonthlyBudget)
+def invalidate_monthly_budget(sender, instance, **kwargs):
+    invalidate_months([(instance.year, instance.month)])
+
+
+# Bumped again after commit: a process reading the categories between the
+# first bump and the commit would otherwise keep the old rows (report cache,
+# category registry) under the new version.
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    cache.invalidate_all()
+    db_transaction.on_commit(cache.invalidate_all)
+
+
+# The stored type of a category being saved, so a change of type can
+# correct the balance snapshots (registered after invalidate_categories:
+# the alert check reads the category registry)
+@receiver(pre_save, sender=Category)
+def remember_category_type(sender, instance, **kwargs):
+    instance._previous_type = None
+    if instance.pk is not None:
+        instance._previous_type = Category.objects.filter(pk=instance.pk).values_list('type', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def correct_balances_on_type_change(sender, instance, created, **kwargs):
+    if instance._previous_type:
+        rollups.record_category_type_changed(instance, instance._previous_type)
+
+
+# Count new database connections (see services/db_pool.py) and time their
+# queries for the request metrics (services/metrics.py)
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    db_pool.record_connection(connection.alias)
+    metrics.install_query_timer(connection)
+
+
+# SQLite search index (FTS5 + triggers), see services/search.py
+@receiver(post_migrate)
+def ensure_search_index(sender, using, **kwargs):
+    if sender.name == 'expenses':
+        search.ensure_sqlite_index(connections[using])
@@ -0,0 +1,41 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional, only .gz files are written without it
+    brotli = None
+
+# Files worth compressing; fonts (woff/woff2) and images already are
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.txt', '.json', '.html', '.xml')
+MIN_SIZE = 256
+
+
+# ManifestStaticFilesStorage (content-hashed names like base.3f1c2a9b7e10.css)
+# that also writes base.3f1c2a9b7e10.css.gz (and .br with the brotli
+# package) during collectstatic, so StaticFilesMiddleware or the web server
+# can send the compressed file without compressing on every request.
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE):
+                self._compress(name)
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < MIN_SIZE:
+            return
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content)
+        for suffix, compressed in variants.items():
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
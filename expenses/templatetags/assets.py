@@ -0,0 +1,11 @@
+from django import template
+from ..services.assets import asset_url
+
+register = template.Library()
+
+
+# {% asset 'vendor/bootstrap/bootstrap.min.css' %}: like {% static %}, with
+# the CDN URL as fallback for vendor files that are not downloaded yet
+@register.simple_tag
+def asset(path):
+    return asset_url(path)
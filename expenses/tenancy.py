@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import models
+
+# The tenant (household) whose data the current request / command works on.
+# Set by TenantMiddleware for requests and by tenant_context() elsewhere;
+# outside of both, EXPENSES_DEFAULT_TENANT (the tenant existing data was
+# migrated into) is used, so single-household installs keep working.
+current_tenant = ContextVar('expenses_current_tenant', default=None)
+
+
+def default_tenant_id():
+    return getattr(settings, 'EXPENSES_DEFAULT_TENANT', 1)
+
+
+def current_tenant_id():
+    tenant_id = current_tenant.get()
+    return default_tenant_id() if tenant_id is None else tenant_id
+
+
+def activate(tenant):
+    return current_tenant.set(getattr(tenant, 'pk', tenant))
+
+
+@contextmanager
+def tenant_context(tenant):
+    token = activate(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+# Default manager of tenant-owned models: every query is scoped to the
+# current tenant, so views cannot forget the filter. Querysets are built
+# lazily, the tenant is read when the queryset is created.
+class TenantManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(tenant_id=current_tenant_id())
+
+
+class TenantModel(models.Model):
+    tenant = models.ForeignKey(
+        'expenses.Tenant', on_delete=models.CASCADE, default=current_tenant_id, editable=False, related_name='+'
+    )
+
+    objects = TenantManager()
+    # Unscoped access for maintenance commands and migrations
+    all_tenants = models.Manager()
+
+    class Meta:
+        abstract = True
+
+
+# Tenants a maintenance command works on: the given ids, or every tenant
+def get_tenants(tenant_ids=None):
+    from .models import Tenant
+    tenants = Tenant.objects.order_by('pk')
+    if tenant_ids:
+        tenants = tenants.filter(pk__in=tenant_ids)
+    return list(tenants)
@@ -1,3 +1,1249 @@
-from django.test import TestCase
+from datetime import date
+import gzip
+import importlib
+import math
+import os
+import tempfile
+import zipfile
+from copy import copy
+from unittest import mock
+from io import BytesIO, StringIO
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .admin import LargeTableAdmin
+from .forms import TransactionForm
+from .models import ArchivedYear, BudgetAlert, Category, Transaction, MonthlyBudget, CategoryBudget, RecurringTransaction, Tenant
+from .services.month_summary import get_month_summaries
+from .services.month_report import MonthReport
+from .services import rollups
+from .services import cache as report_cache
+from .services import alerts, archive, assets, balances, budgets, categories, db_pool, exporter, forecast, metrics, recurring, search
+from .services.importer import TransactionImporter, parse_csv, parse_ofx
+from .services.trends import build_trends
+from .tenancy import current_tenant_id, default_tenant_id, tenant_context
 
-# Create your tests here.
+
+# Report data is cached across requests: start every test from an empty cache.
+# Anonymous test clients see the default tenant.
+@override_settings(EXPENSES_ANONYMOUS_TENANT=1)
+class ExpensesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+
+# Create a transaction and record it in the rollups, like the views do
+def create_transaction(**kwargs):
+    transaction = Transaction.objects.create(**kwargs)
+    rollups.record_transaction_added(transaction)
+    return transaction
+
+
+class MonthSummaryTests(ExpensesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.salary = Category.objects.create(name='Salary', type='income')
+        cls.food = Category.objects.create(name='Food', type='expense')
+
+    def add_month(self, year, month, income, expense):
+        budget = MonthlyBudget.objects.create(year=year, month=month)
+        create_transaction(description='Pay', amount=income, date=date(year, month, 1),
+                           category=self.salary, monthly_budget=budget)
+        create_transaction(description='Lunch', amount=expense, date=date(year, month, 15),
+                           category=self.food, monthly_budget=budget)
+
+    def test_summaries_grouped_by_month(self):
+        self.add_month(2025, 1, 1000, 300)
+        self.add_month(2025, 2, 500, 800)
+
+        summaries = get_month_summaries()
+
+        self.assertEqual(summaries[(2025, 1)], {'income': 1000, 'expense': 300, 'balance': 700})
+        self.assertEqual(summaries[(2025, 2)], {'income': 500, 'expense': 800, 'balance': -300})
+
+    def test_monthly_list_query_count_is_constant(self):
+        for month in range(1, 13):
+            self.add_month(2024, month, 1000, 100)
+
+        # months + 1 grouped query for all summaries + latest balance snapshot + opening balance
+        # + unread alert badge
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('monthly_list'))
+
+        self.assertEqual(len(response.context['budget_data']), 12)
+        self.assertEqual(response.context['budget_data'][0]['balance'], 900)
+
+
+class MonthReportTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.budget = MonthlyBudget.objects.create(year=2025, month=3)
+
+    def add_categories(self, count):
+        Category.objects.bulk_create(
+            Category(name=f'Category {i}', type='expense' if i % 2 else 'income')
+            for i in range(Category.objects.count(), count)
+        )
+        # bulk_create sends no signals
+        report_cache.invalidate_all()
+
+    def test_budgeted_actual_and_difference(self):
+        food = Category.objects.create(name='Food', type='expense')
+        salary = Category.objects.create(name='Salary', type='income')
+        CategoryBudget.objects.create(monthly_budget=self.budget, category=food, budgeted_amount=500)
+        create_transaction(description='Lunch', amount=200, date=date(2025, 3, 2), category=food)
+        create_transaction(description='Dinner', amount=400, date=date(2025, 3, 9), category=food)
+        create_transaction(description='Other month', amount=999, date=date(2025, 4, 1), category=food)
+        create_transaction(description='Pay', amount=1000, date=date(2025, 3, 1), category=salary)
+
+        report = MonthReport.build(self.budget)
+
+        self.assertEqual(report.expense_data, [
+            {'category': food, 'budgeted': 500, 'actual': 600, 'difference': -100},
+        ])
+        self.assertEqual(report.total_expense_difference, -100)
+        self.assertEqual(report.total_income_actual, 1000)
+        self.assertEqual(report.total_income_difference, 1000)
+        self.assertEqual(report.balance, 400)
+
+    def test_query_count_does_not_grow_with_categories(self):
+        for count in (10, 1000):
+            self.add_categories(count)
+            # categories are loaded into the registry once, then read from it
+            with self.assertNumQueries(3):
+                MonthReport.build(self.budget)
+            with self.assertNumQueries(2):
+                report = MonthReport.build(self.budget)
+            self.assertEqual(len(report.income_data) + len(report.expense_data), count)
+
+    def test_month_detail_uses_report(self):
+        food = Category.objects.create(name='Food', type='expense')
+        create_transaction(description='Lunch', amount=200, date=date(2025, 3, 2), category=food)
+
+        response = self.client.get(reverse('month_detail', args=[2025, 3]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['month_expense'], 200)
+        self.assertEqual(response.context['month_balance'], -200)
+
+
+class RollupTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.rent = Category.objects.create(name='Rent', type='expense')
+
+    def rollup(self, year, month, category):
+        return rollups.stored_rollups().get((year, month, category.id))
+
+    def test_views_maintain_rollups(self):
+        self.client.post(reverse('transaction_create_by_type', args=['expense']), {
+            'date': '2025-01-10', 'amount': 300, 'description': 'Lunch', 'category': self.food.id,
+        })
+        transaction = Transaction.objects.get()
+        self.assertEqual(self.rollup(2025, 1, self.food), (300, 1))
+
+        # Move to another month and category
+        self.client.post(reverse('transaction_update', args=[transaction.pk]), {
+            'date': '2025-02-01', 'amount': 500, 'description': 'Lunch', 'category': self.rent.id,
+        })
+        self.assertIsNone(self.rollup(2025, 1, self.food))
+        self.assertEqual(self.rollup(2025, 2, self.rent), (500, 1))
+
+        self.client.post(reverse('transaction_delete', args=[transaction.pk]))
+        self.assertEqual(rollups.stored_rollups(), {})
+
+    def test_views_take_deltas_from_the_current_row(self):
+        transaction = Transaction.objects.create(description='Lunch', amount=300, date=date(2025, 1, 10), category=self.food)
+        rollups.record_transaction_added(transaction)
+        stale = Transaction.objects.get(pk=transaction.pk)
+        self.client.post(reverse('transaction_update', args=[transaction.pk]), {
+            'date': '2025-01-10', 'amount': 400, 'description': 'Lunch', 'category': self.food.id,
+        })
+
+        # Both requests read the row before the other one wrote it
+        reads = iter([stale])
+        fetch = lambda queryset, **lookup: next(reads, None) or queryset.get(**lookup)
+        with mock.patch('expenses.views.transaction_views.get_object_or_404', side_effect=fetch):
+            self.client.post(reverse('transaction_update', args=[transaction.pk]), {
+                'date': '2025-01-10', 'amount': 500, 'description': 'Lunch', 'category': self.food.id,
+            })
+        self.assertEqual(self.rollup(2025, 1, self.food), (500, 1))
+
+        self.client.post(reverse('transaction_delete', args=[transaction.pk]))
+        with mock.patch('expenses.views.transaction_views.get_object_or_404', return_value=stale):
+            self.client.post(reverse('transaction_delete', args=[transaction.pk]))
+        self.assertEqual(rollups.stored_rollups(), {})
+
+    def test_rebuild_rollups_fixes_drift(self):
+        Transaction.objects.create(description='Lunch', amount=300, date=date(2025, 1, 10), category=self.food)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        self.assertEqual(self.rollup(2025, 1, self.food), (300, 1))
+
+
+class SeedExpensesTests(ExpensesTestCase):
+    def test_seed_generates_consistent_data(self):
+        call_command('seed_expenses', transactions=500, categories=10, months=6, batch_size=100, stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.count(), 500)
+        self.assertEqual(Category.objects.count(), 10)
+        self.assertEqual(MonthlyBudget.objects.count(), 6)
+        self.assertEqual(CategoryBudget.objects.count(), 60)
+        self.assertFalse(Transaction.objects.filter(monthly_budget__isnull=True).exists())
+        self.assertEqual(rollups.find_drift(rollups.compute_rollups(), rollups.stored_rollups()), [])
+
+    def test_clear_removes_recurring_transactions_and_archives(self):
+        call_command('seed_expenses', transactions=50, categories=5, months=2, stdout=StringIO())
+        RecurringTransaction.objects.create(description='Rent', amount=500, category=Category.objects.first(),
+                                            start_date=date(2023, 1, 5))
+        ArchivedYear.objects.create(year=2020, transaction_count=10, path='archive/2020.csv.gz')
+
+        call_command('seed_expenses', '--clear', transactions=50, categories=5, months=2, stdout=StringIO())
+        self.assertEqual(Transaction.objects.count(), 50)
+        self.assertFalse(RecurringTransaction.objects.exists())
+        self.assertFalse(ArchivedYear.objects.exists())
+
+
+class TransactionImportTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+
+    def test_csv_import_dedupes_and_reports_errors(self):
+        csv = (
+            'date,amount,description,category\n'
+            '2025-01-05,300,Lunch,Food\n'
+            '2025-01-05,300,Lunch,Food\n'
+            '06/02/2025,1000,Pay,salary\n'
+            'not a date,10,Broken,Food\n'
+            '2025-02-07,20,Unknown,Travel\n'
+        )
+        importer = TransactionImporter(chunk_size=2)
+        result = importer.run(parse_csv(StringIO(csv)))
+
+        # Identical rows in one file are real repeats (two lunches that day)
+        self.assertEqual((result.created, result.duplicates, result.error_count), (3, 0, 2))
+        self.assertEqual([row for row, message in result.errors], [5, 6])
+        self.assertTrue(MonthlyBudget.objects.filter(year=2025, month=2).exists())
+        self.assertEqual(rollups.stored_rollups()[(2025, 1, self.food.id)], (600, 2))
+
+        # Importing the same file again creates nothing
+        result = TransactionImporter().run(parse_csv(StringIO(csv)))
+        self.assertEqual((result.created, result.duplicates), (0, 3))
+
+        # A later file with one more of those lunches adds only that one
+        result = TransactionImporter().run(parse_csv(StringIO(csv + '2025-01-05,300,Lunch,Food\n')))
+        self.assertEqual((result.created, result.duplicates), (1, 3))
+
+    def test_rows_inserted_by_a_concurrent_import_are_skipped(self):
+        csv = 'date,amount,description,category\n2025-01-05,300,Lunch,Food\n2025-01-06,40,Bus,Food\n'
+        importer = TransactionImporter()
+        existing_hashes = importer.existing_hashes
+
+        # The other import commits the lunch right after the first lookup
+        def racing_lookup(transactions):
+            found = existing_hashes(transactions)
+            if not Transaction.objects.exists():
+                TransactionImporter().run(parse_csv(StringIO(csv.rsplit('2025-01-06', 1)[0])))
+            return found
+
+        with mock.patch.object(importer, 'existing_hashes', side_effect=racing_lookup):
+            result = importer.run(parse_csv(StringIO(csv)))
+
+        self.assertEqual((result.created, result.duplicates), (1, 1))
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(rollups.stored_rollups()[(2025, 1, self.food.id)], (340, 2))
+
+    def test_ofx_import_uses_default_categories(self):
+        ofx = (
+            '<OFX><BANKTRANLIST>\n'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250103120000<TRNAMT>-45000<FITID>1<NAME>Coffee</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20250125\n<TRNAMT>15000000\n<FITID>2\n<NAME>Salary\n</STMTTRN>\n'
+            '</BANKTRANLIST></OFX>\n'
+        )
+        importer = TransactionImporter(default_expense_category=self.food, default_income_category=self.salary)
+        result = importer.run(parse_ofx(StringIO(ofx)))
+
+        self.assertEqual(result.created, 2)
+        coffee = Transaction.objects.get(description='Coffee')
+        self.assertEqual((coffee.amount, coffee.category, coffee.date), (45000, self.food, date(2025, 1, 3)))
+        self.assertEqual(Transaction.objects.get(description='Salary').category, self.salary)
+
+
+class ExportTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        food = Category.objects.create(name='Food', type='expense')
+        self.budget = MonthlyBudget.objects.create(year=2025, month=1)
+        CategoryBudget.objects.create(monthly_budget=self.budget, category=food, budgeted_amount=500)
+        create_transaction(description='Lunch, big', amount=300, date=date(2025, 1, 5), category=food)
+        create_transaction(description='Old', amount=100, date=date(2024, 12, 5), category=food)
+
+    def test_transaction_csv_export_streams_one_year(self):
+        response = self.client.get(reverse('transaction_export'), {'format': 'csv', 'year': 2025})
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.splitlines(), [
+            'Date,Description,Category,Type,Amount',
+            '2025-01-05,"Lunch, big",Food,expense,300',
+        ])
+
+    def test_month_report_xlsx_export(self):
+        response = self.client.get(reverse('month_export', args=[2025, 1]), {'format': 'xlsx'})
+
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t>Food</t></is></c><c><v>500</v></c><c><v>300</v></c><c><v>200</v></c>', sheet)
+
+
+class ReportCacheTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        MonthlyBudget.objects.create(year=2025, month=1)
+        MonthlyBudget.objects.create(year=2025, month=2)
+
+    def add_expense(self, day, amount):
+        self.client.post(reverse('transaction_create_by_type', args=['expense']), {
+            'date': day, 'amount': amount, 'description': 'Lunch', 'category': self.food.id,
+        })
+
+    def report_cache(self, year, month):
+        return report_cache.stats.get(f'month_report:{year}-{month}', {'hits': 0, 'misses': 0})
+
+    def test_month_detail_cached_until_month_changes(self):
+        url = reverse('month_detail', args=[2025, 1])
+        self.client.get(url)
+        self.client.get(reverse('month_detail', args=[2025, 2]))
+        before = dict(self.report_cache(2025, 1))
+
+        self.client.get(url)
+        self.assertEqual(self.report_cache(2025, 1)['hits'], before['hits'] + 1)
+
+        # A write in February leaves January cached
+        self.add_expense('2025-02-03', 100)
+        self.client.get(url)
+        self.assertEqual(self.report_cache(2025, 1)['hits'], before['hits'] + 2)
+
+        # A write in January is visible right away
+        self.add_expense('2025-01-03', 250)
+        response = self.client.get(url)
+        self.assertEqual(self.report_cache(2025, 1)['misses'], before['misses'] + 1)
+        self.assertEqual(response.context['total_expense_actual'], 250)
+
+    def test_category_change_invalidates_all_months(self):
+        self.client.get(reverse('month_detail', args=[2025, 1]))
+        self.food.name = 'Groceries'
+        self.food.save()
+
+        response = self.client.get(reverse('month_detail', args=[2025, 1]))
+
+        self.assertContains(response, 'Groceries')
+
+    def test_month_versions_are_bumped_again_after_commit(self):
+        scopes = [report_cache.month_scope(2025, 1)]
+        writes = [
+            lambda: create_transaction(description='Lunch', amount=100, date=date(2025, 1, 3), category=self.food),
+            lambda: CategoryBudget.objects.create(
+                monthly_budget=MonthlyBudget.objects.get(year=2025, month=1), category=self.food, budgeted_amount=500,
+            ),
+            lambda: MonthlyBudget.objects.get(year=2025, month=1).save(),
+        ]
+        for write in writes:
+            with self.captureOnCommitCallbacks() as callbacks:
+                write()
+            # a read before the commit cached the old rows under this version
+            version = report_cache.get_versions(scopes)
+            for callback in callbacks:
+                callback()
+            self.assertNotEqual(report_cache.get_versions(scopes), version)
+
+
+class BalanceTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+
+    def test_snapshots_follow_writes_in_earlier_months(self):
+        balances.set_opening_balance(1000)
+        create_transaction(description='Pay', amount=500, date=date(2025, 3, 1), category=self.salary)
+        create_transaction(description='Rent', amount=200, date=date(2025, 1, 1), category=self.food)
+
+        self.assertEqual(balances.balance_at(2024, 12), 1000)
+        self.assertEqual(balances.balance_at(2025, 1), 800)
+        self.assertEqual(balances.balance_at(2025, 2), 800)
+        self.assertEqual(balances.current_balance(), 1300)
+
+        balances.set_opening_balance(0)
+        self.assertEqual(balances.current_balance(), 300)
+        with self.assertNumQueries(1):
+            balances.balance_at(2025, 2)
+
+    def test_opening_balance_form_rejects_bad_amounts(self):
+        url = reverse('opening_balance_update')
+        response = self.client.post(url, {'amount': '-2500'}, follow=True)
+        self.assertContains(response, 'Starting capital updated to -2,500')
+        self.assertEqual(balances.current_balance(), -2500)
+
+        for amount in ['', 'abc', '12.5', '1' * 15]:
+            response = self.client.post(url, {'amount': amount}, follow=True)
+            self.assertContains(response, 'Starting capital must be a whole number')
+        self.assertEqual(balances.current_balance(), -2500)
+
+    def test_rebuild_balances_check(self):
+        create_transaction(description='Pay', amount=500, date=date(2025, 3, 1), category=self.salary)
+        call_command('rebuild_balances', '--check', stdout=StringIO())
+
+        Transaction.objects.create(description='Untracked', amount=100, date=date(2025, 2, 1), category=self.food)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balances', '--check', stdout=StringIO())
+
+        call_command('rebuild_balances', stdout=StringIO())
+        self.assertEqual(balances.current_balance(), 400)
+
+    def test_category_type_change_moves_the_balances(self):
+        budget = MonthlyBudget.objects.create(year=2025, month=1)
+        CategoryBudget.objects.create(monthly_budget=budget, category=self.salary, budgeted_amount=100)
+        create_transaction(description='Rent', amount=100, date=date(2025, 1, 1), category=self.food)
+        create_transaction(description='Pay', amount=300, date=date(2025, 1, 5), category=self.salary)
+        self.assertEqual(balances.current_balance(), 200)
+
+        self.client.post(reverse('category_update', args=[self.food.pk]), {'name': 'Refunds', 'type': 'income'})
+        self.assertEqual(balances.current_balance(), 400)
+        self.assertEqual(balances.find_drift(balances.compute_balances(), balances.stored_balances()), [])
+
+        # income -> expense: over its budget now
+        self.client.post(reverse('category_update', args=[self.salary.pk]), {'name': 'Salary', 'type': 'expense'})
+        self.assertEqual(balances.current_balance(), -200)
+        self.assertEqual(balances.find_drift(balances.compute_balances(), balances.stored_balances()), [])
+        self.assertEqual(sorted(BudgetAlert.objects.values_list('kind', flat=True)), ['overspent', 'threshold'])
+        self.salary.refresh_from_db()
+        self.salary.type = 'income'
+        self.salary.save()
+        self.assertFalse(BudgetAlert.objects.exists())
+
+
+class MonthTransactionsPaginationTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        MonthlyBudget.objects.create(year=2025, month=1)
+        Transaction.objects.bulk_create(
+            Transaction(description=f'Lunch {i}', amount=100, date=date(2025, 1, 1 + i % 28), category=self.food)
+            for i in range(120)
+        )
+
+    def test_pages_cover_month_in_display_order_without_duplicates(self):
+        url = reverse('month_transactions', args=[2025, 1])
+        seen = []
+        cursor = ''
+        while True:
+            data = self.client.get(url, {'type': 'expense', 'cursor': cursor}).json()
+            seen.extend(row['id'] for row in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        expected = list(Transaction.objects.order_by('-date', '-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_month_detail_query_count_does_not_depend_on_month_size(self):
+        Category.objects.create(name='Salary', type='income')
+        url = reverse('month_detail', args=[2025, 1])
+        self.client.get(url)
+        # month + one page per column + month-end balance (snapshot, opening);
+        # report is cached and the categories come from the registry; + unread alert badge
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['expenses']), 50)
+        self.assertIsNotNone(response.context['expenses_cursor'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('month_transactions', args=[2025, 1]), {'type': 'expense', 'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        budget = MonthlyBudget.objects.create(year=2025, month=1)
+        MonthlyBudget.objects.create(year=2025, month=2)
+        CategoryBudget.objects.create(monthly_budget=budget, category=self.food, budgeted_amount=500)
+        create_transaction(description='Lunch', amount=300, date=date(2025, 1, 5), category=self.food)
+
+    def test_month_detail_and_field_selection(self):
+        data = self.client.get(reverse('api_month_detail', args=[2025, 1])).json()
+        self.assertEqual(data['expense'], [
+            {'category_id': self.food.id, 'category': 'Food', 'budgeted': 500, 'actual': 300, 'difference': 200},
+        ])
+
+        data = self.client.get(reverse('api_transactions'), {'year': 2025, 'month': 1, 'fields': 'id,amount'}).json()
+        self.assertEqual(data['results'], [{'id': Transaction.objects.get().pk, 'amount': 300}])
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get(reverse('api_transactions'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag_changes_only_for_modified_month(self):
+        january = reverse('api_month_detail', args=[2025, 1])
+        february = reverse('api_month_detail', args=[2025, 2])
+        january_etag = self.client.get(january)['ETag']
+        february_etag = self.client.get(february)['ETag']
+
+        self.assertEqual(self.client.get(january, HTTP_IF_NONE_MATCH=january_etag).status_code, 304)
+
+        create_transaction(description='Dinner', amount=100, date=date(2025, 1, 6), category=self.food)
+
+        self.assertEqual(self.client.get(january, HTTP_IF_NONE_MATCH=january_etag).status_code, 200)
+        self.assertEqual(self.client.get(february, HTTP_IF_NONE_MATCH=february_etag).status_code, 304)
+
+
+class AsyncViewTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+        self.budget = MonthlyBudget.objects.create(year=2025, month=1)
+        CategoryBudget.objects.create(monthly_budget=self.budget, category=self.food, budgeted_amount=500)
+        create_transaction(description='Lunch', amount=300, date=date(2025, 1, 5), category=self.food)
+        create_transaction(description='Pay', amount=1000, date=date(2025, 1, 1), category=self.salary)
+
+    async def test_async_report_matches_sync_report(self):
+        report = await MonthReport.abuild(self.budget)
+        self.assertEqual(report.to_context(), (await sync_to_async(MonthReport.build)(self.budget)).to_context())
+
+    async def test_monthly_pages_under_async_client(self):
+        response = await self.async_client.get(reverse('monthly_list'))
+        self.assertEqual(response.context['budget_data'][0]['balance'], 700)
+
+        response = await self.async_client.get(reverse('month_detail', args=[2025, 1]))
+        self.assertEqual([t.description for t in response.context['expenses']], ['Lunch'])
+        self.assertEqual(response.context['closing_balance'], 700)
+
+        response = await self.async_client.get(reverse('api_months'))
+        self.assertEqual(response.json()['results'][0]['balance'], 700)
+
+    async def test_api_etags_read_the_cache_without_blocking(self):
+        url = reverse('api_month_detail', args=[2025, 1])
+        # the sync cache API is never called on the event loop
+        with mock.patch('expenses.services.cache.get_versions', side_effect=AssertionError('sync cache read')):
+            etag = (await self.async_client.get(url))['ETag']
+            response = await self.async_client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            response = await self.async_client.get(reverse('api_transactions'), {'year': 2025, 'month': 1})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header('ETag'))
+
+
+class DbStatsTests(ExpensesTestCase):
+    def test_staff_only_and_counts_new_connections(self):
+        response = self.client.get(reverse('db_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        staff = User.objects.create_user('admin', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        before = self.client.get(reverse('db_stats')).json()['databases']['default']
+
+        db_pool.record_connection('default')
+        after = self.client.get(reverse('db_stats')).json()['databases']['default']
+        self.assertEqual(after['connections_opened'], before['connections_opened'] + 1)
+        self.assertIsNone(after['pool'])
+
+
+
+# Transaction pooling (EXPENSES_DB_POOL=pgbouncer) hands every transaction
+# to any server connection: a server-side cursor held across statements
+# would be lost. Django opens one (on PostgreSQL) through chunked_cursor().
+class TransactionPoolingTests(ExpensesTestCase):
+    def database_settings(self, mode):
+        import expensetracker.settings as project_settings
+        with mock.patch.dict(os.environ, {'EXPENSES_DB_POOL': mode}):
+            databases = importlib.reload(project_settings).DATABASES
+        importlib.reload(project_settings)
+        return databases['default']
+
+    def test_pool_modes(self):
+        pgbouncer = self.database_settings('pgbouncer')
+        self.assertTrue(pgbouncer['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertTrue(pgbouncer['CONN_HEALTH_CHECKS'])
+        pool = self.database_settings('pool')
+        self.assertEqual(pool['CONN_MAX_AGE'], 0)
+        self.assertIn('pool', pool['OPTIONS'])
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', self.database_settings('persistent'))
+
+    def test_no_server_side_cursors_behind_a_transaction_pooler(self):
+        food = Category.objects.create(name='Food', type='expense')
+        for day in range(1, 6):
+            create_transaction(description='Lunch', amount=100, date=date(2025, 1, day), category=food)
+
+        with mock.patch.object(connection, 'chunked_cursor', wraps=connection.chunked_cursor) as chunked:
+            self.assertEqual(len(list(exporter.transaction_rows(chunk_size=2))), 5)
+        self.assertTrue(chunked.called)
+
+        pooled = {'DISABLE_SERVER_SIDE_CURSORS': True, 'CONN_MAX_AGE': 0}
+        with mock.patch.dict(connection.settings_dict, pooled), \
+                mock.patch.object(connection, 'chunked_cursor', side_effect=AssertionError('server-side cursor')):
+            self.assertEqual(len(list(exporter.transaction_rows(chunk_size=2))), 5)
+            response = self.client.get(reverse('transaction_export'), {'format': 'csv'})
+            self.assertEqual(b''.join(response.streaming_content).count(b'Lunch'), 5)
+
+
+@override_settings(EXPENSES_METRICS_SAMPLE_RATE=1)
+class RequestMetricsTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.client.force_login(User.objects.create_user('admin', password='secret', is_staff=True))
+        MonthlyBudget.objects.create(year=2025, month=1)
+
+    def test_views_are_measured_by_url_name(self):
+        self.client.get(reverse('month_detail', args=[2025, 1]))
+        self.client.get(reverse('month_detail', args=[2025, 1]))
+
+        report = self.client.get(reverse('request_metrics')).json()['views']
+        self.assertEqual(report['month_detail']['sampled'], 2)
+        self.assertGreater(report['month_detail']['queries']['p50'], 0)
+        self.assertGreater(report['month_detail']['render_ms']['p50'], 0)
+
+        text = self.client.get(reverse('request_metrics'), {'format': 'prometheus'}).content.decode()
+        self.assertIn('expenses_requests_total{view="month_detail"} 2', text)
+        self.assertIn('expenses_request_queries_count{view="month_detail"} 2', text)
+
+    async def test_async_views_count_their_queries(self):
+        await self.async_client.get(reverse('monthly_list'))
+        report = metrics.get_report()['monthly_list']
+        self.assertEqual(report['sampled'], 1)
+        self.assertGreater(report['queries']['p50'], 0)
+
+    def test_repeated_statement_is_reported_as_n_plus_one(self):
+        request_metrics = metrics.RequestMetrics()
+        for pk in range(metrics.N_PLUS_ONE_THRESHOLD):
+            request_metrics.add_query(f'SELECT * FROM category WHERE id = {pk}', 1.0)
+        metrics.record('category_list', 10.0, request_metrics)
+
+        report = metrics.get_report()['category_list']
+        self.assertEqual(report['n_plus_one'], 1)
+        self.assertEqual(report['duplicated_queries'],
+                         [{'sql': 'SELECT * FROM category WHERE id = N', 'count': metrics.N_PLUS_ONE_THRESHOLD}])
+
+
+class TrendsTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.rent = Category.objects.create(name='Rent', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+        for month, food in [(11, 100), (12, 200), (1, 600)]:
+            year = 2024 if month > 1 else 2025
+            create_transaction(description='Food', amount=food, date=date(year, month, 3), category=self.food)
+            create_transaction(description='Rent', amount=500, date=date(year, month, 1), category=self.rent)
+            create_transaction(description='Pay', amount=2000, date=date(year, month, 1), category=self.salary)
+        # Outside a 12-month window ending in January 2025
+        create_transaction(description='Old', amount=999, date=date(2023, 6, 1), category=self.food)
+
+    def test_matrix_deltas_and_movers(self):
+        trends = build_trends(12, 2025, 1)
+        self.assertEqual(trends['labels'][0], '2024-02')
+        self.assertEqual(trends['labels'][-1], '2025-01')
+        self.assertEqual(trends['expense'][-3:], [600, 700, 1100])
+        self.assertEqual(trends['balance'][-1], 900)
+        self.assertEqual(trends['expense_average'][-1], 800)
+
+        food = next(c for c in trends['categories'] if c['name'] == 'Food')
+        self.assertEqual(food['total'], 900)
+        self.assertEqual(food['delta'], {'change': 400, 'percent': 200.0})
+        self.assertEqual([c['name'] for c in trends['top_movers']], ['Food'])
+
+    def test_dashboard_is_cached_until_data_changes(self):
+        url = reverse('dashboard_home')
+        # trends + unread alert badge, then the badge only
+        with self.assertNumQueries(2):
+            self.client.get(url, {'months': 24})
+        with self.assertNumQueries(1):
+            self.client.get(url, {'months': 24})
+
+        create_transaction(description='Food', amount=50, date=timezone.localdate(), category=self.food)
+        response = self.client.get(url, {'months': 24})
+        self.assertEqual(response.context['trends']['expense'][-1], 50)
+
+
+class BulkBudgetTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.categories = [Category.objects.create(name=f'Cat {i}', type='expense') for i in range(20)]
+        self.budget = MonthlyBudget.objects.create(year=2024, month=12)
+
+    def test_save_all_categories_in_one_statement(self):
+        CategoryBudget.objects.create(monthly_budget=self.budget, category=self.categories[0], budgeted_amount=1)
+        data = {f'budget_{c.id}': 100 + i for i, c in enumerate(self.categories)}
+        data[f'budget_{self.categories[1].id}'] = ''
+
+        # get month + categories + current amounts, then one upsert
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('month_budgets_edit', args=[2024, 12]), data)
+        self.assertRedirects(response, reverse('month_detail', args=[2024, 12]), fetch_redirect_response=False)
+
+        amounts = budgets.budget_amounts(self.budget)
+        self.assertEqual(len(amounts), 20)
+        self.assertEqual(amounts[self.categories[0].id], 100)
+        self.assertEqual(amounts[self.categories[1].id], 0)
+
+        response = self.client.post(reverse('month_budgets_edit', args=[2024, 12]),
+                                    {f'budget_{self.categories[0].id}': -5})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+
+    def test_apply_to_next_months_and_copy_previous(self):
+        budgets.upsert_budgets([self.budget], {c.id: 500 for c in self.categories})
+
+        self.client.post(reverse('month_budgets_apply', args=[2024, 12]), {'months': 12})
+        self.assertEqual(MonthlyBudget.objects.filter(year=2025).count(), 12)
+        self.assertEqual(CategoryBudget.objects.filter(monthly_budget__year=2025).count(), 12 * 20)
+
+        budgets.upsert_budgets([self.budget], {self.categories[0].id: 900})
+        self.client.post(reverse('month_budgets_copy', args=[2025, 1]))
+        january = MonthlyBudget.objects.get(year=2025, month=1)
+        self.assertEqual(budgets.budget_amounts(january)[self.categories[0].id], 900)
+
+        # No November budget to copy from: nothing changes
+        self.client.post(reverse('month_budgets_copy', args=[2024, 12]))
+        self.assertEqual(budgets.budget_amounts(self.budget)[self.categories[0].id], 900)
+        self.assertContains(self.client.get(reverse('month_budgets_edit', args=[2024, 12])), 'value="900"')
+
+
+class RecurringTransactionTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rent = Category.objects.create(name='Rent', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+
+    def test_schedules(self):
+        monthly = RecurringTransaction(description='Rent', amount=1, category=self.rent,
+                                       frequency='monthly', interval=1, start_date=date(2024, 1, 31))
+        self.assertEqual(list(recurring.occurrences(monthly, date(2024, 1, 1), date(2024, 4, 30))),
+                         [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+
+        quarterly = RecurringTransaction(description='Tax', amount=1, category=self.rent,
+                                         frequency='monthly', interval=3, start_date=date(2024, 1, 15))
+        self.assertEqual(list(recurring.occurrences(quarterly, date(2024, 3, 1), date(2024, 12, 31))),
+                         [date(2024, 4, 15), date(2024, 7, 15), date(2024, 10, 15)])
+
+        biweekly = RecurringTransaction(description='Gym', amount=1, category=self.rent, frequency='weekly',
+                                        interval=2, start_date=date(2024, 1, 1), end_date=date(2024, 2, 1))
+        self.assertEqual(list(recurring.occurrences(biweekly, date(2024, 1, 2), date(2024, 12, 31))),
+                         [date(2024, 1, 15), date(2024, 1, 29)])
+
+    def test_materialize_is_batched_and_idempotent(self):
+        RecurringTransaction.objects.create(description='Rent', amount=500, category=self.rent,
+                                            start_date=date(2023, 1, 5))
+        RecurringTransaction.objects.create(description='Pay', amount=2000, category=self.salary,
+                                            start_date=date(2023, 1, 1), end_date=date(2023, 6, 30))
+        RecurringTransaction.objects.create(description='Old', amount=1, category=self.rent,
+                                            start_date=date(2023, 1, 1), active=False)
+
+        result = recurring.materialize(until=date(2024, 12, 31), batch_size=10)
+        self.assertEqual((result.rules, result.created), (2, 24 + 6))
+        self.assertEqual(MonthlyBudget.objects.count(), 24)
+        self.assertFalse(Transaction.objects.filter(monthly_budget__isnull=True).exists())
+        self.assertEqual(rollups.find_drift(rollups.compute_rollups(), rollups.stored_rollups()), [])
+        self.assertEqual(balances.current_balance(), 6 * 2000 - 24 * 500)
+
+        # Nothing new is due; a reset watermark does not create duplicates
+        self.assertEqual(recurring.materialize(until=date(2024, 12, 31)).created, 0)
+        RecurringTransaction.objects.update(materialized_until=None)
+        result = recurring.materialize(until=date(2025, 1, 31))
+        self.assertEqual((result.created, result.skipped), (1, 30))
+        self.assertEqual(Transaction.objects.count(), 31)
+
+    def test_command(self):
+        RecurringTransaction.objects.create(description='Rent', amount=500, category=self.rent,
+                                            start_date=date(2025, 1, 1))
+        out = StringIO()
+        call_command('materialize_recurring', '--until', '2025-03-01', stdout=out)
+        self.assertIn('3 transaction(s) created', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('materialize_recurring', '--until', 'tomorrow')
+
+
+class TransactionSearchTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+        self.coffee = create_transaction(description='Coffee with Lan', amount=45000, date=date(2025, 1, 3), category=self.food)
+        create_transaction(description='Coffee beans', amount=250000, date=date(2024, 11, 20), category=self.food)
+        create_transaction(description='Bánh mì', amount=20000, date=date(2025, 1, 4), category=self.food)
+        create_transaction(description='Salary coffee shop', amount=9000000, date=date(2025, 1, 1), category=self.salary)
+
+    def descriptions(self, query, **filters):
+        results, has_next = search.search_transactions(query, **filters)
+        return [t.description for t in results]
+
+    def test_prefix_diacritics_and_filters(self):
+        self.assertEqual(len(self.descriptions('cof')), 3)
+        self.assertEqual(self.descriptions('banh mi'), ['Bánh mì'])
+        self.assertEqual(self.descriptions('coffee', type='expense', date_from=date(2025, 1, 1)), ['Coffee with Lan'])
+        self.assertEqual(self.descriptions('coffee', amount_min=100000, amount_max=300000), ['Coffee beans'])
+        self.assertEqual(self.descriptions('coffee lan'), ['Coffee with Lan'])
+        self.assertEqual(self.descriptions('*"'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.coffee.description = 'Tea with Lan'
+        self.coffee.save()
+        self.assertEqual(self.descriptions('lan'), ['Tea with Lan'])
+        self.coffee.delete()
+        self.assertEqual(self.descriptions('lan'), [])
+
+    def test_pages_and_api(self):
+        results, has_next = search.search_transactions('coffee', page_size=2)
+        self.assertTrue(has_next)
+        results, has_next = search.search_transactions('coffee', page=2, page_size=2)
+        self.assertEqual((len(results), has_next), (1, False))
+
+        data = self.client.get(reverse('api_transaction_search'), {'q': 'beans', 'fields': 'description'}).json()
+        self.assertEqual(data['results'][0]['description'], 'Coffee beans')
+        self.assertIsNone(data['next_page'])
+        self.assertEqual(self.client.get(reverse('api_transaction_search')).status_code, 400)
+
+        response = self.client.get(reverse('transaction_search'), {'q': 'coffee', 'type': 'income'})
+        self.assertEqual([t.description for t in response.context['results']], ['Salary coffee shop'])
+
+
+class TenantTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Tenant.objects.create(name='Other household')
+        self.user = User.objects.create_user('lan', password='secret')
+        self.other.members.add(self.user)
+        with tenant_context(self.other):
+            food = Category.objects.create(name='Food', type='expense')
+            budget = MonthlyBudget.objects.create(year=2025, month=1)
+            create_transaction(description='Their lunch', amount=70000, date=date(2025, 1, 5),
+                               category=food, monthly_budget=budget)
+        food = Category.objects.create(name='Food', type='expense')
+        budget = MonthlyBudget.objects.create(year=2025, month=1)
+        self.mine = create_transaction(description='My lunch', amount=50000, date=date(2025, 1, 5),
+                                       category=food, monthly_budget=budget)
+
+    def test_querysets_and_reports_are_scoped(self):
+        self.assertEqual(current_tenant_id(), default_tenant_id())
+        self.assertEqual([t.description for t in Transaction.objects.all()], ['My lunch'])
+        self.assertEqual(Transaction.all_tenants.count(), 2)
+        self.assertEqual(get_month_summaries()[(2025, 1)]['expense'], 50000)
+        with tenant_context(self.other):
+            self.assertEqual([t.description for t in Transaction.objects.all()], ['Their lunch'])
+            self.assertEqual(get_month_summaries()[(2025, 1)]['expense'], 70000)
+            self.assertEqual(balances.current_balance(), -70000)
+        self.assertEqual(balances.current_balance(), -50000)
+
+    def test_members_only_see_their_tenant(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('month_detail', args=[2025, 1]))
+        self.assertContains(response, 'Their lunch')
+        self.assertNotContains(response, 'My lunch')
+        data = self.client.get(reverse('api_transactions')).json()
+        self.assertEqual([t['description'] for t in data['results']], ['Their lunch'])
+        self.assertEqual(self.client.get(reverse('transaction_update', args=[self.mine.pk])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('transaction_delete', args=[self.mine.pk])).status_code, 404)
+        # streamed after the view returned, still for the same tenant
+        export = b''.join(self.client.get(reverse('transaction_export')).streaming_content).decode()
+        self.assertIn('Their lunch', export)
+        self.assertNotIn('My lunch', export)
+        with tenant_context(default_tenant_id()):
+            self.assertTrue(Transaction.objects.filter(pk=self.mine.pk).exists())
+
+    @override_settings(EXPENSES_ANONYMOUS_TENANT=None)
+    def test_anonymous_visitors_must_log_in(self):
+        response = self.client.get(reverse('monthly_list'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+        # household members (not staff) log in on the login page
+        self.assertEqual(self.client.get(response['Location']).status_code, 200)
+        response = self.client.post(reverse('login'), {
+            'username': 'lan', 'password': 'secret', 'next': reverse('month_detail', args=[2025, 1]),
+        })
+        self.assertRedirects(response, reverse('month_detail', args=[2025, 1]), fetch_redirect_response=False)
+        response = self.client.get(reverse('month_detail', args=[2025, 1]))
+        self.assertContains(response, 'Their lunch')
+        self.assertContains(response, reverse('logout'))
+        self.assertRedirects(self.client.post(reverse('logout')), reverse('login'))
+
+        # a user without a tenant gets the "no household" page
+        self.client.force_login(User.objects.create_user('nobody', password='secret'))
+        response = self.client.get(reverse('monthly_list'))
+        self.assertContains(response, 'No household', status_code=403)
+
+    def test_removed_members_lose_access(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('month_detail', args=[2025, 1])), 'Their lunch')
+
+        self.other.members.remove(self.user)
+        response = self.client.get(reverse('month_detail', args=[2025, 1]))
+        self.assertEqual(response.status_code, 403)
+
+        # the tenant remembered in the session follows the membership
+        Tenant.objects.get(pk=default_tenant_id()).members.add(self.user)
+        response = self.client.get(reverse('month_detail', args=[2025, 1]))
+        self.assertContains(response, 'My lunch')
+        self.assertNotContains(response, 'Their lunch')
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_measuring_commands_log_in_as_a_member(self):
+        # the default tenant has no member (nor staff user) to log in as
+        with self.assertRaisesMessage(CommandError, 'No user to log in as for tenant'):
+            call_command('page_weight', runs=1, stdout=StringIO())
+        out = StringIO()
+        call_command('page_weight', runs=1, tenant=self.other.pk, stdout=out)
+        self.assertIn('month_detail', out.getvalue())
+
+    def test_commands_run_per_tenant(self):
+        out = StringIO()
+        call_command('rebuild_rollups', '--check', stdout=out)
+        call_command('rebuild_balances', '--check', stdout=out)
+        call_command('seed_expenses', tenant=self.other.pk, transactions=100, categories=4, months=2, stdout=out)
+        self.assertEqual(Transaction.objects.count(), 1)
+        with tenant_context(self.other):
+            self.assertEqual(Transaction.objects.count(), 101)
+        with self.assertRaises(CommandError):
+            call_command('export_transactions', 'out.csv', tenant=999, stdout=out)
+
+
+class ArchiveTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(EXPENSES_ARCHIVE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.salary = Category.objects.create(name='Salary', type='income')
+        self.food = Category.objects.create(name='Food', type='expense')
+        for year in (2020, 2025):
+            budget = MonthlyBudget.objects.create(year=year, month=3)
+            create_transaction(description=f'Pay {year}', amount=1000, date=date(year, 3, 1),
+                               category=self.salary, monthly_budget=budget)
+            create_transaction(description=f'Lunch {year}', amount=300, date=date(year, 3, 15),
+                               category=self.food, monthly_budget=budget)
+
+    def test_archive_and_restore_a_year(self):
+        ids = set(Transaction.objects.filter(date__year=2020).values_list('id', flat=True))
+        summaries = get_month_summaries()
+
+        self.assertEqual(archive.closed_years(2025), [2020])
+        self.assertEqual(archive.archive_year(2020), {default_tenant_id(): 2})
+        self.assertFalse(Transaction.objects.filter(date__year=2020).exists())
+        self.assertEqual(Transaction.objects.count(), 2)
+        # reports, balances and the drift checks still cover the archived year
+        self.assertEqual(get_month_summaries(), summaries)
+        self.assertEqual(balances.balance_at(2020, 3), 700)
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        call_command('rebuild_balances', '--check', stdout=StringIO())
+        response = self.client.get(reverse('month_detail', args=[2020, 3]))
+        self.assertEqual(response.context['archived'].transaction_count, 2)
+        self.client.post(reverse('category_delete', args=[self.food.pk]))
+        self.assertTrue(Category.objects.filter(pk=self.food.pk).exists())
+
+        call_command('archive_transactions', '--restore', '2020', stdout=StringIO())
+        restored = Transaction.objects.filter(date__year=2020)
+        self.assertEqual(set(restored.values_list('id', flat=True)), ids)
+        self.assertEqual(sorted(t.description for t in restored), ['Lunch 2020', 'Pay 2020'])
+        self.assertFalse(archive.archived_years())
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+    def test_transactions_added_later_are_archived_with_the_year(self):
+        call_command('archive_transactions', '--before', '2025', stdout=StringIO())
+        create_transaction(description='Late receipt', amount=50, date=date(2020, 5, 2), category=self.food)
+        call_command('rebuild_balances', '--check', stdout=StringIO())
+        call_command('archive_transactions', '--before', '2025', stdout=StringIO())
+        self.assertEqual(archive.archive_year(2020), {})
+        self.assertEqual(archive.restore_year(2020), 3)
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+
+class CategoryRegistryTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+
+    def test_forms_and_lists_read_categories_without_queries(self):
+        url = reverse('transaction_create_by_type', args=['expense'])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        choices = list(response.context['form'].fields['category'].choices)[1:]
+        self.assertEqual([value.instance for value, label in choices], [self.food])
+
+        response = self.client.post(url, {
+            'date': '2025-01-05', 'amount': 100, 'description': 'Wrong type', 'category': self.salary.pk,
+        })
+        self.assertIn('category', response.context['form'].errors)
+
+        self.client.get(reverse('category_list'))
+        # only the unread alert badge of the sidebar
+        with self.assertNumQueries(1):
+            self.client.get(reverse('category_list'))
+
+    def test_category_changes_reload_the_registry(self):
+        self.assertEqual(categories.get_registry().ids('expense'), [self.food.pk])
+        rent = Category.objects.create(name='Rent', type='expense')
+        self.assertEqual(categories.get_registry().ids('expense'), [self.food.pk, rent.pk])
+        rent.delete()
+        self.assertEqual(categories.get_registry().ids('expense'), [self.food.pk])
+        # unknown ids reload once (a category created by another process)
+        Category.objects.bulk_create([Category(name='Gifts', type='expense')])
+        gifts = Category.objects.get(name='Gifts')
+        self.assertEqual(categories.get_category(gifts.pk), gifts)
+
+    def test_registry_is_per_tenant(self):
+        other = Tenant.objects.create(name='Other household')
+        with tenant_context(other):
+            Category.objects.create(name='Their food', type='expense')
+            self.assertEqual([c.name for c in categories.get_registry()], ['Their food'])
+        self.assertEqual([c.name for c in categories.get_registry()], ['Food', 'Salary'])
+
+    def test_forms_accept_categories_the_registry_does_not_know_yet(self):
+        categories.get_registry()
+        Category.objects.bulk_create([Category(name='Gifts', type='expense')])
+        gifts = Category.objects.get(name='Gifts')
+        field = TransactionForm().fields['category']
+        self.assertEqual(field.clean(str(gifts.pk)), gifts)
+        with self.assertRaises(ValidationError):
+            field.clean('999999')
+
+    def test_registries_of_least_recently_used_tenants_are_dropped(self):
+        others = [Tenant.objects.create(name=f'Household {i}') for i in range(2)]
+        with mock.patch.object(categories, 'MAX_REGISTRIES', 2):
+            categories.get_registry()
+            for tenant in others:
+                with tenant_context(tenant):
+                    categories.get_registry()
+            self.assertEqual(list(categories._registries), [other.pk for other in others])
+            categories.get_registry()
+            self.assertEqual(list(categories._registries), [others[1].pk, default_tenant_id()])
+
+
+class BudgetAlertTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+        self.budget = MonthlyBudget.objects.create(year=2025, month=1)
+        budgets.upsert_budgets([self.budget], {self.food.pk: 1000, self.salary.pk: 1000})
+
+    def kinds(self):
+        return sorted(BudgetAlert.objects.values_list('kind', flat=True))
+
+    def test_crossings_are_raised_and_cleared_on_write(self):
+        lunch = create_transaction(description='Lunch', amount=700, date=date(2025, 1, 5), category=self.food)
+        create_transaction(description='Pay', amount=5000, date=date(2025, 1, 1), category=self.salary)
+        self.assertEqual(self.kinds(), [])
+
+        # only the touched (month, category) is checked: one query, one insert
+        with self.assertNumQueries(6 + 2):
+            create_transaction(description='Dinner', amount=200, date=date(2025, 1, 6), category=self.food)
+        alert = BudgetAlert.objects.get()
+        self.assertEqual((alert.kind, alert.budgeted, alert.actual), ('threshold', 1000, 900))
+
+        dinner = Transaction.objects.get(description='Dinner')
+        previous = copy(dinner)
+        dinner.description = 'Late dinner'
+        dinner.save()
+        rollups.record_transaction_changed(previous, dinner)
+        self.assertEqual(BudgetAlert.objects.get().pk, alert.pk)
+
+        create_transaction(description='Snack', amount=200, date=date(2025, 1, 7), category=self.food)
+        self.assertEqual(self.kinds(), ['overspent', 'threshold'])
+
+        rollups.record_transaction_removed(lunch)
+        lunch.delete()
+        self.assertEqual(self.kinds(), [])
+
+    def test_budget_changes_recheck_alerts(self):
+        create_transaction(description='Lunch', amount=900, date=date(2025, 1, 5), category=self.food)
+        self.assertEqual(self.kinds(), ['threshold'])
+
+        budgets.upsert_budgets([self.budget], {self.food.pk: 800})
+        self.assertEqual(self.kinds(), ['overspent', 'threshold'])
+        self.client.post(reverse('category_budget_update', args=[2025, 1, self.food.pk]), {'budgeted_amount': 5000})
+        self.assertEqual(self.kinds(), [])
+        # a budget of 0 is "no budget"
+        budgets.upsert_budgets([self.budget], {self.food.pk: 0})
+        self.assertEqual(self.kinds(), [])
+
+        budgets.upsert_budgets([self.budget], {self.food.pk: 800})
+        self.assertEqual(budgets.delete_budgets(CategoryBudget.objects.filter(category=self.food)), 1)
+        self.assertEqual(self.kinds(), [])
+
+    def test_feed_and_sidebar_badge(self):
+        create_transaction(description='Lunch', amount=1500, date=date(2025, 1, 5), category=self.food)
+        response = self.client.get(reverse('alert_list'))
+        self.assertContains(response, 'Over budget')
+        self.assertContains(response, '<span class="badge rounded-pill bg-danger ms-auto">2</span>', html=True)
+
+        self.client.post(reverse('alert_mark_read'))
+        self.assertEqual(alerts.unread_count(), 0)
+        self.assertNotContains(self.client.get(reverse('alert_list')), 'rounded-pill')
+
+
+class ForecastTests(ExpensesTestCase):
+    def test_models_over_the_category_matrix(self):
+        # 13 months of history: Rent every month, Gym only the last 2
+        history = [[100, 0]] * 11 + [[100, 300], [100, 300]]
+        models = forecast.forecast_matrix(history, [50, 0], elapsed=0.5)
+        self.assertEqual(list(models['seasonal'][:1]), [100])
+        self.assertTrue(math.isnan(models['seasonal'][1]))
+        self.assertEqual(list(models['baseline']), [100, 300])
+        self.assertEqual(list(models['run_rate']), [100, 0])
+        # on pace: the forecast is the baseline; nothing spent yet: half of the rest
+        self.assertEqual(list(models['forecast']), [100, 75])
+        self.assertEqual(list(forecast.suggested_budgets(models['baseline'] + 1, [False, True])), [1000, 0])
+
+    def test_month_detail_shows_forecast(self):
+        food = Category.objects.create(name='Food', type='expense')
+        for month in range(1, 13):
+            create_transaction(description='Lunch', amount=1200, date=date(2024, month, 10), category=food)
+        create_transaction(description='Lunch', amount=600, date=date(2025, 1, 10), category=food)
+        MonthlyBudget.objects.create(year=2025, month=1)
+
+        with mock.patch('expenses.views.monthly_views.timezone.localdate', return_value=date(2025, 1, 15)):
+            response = self.client.get(reverse('month_detail', args=[2025, 1]))
+        item = response.context['forecast_summary']()['expense_data'][0]
+        self.assertEqual((item['actual'], item['baseline'], item['suggested']), (600, 1200, 2000))
+        self.assertEqual(item['forecast'], round(600 + 16 / 31 * (600 + 16 / 31 * 1200)))
+        self.assertContains(response, 'data-suggested="2000"')
+        # cached per data version and day
+        self.assertEqual(forecast.get_forecast(2025, 1, date(2025, 1, 15))[food.pk], {
+            key: item[key] for key in ('seasonal', 'smoothed', 'baseline', 'run_rate', 'forecast', 'suggested')
+        })
+        with self.assertNumQueries(0):
+            forecast.get_forecast(2025, 1, date(2025, 1, 15))
+
+    def test_month_summary_fragment_follows_the_history(self):
+        food = Category.objects.create(name='Food', type='expense')
+        create_transaction(description='Lunch', amount=1000, date=date(2024, 12, 10), category=food)
+        MonthlyBudget.objects.create(year=2025, month=1)
+        url = reverse('month_detail', args=[2025, 1])
+
+        with mock.patch('expenses.views.monthly_views.timezone.localdate', return_value=date(2025, 2, 1)):
+            self.assertContains(self.client.get(url), 'data-suggested="1000"')
+            # served from the cached fragment: no forecast is built
+            with mock.patch.object(forecast, 'get_forecast', side_effect=AssertionError):
+                self.assertContains(self.client.get(url), 'data-suggested="1000"')
+
+            # a change in another month moves the forecast of this one
+            create_transaction(description='Lunch', amount=1000, date=date(2024, 12, 20), category=food)
+            self.assertContains(self.client.get(url), 'data-suggested="2000"')
+
+
+class LargeTableAdminTests(ExpensesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.salary = Category.objects.create(name='Salary', type='income')
+        for i in range(60):
+            create_transaction(description=f'Lunch {i}', amount=100, date=date(2024 + i % 2, 1 + i % 12, 1 + i % 28),
+                               category=self.food)
+        self.url = reverse('admin:expenses_transaction_changelist')
+
+    @mock.patch('expenses.admin.TransactionAdmin.list_per_page', 50)
+    def test_changelist_pages_by_keyset(self):
+        response = self.client.get(self.url)
+        page = response.context['cl'].result_list
+        self.assertEqual(len(page), 50)
+        self.assertEqual(response.context['cl'].result_count, 60)
+        response = self.client.get(self.url + response.context['cl'].next_page_url)
+        expected = list(Transaction.objects.order_by('-date', '-created_at', '-pk'))
+        self.assertEqual(page + response.context['cl'].result_list, expected)
+        self.assertIsNone(response.context['cl'].next_page_url)
+        # date hierarchy: the years that have transactions
+        self.assertContains(self.client.get(self.url), '?date__year=2025')
+        self.assertEqual(self.client.get(self.url, {'cursor': 'x'}).status_code, 302)
+
+    def test_bulk_actions_keep_rollups_in_sync(self):
+        selected = Transaction.objects.filter(date__year=2024).values_list('pk', flat=True)
+        self.client.post(self.url, {
+            'action': 'recategorize', 'category': self.salary.pk, '_selected_action': list(selected),
+        })
+        self.assertEqual(Transaction.objects.filter(category=self.salary).count(), 30)
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        call_command('rebuild_balances', '--check', stdout=StringIO())
+
+        data = {'action': 'delete_rows', 'select_across': '1', '_selected_action': [selected[0]]}
+        response = self.client.post(f'{self.url}?date__year=2025', data)
+        self.assertContains(response, 'Delete 30 transactions?')
+        self.client.post(f'{self.url}?date__year=2025', {**data, 'post': 'yes'})
+        self.assertEqual(sorted(Transaction.objects.dates('date', 'year')), [date(2024, 1, 1)])
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        call_command('rebuild_balances', '--check', stdout=StringIO())
+
+    def test_bulk_delete_defaults_to_the_orm_delete(self):
+        MonthlyBudget.objects.create(year=2030, month=1)
+        model_admin = LargeTableAdmin(MonthlyBudget, admin.site)
+        self.assertEqual(model_admin.bulk_delete(MonthlyBudget.objects.filter(year=2030)), 1)
+        self.assertFalse(MonthlyBudget.objects.filter(year=2030).exists())
+
+
+class StaticAssetsTests(ExpensesTestCase):
+    def test_pages_are_gzipped_and_link_the_stylesheet(self):
+        response = self.client.get(reverse('dashboard_home'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        html = gzip.decompress(response.content).decode()
+        self.assertIn(static('css/base.css'), html)
+        self.assertNotIn('<style>', html)
+
+    def test_vendor_assets_are_self_hosted(self):
+        assets._vendored.cache_clear()
+        self.assertEqual(assets.asset_url('css/base.css'), static('css/base.css'))
+        for path in assets.VENDOR:
+            self.assertEqual(assets.asset_url(path), static(path))
+        self.assertNotContains(self.client.get(reverse('dashboard_home')), 'cdn.jsdelivr.net')
+
+        # a file missing from static/ falls back to its CDN URL
+        with mock.patch.object(assets, '_vendored', return_value=False):
+            self.assertEqual(assets.asset_url('vendor/chart.js/chart.umd.min.js'),
+                             assets.VENDOR['vendor/chart.js/chart.umd.min.js'])
+
+    def test_collected_files_are_hashed_compressed_and_cached(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'expenses.storage.CompressedManifestStaticFilesStorage'},
+        }):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = static('css/base.css')
+            self.assertRegex(url, r'/base\.[0-9a-f]{12}\.css$')
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            compressed = b''.join(response.streaming_content)
+            response.close()
+
+            plain = self.client.get(url)
+            self.assertFalse(plain.has_header('Content-Encoding'))
+            self.assertEqual(gzip.decompress(compressed), b''.join(plain.streaming_content))
+            plain.close()
+            self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
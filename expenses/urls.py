@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import transaction_views, category_views, dashboard_views, monthly_views
+from .views import transaction_views, category_views, dashboard_views, monthly_views, debug_views, api_views, alert_views
 
 urlpatterns = [
     # Dashboard
@@ -8,18 +8,43 @@ urlpatterns = [
     # Monthly Budget
     path('monthly/', monthly_views.monthly_list, name='monthly_list'),
     path('monthly/create/', monthly_views.month_create, name='month_create'),
+    path('monthly/opening-balance/', monthly_views.opening_balance_update, name='opening_balance_update'),
     path('monthly/<int:year>/<int:month>/', monthly_views.month_detail, name='month_detail'),
+    path('monthly/<int:year>/<int:month>/transactions/', monthly_views.month_transactions, name='month_transactions'),
     path('monthly/<int:year>/<int:month>/budget/<int:category_id>/', monthly_views.category_budget_update, name='category_budget_update'),
+    path('monthly/<int:year>/<int:month>/budgets/', monthly_views.month_budgets_edit, name='month_budgets_edit'),
+    path('monthly/<int:year>/<int:month>/budgets/copy-previous/', monthly_views.month_budgets_copy, name='month_budgets_copy'),
+    path('monthly/<int:year>/<int:month>/budgets/apply/', monthly_views.month_budgets_apply, name='month_budgets_apply'),
     path('monthly/<int:year>/<int:month>/delete/', monthly_views.month_delete, name='month_delete'),
+    path('monthly/<int:year>/<int:month>/export/', monthly_views.month_export, name='month_export'),
     
     # Transaction CRUD (accessed via monthly budget)
     path('transactions/add/<str:type>/', transaction_views.transaction_create_by_type, name='transaction_create_by_type'),
     path('transactions/edit/<int:pk>/', transaction_views.transaction_update, name='transaction_update'),
     path('transactions/delete/<int:pk>/', transaction_views.transaction_delete, name='transaction_delete'),
+    path('transactions/import/', transaction_views.transaction_import, name='transaction_import'),
+    path('transactions/export/', transaction_views.transaction_export, name='transaction_export'),
+    path('transactions/search/', transaction_views.transaction_search, name='transaction_search'),
     
     # Categories
     path('categories/', category_views.category_list, name='category_list'),
     path('categories/add/', category_views.category_create, name='category_create'),
     path('categories/edit/<int:pk>/', category_views.category_update, name='category_update'),
     path('categories/delete/<int:pk>/', category_views.category_delete, name='category_delete'),
+
+    # Budget alerts
+    path('alerts/', alert_views.alert_list, name='alert_list'),
+    path('alerts/read/', alert_views.alert_mark_read, name='alert_mark_read'),
+
+    # Read-only JSON API
+    path('api/categories/', api_views.api_categories, name='api_categories'),
+    path('api/months/', api_views.api_months, name='api_months'),
+    path('api/months/<int:year>/<int:month>/', api_views.api_month_detail, name='api_month_detail'),
+    path('api/transactions/', api_views.api_transactions, name='api_transactions'),
+    path('api/transactions/search/', api_views.api_transaction_search, name='api_transaction_search'),
+
+    # Debug / tuning (staff only)
+    path('debug/cache/', debug_views.cache_stats, name='cache_stats'),
+    path('debug/db/', debug_views.db_stats, name='db_stats'),
+    path('debug/metrics/', debug_views.request_metrics, name='request_metrics'),
 ]
\ No newline at end of file
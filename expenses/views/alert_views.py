@@ -0,0 +1,19 @@
+from django.contrib import messages
+from django.shortcuts import render, redirect
+from ..services import alerts
+
+
+# Budget alerts (threshold reached / over budget), newest first.
+# Alerts are raised when a transaction or budget is saved, see services/alerts.py
+def alert_list(request):
+    return render(request, 'alerts/alert_list.html', {
+        'alerts': alerts.feed(),
+        'threshold': alerts.threshold(),
+    })
+
+
+def alert_mark_read(request):
+    if request.method == 'POST':
+        count = alerts.mark_all_read()
+        messages.success(request, f'{count} alert(s) marked as read.')
+    return redirect('alert_list')
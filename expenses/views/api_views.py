@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+from functools import wraps
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import condition, require_GET
+from ..forms import TransactionSearchForm
+from ..models import MonthlyBudget, Transaction
+from ..services import alist, cache, categories
+from ..services.month_report import MonthReport
+from ..services.month_summary import aget_month_summaries, get_month_summary
+from ..services.pagination import PAGE_SIZE, InvalidCursor, akeyset_page
+from ..services.periods import filter_month
+from ..services.search import search_transactions
+
+# Read-only JSON API for the mobile client.
+# - ?fields=a,b,c     only return these fields
+# - ?cursor=...       next page (lists), see services/pagination.py
+# - ETag / If-None-Match: the ETag is built from the version counters of the
+#   data behind the response, so an unchanged month answers 304 Not Modified.
+
+TRANSACTION_FIELDS = {
+    'id': lambda t: t.pk,
+    'date': lambda t: t.date.isoformat(),
+    'amount': lambda t: int(t.amount),
+    'description': lambda t: t.description,
+    'category_id': lambda t: t.category_id,
+    'category': lambda t: t.category.name,
+    'type': lambda t: t.category.type,
+}
+CATEGORY_FIELDS = {
+    'id': lambda c: c.pk,
+    'name': lambda c: c.name,
+    'type': lambda c: c.type,
+}
+MONTH_FIELDS = ['year', 'month', 'income', 'expense', 'balance']
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+# Compact JSON: no whitespace between separators
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def api_error(message, status=400):
+    return api_response({'error': message}, status=status)
+
+
+def selected_fields(request, available):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise InvalidFields(f'Unknown field(s): {", ".join(unknown)}')
+    return fields
+
+
+def serialize(obj, serializers, fields):
+    return {field: serializers[field](obj) for field in fields}
+
+
+# ETag = versions of the data scopes + the full path (fields/cursor change the body)
+def make_etag(request, scopes):
+    token = f'{cache.version_token(scopes)}|{request.get_full_path()}'
+    return hashlib.md5(token.encode()).hexdigest()
+
+
+async def amake_etag(request, scopes):
+    token = f'{await cache.aversion_token(scopes)}|{request.get_full_path()}'
+    return hashlib.md5(token.encode()).hexdigest()
+
+
+# condition(etag_func=...) for the async views, with an async ETag function.
+# Django's condition() calls the ETag function synchronously, which would
+# read the version counters from the cache on the event loop.
+def acondition(etag_func):
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = quote_etag(await etag_func(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def month_scopes(year, month):
+    return [cache.CATEGORIES, cache.month_scope(year, month)]
+
+
+async def transactions_etag(request):
+    year, month = request.GET.get('year'), request.GET.get('month')
+    if year and month and year.isdigit() and month.isdigit():
+        return await amake_etag(request, month_scopes(int(year), int(month)))
+    return await amake_etag(request, [cache.CATEGORIES, cache.MONTHS])
+
+
+# GET /api/categories/
+@require_GET
+@condition(etag_func=lambda request: make_etag(request, [cache.CATEGORIES]))
+def api_categories(request):
+    try:
+        fields = selected_fields(request, CATEGORY_FIELDS)
+    except InvalidFields as error:
+        return api_error(str(error))
+    ordered = categories.get_registry().ordered()
+    return api_response({'results': [serialize(c, CATEGORY_FIELDS, fields) for c in ordered]})
+
+
+# GET /api/months/ -> every month with income / expense / balance
+@require_GET
+@acondition(lambda request: amake_etag(request, [cache.CATEGORIES, cache.MONTHS]))
+async def api_months(request):
+    try:
+        fields = selected_fields(request, MONTH_FIELDS)
+    except InvalidFields as error:
+        return api_error(str(error))
+    summaries, months = await asyncio.gather(
+        cache.acached('month_summaries', [cache.CATEGORIES, cache.MONTHS], aget_month_summaries),
+        alist(MonthlyBudget.objects.values_list('year', 'month')),
+    )
+
+    results = []
+    for year, month in months:
+        row = {'year': year, 'month': month, **get_month_summary(summaries, year, month)}
+        results.append({field: int(row[field]) for field in fields})
+    return api_response({'results': results})
+
+
+# GET /api/months/<year>/<month>/ -> Budget vs Actual by category + totals
+@require_GET
+@acondition(lambda request, year, month: amake_etag(request, month_scopes(year, month)))
+async def api_month_detail(request, year, month):
+    monthly_budget = await aget_object_or_404(MonthlyBudget, year=year, month=month)
+
+    async def build_report():
+        return (await MonthReport.abuild(monthly_budget)).to_context()
+
+    report = await cache.acached(f'month_report:{year}-{month}', month_scopes(year, month), build_report)
+
+    def categories(data):
+        return [
+            {
+                'category_id': item['category'].id,
+                'category': item['category'].name,
+                'budgeted': int(item['budgeted']),
+                'actual': int(item['actual']),
+                'difference': int(item['difference']),
+            }
+            for item in data
+        ]
+
+    return api_response({
+        'year': year,
+        'month': month,
+        'income': categories(report['income_data']),
+        'expense': categories(report['expense_data']),
+        'total_income_budgeted': int(report['total_income_budgeted']),
+        'total_income_actual': int(report['total_income_actual']),
+        'total_expense_budgeted': int(report['total_expense_budgeted']),
+        'total_expense_actual': int(report['total_expense_actual']),
+        'balance': int(report['month_balance']),
+    })
+
+
+# GET /api/transactions/?year=&month=&type=&fields=&cursor=&limit=
+@require_GET
+@acondition(transactions_etag)
+async def api_transactions(request):
+    try:
+        fields = selected_fields(request, TRANSACTION_FIELDS)
+    except InvalidFields as error:
+        return api_error(str(error))
+
+    registry = await categories.aget_registry()
+    transactions = Transaction.objects.only('id', 'date', 'amount', 'description', 'created_at', 'category')
+    year, month = request.GET.get('year'), request.GET.get('month')
+    if year and month:
+        if not (year.isdigit() and month.isdigit() and 1 <= int(month) <= 12):
+            return api_error('Invalid year/month')
+        transactions = filter_month(transactions, int(year), int(month))
+    type = request.GET.get('type')
+    if type:
+        transactions = transactions.filter(category_id__in=registry.ids(type))
+
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), 500) if limit.isdigit() and int(limit) > 0 else PAGE_SIZE
+    try:
+        page, next_cursor = await akeyset_page(transactions, request.GET.get('cursor'), limit)
+    except InvalidCursor as error:
+        return api_error(str(error))
+    categories.attach(page, registry)
+
+    return api_response({
+        'results': [serialize(t, TRANSACTION_FIELDS, fields) for t in page],
+        'next_cursor': next_cursor,
+    })
+
+
+# GET /api/transactions/search/?q=&category=&type=&amount_min=&amount_max=&date_from=&date_to=&fields=&page=
+# Ranked: best matches first, `rank` added to each result
+@require_GET
+@condition(etag_func=lambda request: make_etag(request, [cache.CATEGORIES, cache.MONTHS]))
+def api_transaction_search(request):
+    try:
+        fields = selected_fields(request, TRANSACTION_FIELDS)
+    except InvalidFields as error:
+        return api_error(str(error))
+    form = TransactionSearchForm(request.GET)
+    if not form.is_valid():
+        return api_error({name: [str(e) for e in errors] for name, errors in form.errors.items()})
+    page = request.GET.get('page', '')
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+
+    results, has_next = search_transactions(form.cleaned_data['q'], page=page, **form.filters())
+    return api_response({
+        'results': [{**serialize(t, TRANSACTION_FIELDS, fields), 'rank': round(t.rank, 4)} for t in results],
+        'next_page': page + 1 if has_next else None,
+    })
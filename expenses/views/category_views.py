@@ -1,13 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.db import transaction as db_transaction
 from django.db.models import ProtectedError
 from ..models import Category
 from ..forms import CategoryForm
+from ..services import archive
+from ..services.categories import get_registry
 
-# Flow: User vào /categories/ → lấy all categories → render ra HTML
+# Flow: User vào /categories/ → lấy all categories (từ registry) → render ra HTML
 def category_list(request):
-    income_categories = Category.objects.filter(type='income')
-    expense_categories = Category.objects.filter(type='expense')
+    registry = get_registry()
+    income_categories = registry.of_type('income')
+    expense_categories = registry.of_type('expense')
     return render(request, 'category/category_list.html', {
         'income_categories': income_categories,
         'expense_categories': expense_categories
@@ -38,7 +42,9 @@ def category_update(request, pk):
     if request.method == 'POST':
         form = CategoryForm(request.POST, instance=category)
         if form.is_valid():
-            updated_category = form.save()
+            # Same transaction as the balance correction of a type change (signals.py)
+            with db_transaction.atomic():
+                updated_category = form.save()
             messages.success(request, f'Category "{updated_category.name}" has been updated successfully.')
             return redirect('category_list')
     else:
@@ -53,6 +59,9 @@ def category_update(request, pk):
 def category_delete(request, pk):
     category = get_object_or_404(Category, pk=pk)
     if request.method == 'POST':
+        if archive.has_archived_transactions(category):
+            messages.error(request, f'Cannot delete category "{category.name}" because archived transactions use it.')
+            return redirect('category_list')
         try:
             category.delete()
             messages.success(request, f'Category "{category.name}" has been deleted successfully.')
@@ -1,8 +1,22 @@
 from django.shortcuts import render
+from ..services.trends import DEFAULT_PERIOD, PERIODS, get_trends
 
-# Dashboard home page - Welcome screen
+# Dashboard home page - trends of the last 12/24/60 months (?months=)
 def dashboard_home(request):
+    period = request.GET.get('months', '')
+    period = int(period) if period.isdigit() and int(period) in PERIODS else DEFAULT_PERIOD
+    trends = get_trends(period)
+
     context = {
         'page_title': 'Dashboard',
+        'periods': PERIODS,
+        'trends': trends,
+        'chart_data': {
+            'labels': trends['labels'],
+            'income': trends['income'],
+            'expense': trends['expense'],
+            'income_average': trends['income_average'],
+            'expense_average': trends['expense_average'],
+        },
     }
     return render(request, 'dashboard/home.html', context)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from ..services import cache, db_pool, metrics
+
+
+# Hit/miss counters of the report cache (this process only), for tuning
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({'cache': cache.get_stats()})
+
+
+# Connection reuse / pool counters (checkouts, waits, timeouts) of this process
+@staff_member_required
+def db_stats(request):
+    return JsonResponse(db_pool.get_stats())
+
+
+# Per-view request metrics (QueryMetricsMiddleware): percentiles of the last
+# requests as JSON, or ?format=prometheus for the text exposition format
+@staff_member_required
+def request_metrics(request):
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    return JsonResponse({'sample_rate': getattr(settings, 'EXPENSES_METRICS_SAMPLE_RATE', None),
+                         'views': metrics.get_report()})
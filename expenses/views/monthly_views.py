@@ -1,44 +1,75 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import functools
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
-from django.db.models import Sum, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.template.loader import render_to_string
 from datetime import datetime
-from ..models import MonthlyBudget, CategoryBudget, Category, Transaction
+from ..models import ArchivedYear, MonthlyBudget, CategoryBudget, Category, Transaction
+from ..services.month_summary import aget_month_summaries, get_month_summary
+from ..services.month_report import MonthReport
+from ..services.periods import filter_month
+from ..services.pagination import InvalidCursor, akeyset_page
+from ..services.exporter import WRITERS, REPORT_HEADER, month_report_rows
+from ..forms import BulkBudgetForm
+from ..services import alist, balances, budgets, cache, categories, forecast
+
+# "Apply to next N months" of the bulk budget editor
+MAX_APPLY_MONTHS = 24
+# OpeningBalance.amount has 14 digits
+MAX_OPENING_BALANCE = 10 ** 14 - 1
 
 # Monthly budget views
-def monthly_list(request):
-    monthly_budgets = MonthlyBudget.objects.all()
+# Async view: the months, the summaries and the global balance are
+# independent, so they are awaited together.
+async def monthly_list(request):
+    monthly_budgets, summaries, global_balance = await asyncio.gather(
+        alist(MonthlyBudget.objects.all()),
+        # Income, expense, balance of every month in a single grouped query,
+        # cached until a transaction, budget or category changes
+        cache.acached('month_summaries', [cache.CATEGORIES, cache.MONTHS], aget_month_summaries),
+        # Global running balance: one indexed read of the latest snapshot
+        cache.acached('global_balance', [cache.MONTHS], aget_global_balance),
+    )
     
-    # Calculate income, expense, balance for each month
     budget_data = []
     for budget in monthly_budgets:
-        # Get all transactions in this month
-        transactions = Transaction.objects.filter(
-            date__year=budget.year,
-            date__month=budget.month
-        )
-        
-        # Calculate income and expense
-        income = transactions.filter(
-            category__type='income'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        expense = transactions.filter(
-            category__type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        balance = income - expense
-        
+        summary = get_month_summary(summaries, budget.year, budget.month)
         budget_data.append({
             'budget': budget,
-            'income': income,
-            'expense': expense,
-            'balance': balance,
+            'income': summary['income'],
+            'expense': summary['expense'],
+            'balance': summary['balance'],
         })
     
     context = {
         'budget_data': budget_data,
+        'global_balance': global_balance['balance'],
+        'opening_balance': global_balance['opening'],
     }
-    return render(request, 'monthly/monthly_list.html', context)
+    return await sync_to_async(render)(request, 'monthly/monthly_list.html', context)
+
+
+async def aget_global_balance():
+    return {
+        'balance': await balances.acurrent_balance(),
+        'opening': (await balances.aget_opening_balance()).amount,
+    }
+
+
+# Set the starting capital the global balance is counted from
+def opening_balance_update(request):
+    if request.method == 'POST':
+        amount = request.POST.get('amount', '').strip()
+        if not amount.removeprefix('-').isdigit() or abs(int(amount)) > MAX_OPENING_BALANCE:
+            messages.error(request, 'Starting capital must be a whole number of at most 14 digits.')
+            return redirect('monthly_list')
+        amount = int(amount)
+        balances.set_opening_balance(amount)
+        messages.success(request, f'Starting capital updated to {amount:,}đ')
+    return redirect('monthly_list')
 
 # Monthly budget create view
 def month_create(request):
@@ -72,92 +103,129 @@ def month_create(request):
 # Month detail page with 2 tabs:
 # - Tab 1: Budget Summary (Budgeted vs Actual by category)
 # - Tab 2: Transactions list
-def month_detail(request, year, month):
-    monthly_budget = get_object_or_404(MonthlyBudget, year=year, month=month)
+async def month_detail(request, year, month):
+    monthly_budget = await aget_object_or_404(MonthlyBudget, year=year, month=month)
     
-    # Get all categories
-    income_categories = Category.objects.filter(type='income')
-    expense_categories = Category.objects.filter(type='expense')
+    # Budget vs Actual by category + totals (constant number of queries),
+    # cached per month until something in this month changes
+    scopes = [cache.CATEGORIES, cache.month_scope(year, month)]
     
-    # Get all transactions in this month
-    transactions = Transaction.objects.filter(
-        date__year=year,
-        date__month=month
-    )
-    
-    # Calculate actual amounts by category
-    def get_category_data(categories, trans_type):
-        data = []
-        for category in categories:
-            # Get budgeted amount
-            try:
-                category_budget = CategoryBudget.objects.get(
-                    monthly_budget=monthly_budget,
-                    category=category
-                )
-                budgeted = category_budget.budgeted_amount
-            except CategoryBudget.DoesNotExist:
-                budgeted = 0
-            
-            # Get actual amount
-            actual = transactions.filter(category=category).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            # Calculate difference
-            difference = budgeted - actual
-            
-            data.append({
-                'category': category,
-                'budgeted': budgeted,
-                'actual': actual,
-                'difference': difference,
-            })
-        
-        return data
-    
-    income_data = get_category_data(income_categories, 'income')
-    expense_data = get_category_data(expense_categories, 'expense')
+    async def build_report():
+        return (await MonthReport.abuild(monthly_budget)).to_context()
     
-    # Calculate totals
-    total_income_budgeted = sum(item['budgeted'] for item in income_data)
-    total_income_actual = sum(item['actual'] for item in income_data)
-    total_expense_budgeted = sum(item['budgeted'] for item in expense_data)
-    total_expense_actual = sum(item['actual'] for item in expense_data)
-    
-    # Calculate total differences
-    total_expense_difference = total_expense_budgeted - total_expense_actual
-    total_income_difference = total_income_actual - total_income_budgeted
-    
-    # Separate transactions by type for the 2-column layout
-    expenses = transactions.filter(category__type='expense')
-    incomes = transactions.filter(category__type='income')
-    
-    # Calculate month totals
-    month_expense = sum(t.amount for t in expenses)
-    month_income = sum(t.amount for t in incomes)
-    month_balance = month_income - month_expense
+    # Report, first page of each column (the rest is loaded by
+    # month_transactions) and month-end balance are independent queries
+    registry = await categories.aget_registry()
+    today = timezone.localdate()
+    report_context, (expenses, expenses_cursor), (incomes, incomes_cursor), closing_balance, cache_version = (
+        await asyncio.gather(
+            cache.acached(f'month_report:{year}-{month}', scopes, build_report),
+            akeyset_page(month_transactions_queryset(year, month, registry.ids('expense'))),
+            akeyset_page(month_transactions_queryset(year, month, registry.ids('income'))),
+            balances.abalance_at(year, month),
+            # key of the summary fragment: its forecast columns also depend
+            # on the history of the other months
+            cache.aversion_token([*scopes, cache.MONTHS]),
+        )
+    )
+
+    # Report rows with the forecast columns, only built when the summary
+    # fragment is not cached (called by the template, in the render thread)
+    @functools.cache
+    def forecast_summary():
+        return add_forecasts(report_context, forecast.get_forecast(year, month, today))
+    categories.attach(expenses, registry)
+    categories.attach(incomes, registry)
+    # Only months without transactions can be in an archived year
+    archived = None
+    if not expenses and not incomes:
+        archived = await ArchivedYear.objects.filter(year=year).afirst()
     
     context = {
         'monthly_budget': monthly_budget,
         'year': year,
         'month': month,
-        'income_data': income_data,
-        'expense_data': expense_data,
-        'total_income_budgeted': total_income_budgeted,
-        'total_income_actual': total_income_actual,
-        'total_expense_budgeted': total_expense_budgeted,
-        'total_expense_actual': total_expense_actual,
-        'total_expense_difference': total_expense_difference,
-        'total_income_difference': total_income_difference,
-        'transactions': transactions,
         'expenses': expenses,
+        'expenses_cursor': expenses_cursor,
         'incomes': incomes,
-        'month_expense': month_expense,
-        'month_income': month_income,
-        'month_balance': month_balance,
+        'incomes_cursor': incomes_cursor,
+        'closing_balance': closing_balance,
+        'cache_version': cache_version,
+        'archived': archived,
+        'today': today,
+        'forecast_summary': forecast_summary,
+        **report_context,
     }
-    return render(request, 'monthly/month_detail.html', context)
+    return await sync_to_async(render)(request, 'monthly/month_detail.html', context)
+
+
+# Month-end forecast and suggested budget next to budgeted and actual
+# (services/forecast.py)
+def add_forecasts(report_context, forecasts):
+    context = dict(report_context)
+    for type in ('expense', 'income'):
+        rows = [{**item, **forecasts.get(item['category'].id, {})} for item in report_context[f'{type}_data']]
+        context[f'{type}_data'] = rows
+        context[f'total_{type}_forecast'] = sum(row.get('forecast') or 0 for row in rows)
+    return context
+
+
+# Transactions of the given categories (one type) in a month (sargable date
+# range), with only the columns the list shows. No join: the categories are
+# attached from the category registry.
+def month_transactions_queryset(year, month, category_ids):
+    return (
+        filter_month(Transaction.objects.all(), year, month)
+        .filter(category_id__in=category_ids)
+        .only('id', 'date', 'amount', 'description', 'created_at', 'category')
+    )
+
+
+# Infinite scroll: /monthly/<y>/<m>/transactions/?type=expense&cursor=...
+# Returns the next page as JSON (data + rendered table rows) and the cursor of the page after it.
+async def month_transactions(request, year, month):
+    type = request.GET.get('type')
+    if type not in ('income', 'expense'):
+        return JsonResponse({'error': 'type must be income or expense'}, status=400)
+    registry = await categories.aget_registry()
+    try:
+        page, next_cursor = await akeyset_page(
+            month_transactions_queryset(year, month, registry.ids(type)), request.GET.get('cursor')
+        )
+    except InvalidCursor as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    categories.attach(page, registry)
+
+    html = render_to_string('monthly/_transaction_rows.html', {
+        'transactions': page, 'type': type, 'year': year, 'month': month,
+    })
+    return JsonResponse({
+        'results': [
+            {
+                'id': t.pk,
+                'date': t.date.isoformat(),
+                'amount': str(t.amount),
+                'description': t.description,
+                'category': t.category.name,
+            }
+            for t in page
+        ],
+        'next_cursor': next_cursor,
+        'html': html,
+    })
+
+
+# Export the Budget vs Actual table of a month as CSV or XLSX
+def month_export(request, year, month):
+    monthly_budget = get_object_or_404(MonthlyBudget, year=year, month=month)
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in WRITERS:
+        raise Http404('Unknown export format')
+
+    write, content_type = WRITERS[file_format]
+    response = StreamingHttpResponse(write(REPORT_HEADER, month_report_rows(monthly_budget)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="budget-{year}-{month:02d}.{file_format}"'
+    return response
 
 
 # Delete monthly budget
@@ -201,3 +269,53 @@ def category_budget_update(request, year, month, category_id):
     
     return redirect('month_detail', year=year, month=month)
 
+
+# Edit the budgets of every category of a month on one page.
+# Saved with a single upsert statement (see services/budgets.py).
+def month_budgets_edit(request, year, month):
+    monthly_budget = get_object_or_404(MonthlyBudget, year=year, month=month)
+    form = BulkBudgetForm(
+        request.POST or None,
+        categories=categories.get_registry().ordered(),
+        amounts=budgets.budget_amounts(monthly_budget),
+    )
+    
+    if request.method == 'POST' and form.is_valid():
+        count = budgets.upsert_budgets([monthly_budget], form.amounts())
+        messages.success(request, f'{count} budgets for {year}-{month:02d} saved.')
+        return redirect('month_detail', year=year, month=month)
+    
+    return render(request, 'monthly/month_budgets.html', {
+        'monthly_budget': monthly_budget,
+        'year': year,
+        'month': month,
+        'form': form,
+        'max_apply_months': MAX_APPLY_MONTHS,
+    })
+
+
+# Copy all category budgets of the previous month into this month
+def month_budgets_copy(request, year, month):
+    monthly_budget = get_object_or_404(MonthlyBudget, year=year, month=month)
+    
+    if request.method == 'POST':
+        count = budgets.copy_from_previous_month(monthly_budget)
+        if count is None:
+            messages.error(request, 'There is no budget for the previous month to copy.')
+        else:
+            messages.success(request, f'{count} budgets copied from the previous month.')
+    return redirect('month_budgets_edit', year=year, month=month)
+
+
+# Apply this month's budgets to the next N months (missing months are created)
+def month_budgets_apply(request, year, month):
+    monthly_budget = get_object_or_404(MonthlyBudget, year=year, month=month)
+    
+    if request.method == 'POST':
+        months = request.POST.get('months', '')
+        if not months.isdigit() or not 1 <= int(months) <= MAX_APPLY_MONTHS:
+            messages.error(request, f'Number of months must be between 1 and {MAX_APPLY_MONTHS}.')
+            return redirect('month_budgets_edit', year=year, month=month)
+        count = budgets.apply_to_next_months(monthly_budget, int(months))
+        messages.success(request, f'Budgets applied to the next {months} months ({count} budgets).')
+    return redirect('month_budgets_edit', year=year, month=month)
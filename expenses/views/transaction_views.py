@@ -1,7 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from ..models import Category, Transaction
-from ..forms import TransactionForm
+from django.http import Http404, StreamingHttpResponse
+from django.db import transaction as db_transaction
+import io
+from ..models import Transaction
+from ..forms import TransactionForm, TransactionImportForm, TransactionSearchForm
+from ..services import rollups
+from ..services.search import search_transactions
+from ..services.importer import PARSERS, ImportRowError, TransactionImporter
+from ..services.exporter import WRITERS, TRANSACTION_HEADER, transaction_rows
 
 
 # NEW: Create transaction với type parameter (income/expense)
@@ -20,7 +27,7 @@ def transaction_create_by_type(request, type):
     
     if request.method == 'POST':
         form = TransactionForm(request.POST)
-        form.fields['category'].queryset = Category.objects.filter(type=type)
+        form.fields['category'].type = type
         
         if form.is_valid():
             transaction = form.save(commit=False)
@@ -35,7 +42,10 @@ def transaction_create_by_type(request, type):
                     })
                 transaction.monthly_budget = monthly_budget
             
-            transaction.save()
+            # Save + update monthly rollup atomically
+            with db_transaction.atomic():
+                transaction.save()
+                rollups.record_transaction_added(transaction)
             type_label = 'Income' if type == 'income' else 'Expense'
             messages.success(request, f'{type_label} "{transaction.description}" has been added successfully.')
             
@@ -49,7 +59,7 @@ def transaction_create_by_type(request, type):
         if monthly_budget:
             initial['date'] = date(year, month, 1)
         form = TransactionForm(initial=initial)
-        form.fields['category'].queryset = Category.objects.filter(type=type)
+        form.fields['category'].type = type
         
         # Add min/max date constraints if coming from monthly budget
         if monthly_budget:
@@ -78,7 +88,12 @@ def transaction_update(request, pk):
     if request.method == 'POST':
         form = TransactionForm(request.POST, instance=transaction)
         if form.is_valid():
-            updated_transaction = form.save()
+            with db_transaction.atomic():
+                # The deltas come from the row as it is now, locked: another
+                # request may have changed it since it was read above
+                previous = get_object_or_404(Transaction.objects.select_for_update(), pk=pk)
+                updated_transaction = form.save()
+                rollups.record_transaction_changed(previous, updated_transaction)
             messages.success(request, f'Transaction "{updated_transaction.description}" has been updated successfully.')
             
             # Redirect to month_detail if coming from monthly budget
@@ -114,7 +129,14 @@ def transaction_delete(request, pk):
     
     if request.method == 'POST':
         description = transaction.description
-        transaction.delete()
+        with db_transaction.atomic():
+            # Lock the row and only take it out of the rollups when this
+            # request is the one that deleted it
+            current = Transaction.objects.select_for_update().filter(pk=pk).first()
+            if current is not None:
+                _, deleted = Transaction.objects.filter(pk=pk).delete()
+                if deleted.get(Transaction._meta.label) == 1:
+                    rollups.record_transaction_removed(current)
         messages.success(request, f'Transaction "{description}" has been deleted successfully.')
         
         # Redirect to month_detail if coming from monthly budget
@@ -124,3 +146,72 @@ def transaction_delete(request, pk):
     return render(request, 'transaction/transaction_confirm_delete.html', {
         'transaction': transaction
     })
+
+
+# User vào /transactions/import/ (GET) → Hiển thị form upload
+# User chọn file CSV/OFX (POST) → Stream parse → Lưu theo chunk → Hiển thị kết quả
+def transaction_import(request):
+    result = None
+    if request.method == 'POST':
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            importer = TransactionImporter(
+                default_expense_category=form.cleaned_data['expense_category'],
+                default_income_category=form.cleaned_data['income_category'],
+            )
+            # Read the upload line by line instead of loading it into memory
+            lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = importer.run(PARSERS[form.cleaned_data['format']](lines))
+            except ImportRowError as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(
+                    request,
+                    f'Imported {result.created} transaction(s), skipped {result.duplicates} duplicate(s), '
+                    f'{result.error_count} error(s).'
+                )
+    else:
+        form = TransactionImportForm()
+
+    return render(request, 'transaction/transaction_import.html', {
+        'form': form,
+        'result': result,
+    })
+
+
+# /transactions/export/?format=csv|xlsx&year=2025 (no year = full history)
+# The file is streamed while rows are read, so memory does not grow with the row count.
+def transaction_export(request):
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in WRITERS:
+        raise Http404('Unknown export format')
+    year = request.GET.get('year')
+    year = int(year) if year and year.isdigit() else None
+
+    write, content_type = WRITERS[file_format]
+    response = StreamingHttpResponse(write(TRANSACTION_HEADER, transaction_rows(year)), content_type=content_type)
+    filename = f'transactions-{year or "all"}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# /transactions/search/?q=coffee&type=expense&amount_min=...&page=2
+# Ranked full-text search over all months (see services/search.py)
+def transaction_search(request):
+    form = TransactionSearchForm(request.GET or None)
+    page = request.GET.get('page', '')
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+    results, has_next = [], False
+    if form.is_valid():
+        results, has_next = search_transactions(form.cleaned_data['q'], page=page, **form.filters())
+
+    query = request.GET.copy()
+    query.pop('page', None)
+    return render(request, 'transaction/transaction_search.html', {
+        'form': form,
+        'results': results,
+        'page': page,
+        'has_next': has_next,
+        'query_string': query.urlencode(),
+    })
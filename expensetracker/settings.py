@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,14 +43,36 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'expenses.middleware.StaticFilesMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'expenses.middleware.QueryMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'expenses.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Share of requests measured by QueryMetricsMiddleware (0 disables, 1 measures all)
+EXPENSES_METRICS_SAMPLE_RATE = float(os.environ.get('EXPENSES_METRICS_SAMPLE_RATE', 0.1))
+
+# Budget alerts (expenses/services/alerts.py): raised when an expense
+# category reaches this percentage of its monthly budget, and when it goes over
+EXPENSES_BUDGET_ALERT_THRESHOLD = int(os.environ.get('EXPENSES_BUDGET_ALERT_THRESHOLD', 80))
+
+# Tenant that existing data was migrated into (see expenses/tenancy.py).
+# By default every visitor logs in and sees only the tenant they are a
+# member of; EXPENSES_ANONYMOUS_TENANT=<id> opens that tenant to anonymous
+# visitors (single-household installs on a private network).
+EXPENSES_DEFAULT_TENANT = 1
+_anonymous_tenant = os.environ.get('EXPENSES_ANONYMOUS_TENANT', '')
+EXPENSES_ANONYMOUS_TENANT = int(_anonymous_tenant) if _anonymous_tenant.isdigit() else None
+LOGIN_URL = 'login'
+LOGIN_REDIRECT_URL = 'dashboard_home'
+LOGOUT_REDIRECT_URL = 'login'
+
 ROOT_URLCONF = 'expensetracker.urls'
 
 TEMPLATES = [
@@ -62,6 +85,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'expenses.context_processors.budget_alerts',
             ],
         },
     },
@@ -73,17 +97,90 @@ WSGI_APPLICATION = 'expensetracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection settings come from the environment (defaults = local dev database).
+# EXPENSES_DB_POOL picks how connections are reused:
+#   none        a new connection per request (Django default)
+#   persistent  keep the connection open for DB_CONN_MAX_AGE seconds, with health checks
+#   pool        psycopg3 connection pool (pip install "psycopg[pool]"), DB_POOL_MIN/MAX/TIMEOUT
+#   pgbouncer   persistent connections to a PgBouncer in transaction mode at DB_HOST/DB_PORT
+#               (server-side cursors do not survive transaction pooling)
+
+EXPENSES_DB_POOL = os.environ.get('EXPENSES_DB_POOL', 'persistent')
+
 DATABASES = {
     'default': {
-          'ENGINE': 'django.db.backends.postgresql',
-          'NAME': 'expense_db',
-          'USER': 'postgres',
-          'PASSWORD': 'admin1234',
-          'HOST': 'localhost',
-          'PORT': '5432',
-      }
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'expense_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'admin1234'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {},
+    }
 }
 
+if EXPENSES_DB_POOL in ('persistent', 'pgbouncer'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if EXPENSES_DB_POOL == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif EXPENSES_DB_POOL == 'pool':
+    # The pool owns the connections: CONN_MAX_AGE must stay 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+# Optional PostgreSQL partitioning of the transactions table: year | month
+# (range by date) | tenant (hash). Applied by migration 0015 when set before
+# migrating; later on use `manage.py partition_transactions`.
+EXPENSES_TRANSACTION_PARTITIONING = os.environ.get('EXPENSES_TRANSACTION_PARTITIONING', '')
+EXPENSES_TRANSACTION_TENANT_PARTITIONS = int(os.environ.get('EXPENSES_TRANSACTION_TENANT_PARTITIONS', 0))
+
+# Where archive_transactions writes the files of archived years
+EXPENSES_ARCHIVE_DIR = Path(os.environ.get('EXPENSES_ARCHIVE_DIR', BASE_DIR / 'archive'))
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# EXPENSES_CACHE=locmem (default) | file | redis
+# Report data and fragments are keyed by per-month version counters
+# (expenses/services/cache.py), so entries never need to expire for correctness.
+# Those counters also tell every process when its in-memory category
+# registry (expenses/services/categories.py) is stale, so they must be shared:
+# with more than one worker process use redis (or file on a single host).
+# locmem is private to each process and only fits single-process setups.
+
+EXPENSES_CACHE = os.environ.get('EXPENSES_CACHE', 'locmem')
+
+if EXPENSES_CACHE == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('EXPENSES_CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+            'TIMEOUT': 3600,
+        }
+    }
+elif EXPENSES_CACHE == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('EXPENSES_CACHE_LOCATION', '/var/tmp/expenses_cache'),
+            'TIMEOUT': 3600,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'expenses',
+            'TIMEOUT': 3600,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,6 +217,21 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+# collectstatic target, served by expenses.middleware.StaticFilesMiddleware
+# (or the web server, which can send the .gz/.br files as they are)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+EXPENSES_SERVE_STATIC = os.environ.get('EXPENSES_SERVE_STATIC', 'true').lower() == 'true'
+
+# Outside DEBUG static files get content-hashed names (long cache lifetime)
+# and pre-compressed copies; in DEBUG runserver serves them as they are.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'expenses.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field